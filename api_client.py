@@ -1,124 +1,1091 @@
 import requests
-import random
-import string
+import atexit
+import queue
+import threading
+import json
+import os
+import time
+import base64
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qs, urlparse
+
+from requests.adapters import HTTPAdapter
+
+import metrics
+import usernames
+from usernames import ADJECTIVES, ANIMALS, generate_password
 
 BASE_URL = "https://api.mail.tm"
 
-def get_domain():
-    """Fetches a valid domain for account creation."""
+DOMAIN_CACHE_FILE = "domains_cache.json"
+DOMAIN_CACHE_TTL = 6 * 60 * 60  # Domains rarely change; six hours is plenty
+
+TOKEN_CACHE_FILE = "tokens_cache.json"
+TOKEN_EXPIRY_SKEW = 60  # Renew tokens this many seconds before they expire
+TOKEN_SAVE_DELAY = 1.0  # Coalesce token file rewrites made within this many seconds
+
+# mail.tm allows 8 requests per second per IP
+DEFAULT_QPS = 8
+DEFAULT_BURST = 8
+MAX_RATE_LIMIT_WAIT = 10  # Retry a 429 in place only if the server asks us to wait at most this long
+
+USERNAME_ATTEMPTS = 3  # Fresh names to try when /accounts says an address is already used
+
+# Default per-endpoint timeouts in seconds (connect, read handled by requests as one value)
+DEFAULT_TIMEOUTS = {
+    "domains": 10,
+    "accounts": 10,
+    "token": 10,
+    "messages": 10,
+    "message": 10,
+    "seen": 10,
+    "download": 30,  # Per chunk read, not for the whole body
+}
+
+MESSAGES_PAGE_SIZE = 30  # Items per page of the /messages hydra collection
+
+DOWNLOAD_DIR_NAME = "downloads"
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class DomainCache:
+    """TTL cache of the registrable domains, kept in memory and mirrored to disk.
+
+    A stale entry is still served while a background refresh runs, so only a
+    cold start with no usable disk copy ever blocks on the /domains request.
+    """
+
+    def __init__(self, fetch, ttl=DOMAIN_CACHE_TTL, path=None):
+        self._fetch = fetch
+        self.ttl = ttl
+        self._path = path
+        self._domains = []
+        self._fetched_at = 0.0
+        self._loaded = False
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        if self._path is None:
+            import storage
+            self._path = storage.get_data_path(DOMAIN_CACHE_FILE)
+        return self._path
+
+    def _load_from_disk(self):
+        self._loaded = True
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self._domains = list(data.get("domains", []))
+            self._fetched_at = float(data.get("fetched_at", 0))
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def _save_to_disk(self):
+        try:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({"domains": self._domains, "fetched_at": self._fetched_at}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving domain cache: {e}")
+
+    def _is_stale(self):
+        return time.time() - self._fetched_at >= self.ttl
+
+    def refresh(self):
+        """Fetches the domain list now; keeps the old list if the request fails."""
+        try:
+            domains = self._fetch()
+        finally:
+            with self._lock:
+                self._refreshing = False
+        return self.store(domains)
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except RateLimited as e:
+            print(f"Domain refresh rate limited, keeping cached domains: {e}")
+
+    def store(self, domains):
+        """Records a freshly fetched domain list. Returns the current list."""
+        with self._lock:
+            if domains:
+                self._domains = list(domains)
+                self._fetched_at = time.time()
+                self._loaded = True
+                self._save_to_disk()
+            return list(self._domains)
+
+    def peek(self):
+        """Returns (domains, is_stale) from memory or disk without any network call."""
+        with self._lock:
+            if not self._loaded:
+                self._load_from_disk()
+            return list(self._domains), self._is_stale()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_quietly, daemon=True).start()
+
+    def get(self):
+        """Returns the cached domain list, fetching or refreshing it as needed."""
+        with self._lock:
+            if not self._loaded:
+                self._load_from_disk()
+            domains = list(self._domains)
+            stale = self._is_stale()
+
+        if not domains:
+            return self.refresh()
+        if stale:
+            self._refresh_in_background()
+        return domains
+
+    def invalidate(self):
+        """Drops the cached domains in memory and on disk."""
+        with self._lock:
+            self._domains = []
+            self._fetched_at = 0.0
+            self._loaded = True
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def decode_token_claims(token):
+    """Returns the (unverified) claims of a JWT as a dict, or {} if it can't be read."""
     try:
-        response = requests.get(f"{BASE_URL}/domains", timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        if data.get('hydra:member'):
-            return data['hydra:member'][0]['domain']
-        return None
-    except requests.RequestException as e:
-        print(f"Error getting domain: {e}")
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload.encode()))
+        return claims if isinstance(claims, dict) else {}
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return {}
+
+def decode_token_expiry(token):
+    """Returns the 'exp' claim of a JWT as a unix timestamp, or None if it can't be read."""
+    try:
+        return float(decode_token_claims(token)['exp'])
+    except (KeyError, ValueError, TypeError):
         return None
 
-# Word lists for meaningful names
-ADJECTIVES = [
-    "happy", "clever", "brave", "calm", "eager", "fancy", "gentle", "jolly", "kind", "lively",
-    "nice", "proud", "silly", "witty", "zealous", "swift", "bright", "cool", "fiery", "lucky",
-    "noble", "quiet", "royal", "super", "tiny", "wild", "young", "zesty", "epic", "rapid",
-    "azure", "amber", "crimson", "golden", "indigo", "jade", "lemon", "lime", "navy", "olive",
-    "teal", "violet", "white", "yellow", "rusty", "snowy", "sunny", "windy", "frosty", "misty"
-]
-
-ANIMALS = [
-    "panda", "tiger", "lion", "eagle", "hawk", "wolf", "bear", "fox", "deer", "koala",
-    "cat", "dog", "owl", "seal", "swan", "duck", "frog", "goat", "crab", "fish",
-    "shark", "whale", "dolphin", "zebra", "camel", "llama", "moose", "mouse", "rat", "rabbit",
-    "horse", "sheep", "cobra", "viper", "gecko", "iguana", "python", "turtle", "beetle", "butterfly",
-    "spider", "falcon", "otter", "badger", "beaver", "bison", "dingo", "hyena", "jaguar", "lemur"
-]
 
-def generate_username():
-    """Generates a meaningful username like 'happy-tiger-123'."""
-    adj = random.choice(ADJECTIVES)
-    noun = random.choice(ANIMALS)
-    num = random.randint(100, 999)
-    return f"{adj}-{noun}-{num}"
+class TokenCache:
+    """Per-address cache of JWTs that are reused until shortly before their 'exp' claim.
 
-def create_account():
-    """Creates a new random account and returns details (address, password, token)."""
-    domain = get_domain()
-    if not domain:
+    Tokens are persisted to a small file next to the saved emails so they survive
+    a restart. Writes are debounced: changes within `save_delay` seconds go out
+    as one rewrite (flush() forces it; it also runs at exit), so bulk creation
+    doesn't rewrite the file once per account. Passwords are only held in
+    memory, for re-authenticating on a 401.
+    """
+
+    def __init__(self, path=None, skew=TOKEN_EXPIRY_SKEW, save_delay=TOKEN_SAVE_DELAY):
+        self._path = path
+        self.skew = skew
+        self.save_delay = save_delay
+        self._tokens = {}       # address -> token
+        self._credentials = {}  # token -> (address, password)
+        self._replaced = {}     # stale token -> token that superseded it
+        self._loaded = False
+        self._dirty = False
+        self._save_timer = None
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    @property
+    def path(self):
+        if self._path is None:
+            import storage
+            self._path = storage.get_data_path(TOKEN_CACHE_FILE)
+        return self._path
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, 'r') as f:
+                self._tokens.update(json.load(f).get("tokens", {}))
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def _save(self):
+        try:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({"tokens": self._tokens}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving token cache: {e}")
+
+    def _schedule_save(self):
+        # Caller holds self._lock
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Writes pending changes to disk now."""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if self._dirty:
+                self._dirty = False
+                self._save()
+
+    def _is_fresh(self, token):
+        expiry = decode_token_expiry(token)
+        # Tokens without a readable expiry are trusted until the API rejects them
+        return expiry is None or expiry - self.skew > time.time()
+
+    def get(self, address):
+        """Returns a still-valid cached token for the address, or None."""
+        with self._lock:
+            self._ensure_loaded()
+            token = self._tokens.get(address)
+            if token and self._is_fresh(token):
+                return token
+            return None
+
+    def put(self, address, token, password=None):
+        with self._lock:
+            self._ensure_loaded()
+            old = self._tokens.get(address)
+            if old and old != token:
+                self._replaced[old] = token
+            self._tokens[address] = token
+            if password is not None:
+                self._credentials[token] = (address, password)
+            self._schedule_save()
+
+    def remember_password(self, address, password):
+        """Associates a password with the cached token so a 401 can re-authenticate."""
+        with self._lock:
+            token = self._tokens.get(address)
+            if token:
+                self._credentials[token] = (address, password)
+
+    def invalidate(self, address):
+        with self._lock:
+            self._ensure_loaded()
+            if self._tokens.pop(address, None) is not None:
+                self._schedule_save()
+
+    def credentials_for(self, token):
+        with self._lock:
+            return self._credentials.get(token)
+
+    def resolve(self, token):
+        """Maps a token that has since been renewed to its replacement."""
+        with self._lock:
+            seen = set()
+            while token in self._replaced and token not in seen:
+                seen.add(token)
+                token = self._replaced[token]
+            return token
+
+
+class RateLimited(requests.HTTPError):
+    """Raised when mail.tm keeps answering 429; retry_after is the server's wait hint in seconds."""
+
+    def __init__(self, *args, retry_after=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value, now=None):
+    """Parses a Retry-After header (delay in seconds or an HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
         return None
-        
-    # username = ''.join(random.choices(string.ascii_lowercase + string.digits, k=10))
-    username = generate_username()
-    password = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
-    address = f"{username}@{domain}"
-    
+    return max(0.0, when - (time.time() if now is None else now))
+
+
+class RateLimiter:
+    """Token bucket shared by all requests, served round-robin across accounts.
+
+    Callers queue per key (the account's token, or None for unauthenticated
+    calls). Whenever a token becomes available it goes to the oldest waiter
+    of the next key in turn, so one busy account can't starve the others.
+    pause() empties the bucket for a while, e.g. after a Retry-After.
+    """
+
+    def __init__(self, qps=DEFAULT_QPS, burst=DEFAULT_BURST):
+        self.qps = qps
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = {}   # key -> deque of waiter ids
+        self._turns = deque()  # keys with waiters, in serving order
+        self._next_id = 0
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.qps)
+        self._updated = now
+
+    def acquire(self, key=None):
+        """Blocks until the caller may send a request."""
+        if not self.qps:
+            return
+        with self._cond:
+            waiter = self._next_id
+            self._next_id += 1
+            if key not in self._waiters:
+                self._waiters[key] = deque()
+                self._turns.append(key)
+            self._waiters[key].append(waiter)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                is_next = self._turns[0] == key and self._waiters[key][0] == waiter
+                if is_next and now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    self._waiters[key].popleft()
+                    self._turns.popleft()
+                    if self._waiters[key]:
+                        self._turns.append(key)
+                    else:
+                        del self._waiters[key]
+                    self._cond.notify_all()
+                    return
+                if now < self._paused_until:
+                    timeout = self._paused_until - now
+                elif is_next:
+                    timeout = (1 - self._tokens) / self.qps
+                else:
+                    timeout = None  # Woken when the waiter ahead is served
+                self._cond.wait(timeout)
+
+    def reserve(self):
+        """Claims the next token without blocking and returns how long to wait before sending.
+
+        For callers that must not block a thread, such as the asyncio client, which
+        sleeps on its own loop. They share the bucket and pauses with acquire() callers
+        but not the round-robin queue.
+        """
+        if not self.qps:
+            return 0.0
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            delay = max(self._paused_until - now, (1 - self._tokens) / self.qps, 0.0)
+            self._tokens -= 1  # May go negative: later callers wait for the debt to refill
+            return delay
+
+    def paused_for(self):
+        """Seconds left in the current pause, 0 when not paused."""
+        with self._cond:
+            return max(0.0, self._paused_until - time.monotonic())
+
+    def pause(self, seconds):
+        """Holds back all requests for the given number of seconds."""
+        with self._cond:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self._updated = now
+            self._cond.notify_all()
+
+
+def _is_unknown_domain_error(error):
+    """True if a failed registration was rejected because of its domain."""
+    response = getattr(error, "response", None)
+    if response is None or response.status_code not in (400, 422):
+        return False
     try:
-        # Register
-        reg_response = requests.post(f"{BASE_URL}/accounts", json={
-            "address": address,
-            "password": password
-        }, timeout=10)
-        reg_response.raise_for_status()
-        
-        # Get Token
-        token = get_token(address, password)
+        body = response.text.lower()
+    except Exception:
+        return False
+    return "domain" in body
+
+
+def _is_address_taken_error(error):
+    """True if a failed registration was rejected because the address already exists."""
+    response = getattr(error, "response", None)
+    if response is None or response.status_code != 422:
+        return False
+    try:
+        body = response.text.lower()
+    except Exception:
+        return False
+    return "already used" in body
+
+
+class SingleFlight:
+    """Lets concurrent callers with the same key share one in-flight call.
+
+    The first caller runs the function; callers that arrive while it is still
+    running wait for it and receive the same result (or exception).
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if not leader:
+            metrics.increment("requests_coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+def _flight_key(method, path, endpoint, token, params):
+    if isinstance(params, dict):
+        params = tuple(sorted(params.items()))
+    return (method, endpoint, path, token, params)
+
+
+class SessionPool:
+    """Thread-safe pool of at most `size` sessions made by `factory` on demand."""
+
+    def __init__(self, factory, size):
+        self.factory = factory
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @contextmanager
+    def session(self):
+        """Borrows a session, creating one if the pool isn't full yet, else waiting for one."""
+        try:
+            session = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            session = self.factory() if can_create else self._idle.get()
+
+        try:
+            yield session
+        finally:
+            if self._closed:
+                session.close()
+            else:
+                self._idle.put(session)
+
+    def close(self):
+        """Closes all idle sessions; borrowed ones are closed when returned."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class MailTmClient:
+    """Mail.tm API client backed by a thread-safe pool of keep-alive sessions.
+
+    Each request borrows a requests.Session from the pool, so concurrent
+    callers never share one session and repeat calls reuse open TCP/TLS
+    connections instead of handshaking again. Streamed downloads hold their
+    session for the whole body, so they draw from a separate pool and can't
+    starve API calls (including the token refresh a download's 401 needs).
+    """
+
+    def __init__(self, base_url=BASE_URL, pool_size=4, keep_alive=True, timeouts=None,
+                 domain_ttl=DOMAIN_CACHE_TTL, domain_cache_path=None, token_cache_path=None,
+                 coalesce=True, qps=DEFAULT_QPS, burst=DEFAULT_BURST,
+                 max_rate_limit_wait=MAX_RATE_LIMIT_WAIT, download_pool_size=2):
+        self.base_url = base_url
+        self.coalesce = coalesce
+        self.limiter = RateLimiter(qps, burst)
+        self.max_rate_limit_wait = max_rate_limit_wait
+        self.pool_size = max(1, pool_size)
+        self.keep_alive = keep_alive
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+
+        self._pool = SessionPool(self._new_session, self.pool_size)
+        self._download_pool = SessionPool(self._new_session, download_pool_size)
+        self._flights = SingleFlight()
+        # Accounts registered by create_accounts() after its consumer stopped reading
+        self.unclaimed_accounts = []
+        self._unclaimed_lock = threading.Lock()
+
+        self.domain_cache = DomainCache(self.fetch_domains, ttl=domain_ttl, path=domain_cache_path)
+        self.token_cache = TokenCache(path=token_cache_path)
+
+    def _new_session(self):
+        session = requests.Session()
+        # One connection per session is enough: a session is only ever used by one thread at a time
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def session(self):
+        """Borrows a session from the API pool, creating one if the pool isn't full yet."""
+        return self._pool.session()
+
+    def download_session(self):
+        """Borrows a session from the pool reserved for streamed downloads."""
+        return self._download_pool.session()
+
+    def close(self):
+        """Closes all idle pooled sessions."""
+        self._pool.close()
+        self._download_pool.close()
+
+    def timeout_for(self, endpoint):
+        return self.timeouts.get(endpoint, 10)
+
+    def request(self, method, path, endpoint, token=None, **kwargs):
+        """Performs a request through a pooled session and raises for HTTP errors.
+
+        A 401 on an authenticated request re-authenticates once through the
+        token cache (when the account's password is known) and retries.
+        Concurrent identical GETs (same endpoint, token and params) are
+        coalesced into one HTTP request whose response they all share.
+        """
+        if self.coalesce and method == "GET" and not kwargs.get("stream"):
+            key = _flight_key(method, path, endpoint, token, kwargs.get("params"))
+            return self._flights.do(key, lambda: self._send(method, path, endpoint, token, **kwargs))
+        return self._send(method, path, endpoint, token, **kwargs)
+
+    def _send(self, method, path, endpoint, token=None, session=None, **kwargs):
+        headers = kwargs.pop("headers", {})
+        kwargs.setdefault("timeout", self.timeout_for(endpoint))
         if token:
-            return {
+            token = self.token_cache.resolve(token)
+            headers["Authorization"] = f"Bearer {token}"
+        response = self._send_limited(method, path, endpoint, token, headers, kwargs, session)
+
+        if response.status_code == 401 and token:
+            credentials = self.token_cache.credentials_for(token)
+            if credentials:
+                new_token = self.get_token(*credentials, force=True)
+                if new_token:
+                    response.close()
+                    headers["Authorization"] = f"Bearer {new_token}"
+                    response = self._send_limited(method, path, endpoint, new_token, headers, kwargs, session)
+
+        response.raise_for_status()
+        return response
+
+    def _send_limited(self, method, path, endpoint, token, headers, kwargs, session=None):
+        """Sends once through the rate limiter; a 429 pauses everyone and is retried once if the wait is short.
+
+        With a session given (e.g. one held for a streamed download) it is used instead of borrowing one.
+        """
+        for attempt in range(2):
+            paused = self.limiter.paused_for()
+            if paused > self.max_rate_limit_wait:
+                # Fail fast instead of tying up the caller for a long server-imposed pause
+                metrics.increment("rate_limited_fast_fail")
+                raise RateLimited(f"Rate limited for another {paused:.0f}s", retry_after=paused)
+            with metrics.timer("api.rate_limiter_wait"):
+                self.limiter.acquire(token)
+            start = time.perf_counter()
+            try:
+                if session is not None:
+                    response = session.request(method, f"{self.base_url}{path}", headers=headers, **kwargs)
+                else:
+                    with self.session() as pooled:
+                        response = pooled.request(method, f"{self.base_url}{path}", headers=headers, **kwargs)
+            except requests.RequestException as e:
+                metrics.observe_request(endpoint, time.perf_counter() - start, error=type(e).__name__)
+                raise
+            # Don't pull a streamed body into memory just to count it
+            nbytes = int(response.headers.get("Content-Length") or 0) if kwargs.get("stream") else len(response.content)
+            metrics.observe_request(endpoint, time.perf_counter() - start, status=response.status_code, nbytes=nbytes)
+            if response.status_code != 429:
+                return response
+            response.close()
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            wait = 1.0 if retry_after is None else retry_after
+            self.limiter.pause(wait)
+            if attempt or wait > self.max_rate_limit_wait:
+                break
+        raise RateLimited(f"429 Too Many Requests for url: {response.url}",
+                          response=response, retry_after=retry_after)
+
+    def fetch_domains(self):
+        """Fetches the list of active domains from the API (uncached); raises RateLimited rather than returning []."""
+        try:
+            data = self.request("GET", "/domains", "domains").json()
+            return [d['domain'] for d in data.get('hydra:member', []) if d.get('isActive', True)]
+        except RateLimited:
+            raise
+        except requests.RequestException as e:
+            print(f"Error getting domain: {e}")
+            return []
+
+    def get_domain(self):
+        """Returns a valid domain for account creation, served from the domain cache."""
+        domains = self.domain_cache.get()
+        return domains[0] if domains else None
+
+    def register(self, address, password):
+        """Registers an address, refreshing the domain cache once if the domain was rejected."""
+        try:
+            self.request("POST", "/accounts", "accounts", json={
+                "address": address,
+                "password": password
+            })
+            return address
+        except requests.HTTPError as e:
+            if not _is_unknown_domain_error(e):
+                raise
+            self.domain_cache.invalidate()
+            domain = self.get_domain()
+            if not domain or address.endswith(f"@{domain}"):
+                raise
+            address = f"{address.split('@')[0]}@{domain}"
+            self.request("POST", "/accounts", "accounts", json={
                 "address": address,
-                "password": password,
-                "token": token
-            }
+                "password": password
+            })
+            return address
+
+    def create_account(self):
+        """Creates a new random account and returns details (address, password, token).
+
+        Returns None on failure; raises RateLimited if mail.tm is throttling us.
+        """
+        domain = self.get_domain()
+        if not domain:
+            return None
+
+        generator = get_username_generator()
+        password = generate_password()
+
+        try:
+            # Register, moving on to a fresh name if this one is already taken
+            for attempt in range(USERNAME_ATTEMPTS):
+                candidate = f"{generator.generate()}@{domain}"
+                try:
+                    address = self.register(candidate, password)
+                    break
+                except requests.HTTPError as e:
+                    if not _is_address_taken_error(e):
+                        raise
+                    generator.mark_used(candidate)
+                    metrics.increment("accounts.username_conflicts")
+                    if attempt == USERNAME_ATTEMPTS - 1:
+                        raise
+
+            # Get Token
+            token = self.get_token(address, password)
+            if token:
+                return {
+                    "address": address,
+                    "password": password,
+                    "token": token
+                }
+            return None
+        except RateLimited:
+            raise
+        except requests.RequestException as e:
+            print(f"Error creating account: {e}")
+            return None
+
+    def _create_account_with_retries(self, retries, backoff):
+        for attempt in range(retries + 1):
+            delay = backoff * (2 ** attempt)
+            try:
+                account = self.create_account()
+            except RateLimited as e:
+                account = None
+                delay = max(delay, e.retry_after or 0)
+            if account:
+                return account
+            if attempt < retries:
+                time.sleep(delay)
         return None
-    except requests.RequestException as e:
-        print(f"Error creating account: {e}")
+
+    def create_accounts(self, n, concurrency=8, retries=2, backoff=0.5, save=False):
+        """Creates n accounts on a bounded thread pool, yielding each one as it completes.
+
+        Failed creations are retried up to `retries` times with exponential backoff;
+        accounts that still fail are skipped. With save=True the created accounts
+        are written to storage in a single batch once the stream ends. If the
+        caller stops early, queued creations are cancelled; accounts that
+        in-flight ones still register are saved too (with save=True) and kept
+        in self.unclaimed_accounts.
+        """
+        created = []
+        futures = []
+        handled = set()
+        # Keep the pool from outgrowing the connection pool it draws sessions from
+        workers = max(1, min(concurrency, n, self.pool_size))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = [executor.submit(self._create_account_with_retries, retries, backoff)
+                       for _ in range(n)]
+            for future in as_completed(futures):
+                handled.add(future)
+                account = future.result()
+                if account:
+                    created.append(account)
+                    yield account
+        finally:
+            # Stopped early: drop queued creations, but keep what the in-flight ones still register
+            leftover = [f for f in futures if f not in handled and not f.cancel()]
+            executor.shutdown(wait=False)
+            unclaimed = []
+            for future in leftover:
+                try:
+                    account = future.result()
+                except Exception:
+                    continue
+                if account:
+                    unclaimed.append(account)
+            if unclaimed:
+                with self._unclaimed_lock:
+                    self.unclaimed_accounts.extend(unclaimed)
+            self.token_cache.flush()
+            if save and (created or unclaimed):
+                import storage
+                storage.save_emails(created + unclaimed)
+
+    def get_token(self, address, password, force=False):
+        """Obtains a Bearer token for an existing account, reusing a cached one while it is valid."""
+        if not force:
+            token = self.token_cache.get(address)
+            if token:
+                self.token_cache.remember_password(address, password)
+                return token
+        try:
+            response = self.request("POST", "/token", "token", json={
+                "address": address,
+                "password": password
+            })
+            token = response.json().get('token')
+            if token:
+                self.token_cache.put(address, token, password)
+            else:
+                self.token_cache.invalidate(address)
+            return token
+        except RateLimited:
+            raise
+        except requests.RequestException as e:
+            if getattr(e, "response", None) is not None and e.response.status_code == 401:
+                self.token_cache.invalidate(address)
+            print(f"Error getting token: {e}")
+            return None
+
+    def fetch_messages_page(self, token, page):
+        """Returns (messages, next page number or None) for one page of the collection."""
+        params = {"page": page} if page > 1 else None
+        data = self.request("GET", "/messages", "messages", token=token, params=params).json()
+        return data.get('hydra:member', []), next_page_number(data, page)
+
+    def get_messages_page(self, token, page=1):
+        """Fetches one page of the message collection. Raises requests.RequestException (RateLimited on 429) on failure."""
+        return self.fetch_messages_page(token, page)[0]
+
+    def iter_message_pages(self, token, start_page=1, max_pages=None):
+        """Yields the message collection page by page (newest first), fetching each page only when asked for.
+
+        Follows hydra:view/hydra:next, so stopping iteration early stops the
+        fetching too. Errors are raised from next() like get_messages_page().
+        """
+        page = start_page
+        fetched = 0
+        while page and (max_pages is None or fetched < max_pages):
+            msgs, page = self.fetch_messages_page(token, page)
+            fetched += 1
+            if not msgs:
+                return
+            yield msgs
+
+    def iter_messages(self, token, start_page=1, max_pages=None):
+        """Yields messages one by one across pages, as each page arrives."""
+        for msgs in self.iter_message_pages(token, start_page, max_pages):
+            yield from msgs
+
+    def get_messages(self, token, page=1):
+        """Fetches list of messages using the Auth token; raises RateLimited rather than returning []."""
+        try:
+            return self.get_messages_page(token, page)
+        except RateLimited:
+            raise
+        except requests.RequestException as e:
+            print(f"Error fetching messages: {e}")
+            return []
+
+    def get_message_content(self, token, message_id):
+        """Fetches full message content."""
+        try:
+            response = self.request("GET", f"/messages/{message_id}", "message", token=token)
+            return response.json()
+        except RateLimited:
+            raise
+        except requests.RequestException as e:
+            print(f"Error fetching message content: {e}")
+            return None
+
+    def mark_message_as_seen(self, token, message_id):
+        """Marks a message as seen/read."""
+        try:
+            headers = {"Content-Type": "application/merge-patch+json"}
+            self.request("PATCH", f"/messages/{message_id}", "seen", token=token,
+                         json={"seen": True}, headers=headers)
+            return True
+        except RateLimited:
+            raise
+        except requests.RequestException as e:
+            print(f"Error marking message as seen: {e}")
+            return False
+
+    def download(self, path, dest, token, endpoint="download", chunk_size=DOWNLOAD_CHUNK_SIZE, resume=True):
+        """Streams GET path into dest chunk by chunk. Returns dest, or None on failure.
+
+        The body goes to dest + ".part" first and is renamed once complete; a
+        leftover .part file is resumed with a Range request. The session comes
+        from the download pool and is held until the body has been read.
+        """
+        part_path = dest + ".part"
+        offset = os.path.getsize(part_path) if resume and os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+            with self.download_session() as session:
+                try:
+                    response = self._send("GET", path, endpoint, token, session=session,
+                                          headers=headers, stream=True)
+                except requests.HTTPError as e:
+                    if offset and e.response is not None and e.response.status_code == 416:
+                        os.replace(part_path, dest)  # The partial file already holds the whole body
+                        return dest
+                    raise
+                with response:
+                    resumed = response.status_code == 206
+                    if resumed and not response.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                        raise requests.HTTPError(f"Unexpected Content-Range for {path}", response=response)
+                    with open(part_path, "ab" if resumed else "wb") as f:
+                        for chunk in response.iter_content(chunk_size):
+                            f.write(chunk)
+            os.replace(part_path, dest)
+            return dest
+        except RateLimited:
+            raise
+        except (requests.RequestException, OSError) as e:
+            print(f"Error downloading {path}: {e}")
+            return None
+
+    def download_message_source(self, token, message, dest_dir):
+        """Saves a message's raw source as <dest_dir>/<id>.eml. Accepts the message dict or its id."""
+        message_id = message['id'] if isinstance(message, dict) else message
+        path = (message.get('downloadUrl') if isinstance(message, dict) else None) or f"/messages/{message_id}/download"
+        return self.download(path, os.path.join(dest_dir, f"{safe_filename(message_id)}.eml"), token)
+
+    def download_attachments(self, token, message, dest_dir, workers=4):
+        """Downloads all attachments of a full message in parallel. Returns the saved paths (None for failures)."""
+        attachments = message.get('attachments') or []
+        if not attachments:
+            return []
+        used = set()
+        jobs = []
+        for attachment in attachments:
+            name = safe_filename(attachment.get('filename') or attachment.get('id') or "attachment")
+            base, ext = os.path.splitext(name)
+            n = 1
+            while name in used:  # Two attachments may share a filename
+                n += 1
+                name = f"{base} ({n}){ext}"
+            used.add(name)
+            path = attachment.get('downloadUrl') or f"/messages/{message['id']}/attachment/{attachment['id']}"
+            jobs.append((path, os.path.join(dest_dir, name)))
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs), self._download_pool.size))) as executor:
+            return list(executor.map(lambda job: self.download(job[0], job[1], token), jobs))
+
+
+def next_page_number(data, page):
+    """Next page of a hydra collection response, or None on the last page."""
+    view = data.get('hydra:view')
+    if isinstance(view, dict):
+        next_url = view.get('hydra:next')
+        if not next_url:
+            return None
+        try:
+            return int(parse_qs(urlparse(next_url).query).get('page', [page + 1])[0])
+        except ValueError:
+            return page + 1
+    # No view: a full page may have a successor, unless the total says otherwise
+    members = data.get('hydra:member', [])
+    total = data.get('hydra:totalItems')
+    if len(members) < MESSAGES_PAGE_SIZE or (total is not None and page * MESSAGES_PAGE_SIZE >= total):
         return None
+    return page + 1
+
+
+def safe_filename(name):
+    """Strips path separators and control characters from a server-supplied file name."""
+    name = os.path.basename(str(name).replace("\\", "/"))
+    name = "".join(c for c in name if c.isprintable() and c not in '<>:"|?*').strip(" .")
+    return name or "download"
+
+
+def get_download_dir(message_id):
+    """Returns the app data folder that downloads for a message are saved to."""
+    import storage
+    return storage.get_data_path(os.path.join(DOWNLOAD_DIR_NAME, safe_filename(message_id)))
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the shared client used by the module-level helpers."""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = MailTmClient()
+    return _default_client
+
+def configure(**kwargs):
+    """Replaces the shared client, e.g. configure(pool_size=8, timeouts={"messages": 5})."""
+    global _default_client
+    with _default_client_lock:
+        old = _default_client
+        _default_client = MailTmClient(**kwargs)
+    if old:
+        old.close()
+    return _default_client
+
+_username_generator = None
+_username_generator_lock = threading.Lock()
+
+def get_username_generator():
+    """Returns the shared UsernameGenerator, seeded with the saved addresses on first use."""
+    global _username_generator
+    with _username_generator_lock:
+        if _username_generator is None:
+            generator = usernames.UsernameGenerator()
+            try:
+                import storage
+                generator.seed(e.get('address', '') for e in storage.load_emails())
+            except Exception as e:
+                print(f"Error seeding username generator: {e}")
+            _username_generator = generator
+        return _username_generator
+
+def set_username_generator(generator):
+    """Replaces the shared generator, e.g. with a custom pattern or word lists."""
+    global _username_generator
+    with _username_generator_lock:
+        _username_generator = generator
+
+def generate_username():
+    """Generates a meaningful username like 'happy-tiger-123', skipping names already used."""
+    return get_username_generator().generate()
+
+def get_domain():
+    """Fetches a valid domain for account creation."""
+    return get_client().get_domain()
 
-def get_token(address, password):
+def create_account():
+    """Creates a new random account and returns details (address, password, token)."""
+    return get_client().create_account()
+
+def create_accounts(n, concurrency=8, retries=2, save=False):
+    """Creates n accounts concurrently, yielding each one as it completes."""
+    return get_client().create_accounts(n, concurrency=concurrency, retries=retries, save=save)
+
+def get_token(address, password, force=False):
     """Obtains a Bearer token for an existing account."""
-    try:
-        response = requests.post(f"{BASE_URL}/token", json={
-            "address": address,
-            "password": password
-        }, timeout=10)
-        response.raise_for_status()
-        return response.json().get('token')
-    except requests.RequestException as e:
-        print(f"Error getting token: {e}")
-        return None
+    return get_client().get_token(address, password, force=force)
+
+def get_cached_token(address, password=None):
+    """Returns a still-valid cached token for the address without any network call."""
+    cache = get_client().token_cache
+    token = cache.get(address)
+    if token and password is not None:
+        cache.remember_password(address, password)
+    return token
 
-def get_messages(token):
+def get_messages(token, page=1):
     """Fetches list of messages using the Auth token."""
-    try:
-        headers = {"Authorization": f"Bearer {token}"}
-        response = requests.get(f"{BASE_URL}/messages", headers=headers, timeout=10)
-        response.raise_for_status()
-        return response.json().get('hydra:member', [])
-    except requests.RequestException as e:
-        print(f"Error fetching messages: {e}")
-        return []
+    return get_client().get_messages(token, page)
+
+def get_messages_page(token, page=1):
+    """Fetches one page of messages, raising requests.RequestException on failure."""
+    return get_client().get_messages_page(token, page)
+
+def fetch_messages_page(token, page):
+    """Fetches one page of messages and the number of the next one (None on the last page)."""
+    return get_client().fetch_messages_page(token, page)
+
+def iter_message_pages(token, start_page=1, max_pages=None):
+    """Lazily yields pages (lists) of messages, newest first."""
+    return get_client().iter_message_pages(token, start_page, max_pages)
+
+def iter_messages(token, start_page=1, max_pages=None):
+    """Lazily yields messages across all pages, newest first."""
+    return get_client().iter_messages(token, start_page, max_pages)
 
 def get_message_content(token, message_id):
     """Fetches full message content."""
-    try:
-        headers = {"Authorization": f"Bearer {token}"}
-        response = requests.get(f"{BASE_URL}/messages/{message_id}", headers=headers, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        print(f"Error fetching message content: {e}")
-        return None
+    return get_client().get_message_content(token, message_id)
 
 def mark_message_as_seen(token, message_id):
     """Marks a message as seen/read."""
-    try:
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/merge-patch+json"
-        }
-        data = {"seen": True}
-        response = requests.patch(f"{BASE_URL}/messages/{message_id}", json=data, headers=headers, timeout=10)
-        response.raise_for_status()
-        return True
-    except requests.RequestException as e:
-        print(f"Error marking message as seen: {e}")
-        return False
+    return get_client().mark_message_as_seen(token, message_id)
+
+def download_message_source(token, message, dest_dir=None):
+    """Streams a message's raw .eml to the downloads folder and returns its path."""
+    message_id = message['id'] if isinstance(message, dict) else message
+    return get_client().download_message_source(token, message, dest_dir or get_download_dir(message_id))
+
+def download_attachments(token, message, dest_dir=None, workers=4):
+    """Streams all attachments of a full message to the downloads folder in parallel."""
+    return get_client().download_attachments(token, message, dest_dir or get_download_dir(message['id']), workers)
@@ -0,0 +1,483 @@
+"""Asyncio-native Mail.tm client.
+
+Mirrors the operations in api_client but runs every request on the event loop,
+so thousands of inbox checks can be in flight on a single thread. It speaks
+HTTP/1.1 directly over asyncio streams (no extra dependencies), keeps idle
+keep-alive connections in a per-host pool and bounds concurrency with a
+semaphore. Cancelling a task closes its connection instead of reusing it.
+Requests draw from the blocking client's RateLimiter, so both sides stay
+under one budget, and a 429 that outlasts max_rate_limit_wait raises
+AsyncRateLimited instead of looking like an empty result.
+
+From a script:
+
+    async with AsyncMailTmClient() as client:
+        inboxes = await client.poll_inboxes(tokens)
+
+From Tk, run coroutines on a BackgroundLoop and hand results back with root.after.
+"""
+import asyncio
+import json
+import ssl
+import threading
+import time
+from urllib.parse import urlsplit
+
+import api_client
+import metrics
+
+
+class AsyncHTTPError(Exception):
+    """Raised for non-2xx responses, like requests' HTTPError in the blocking client."""
+
+    def __init__(self, status, body=b"", headers=None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+        super().__init__(f"HTTP {status}")
+
+
+class AsyncRateLimited(AsyncHTTPError):
+    """Raised when mail.tm keeps answering 429, like api_client.RateLimited; retry_after is in seconds."""
+
+    def __init__(self, status=429, body=b"", headers=None, retry_after=None):
+        super().__init__(status, body, headers)
+        self.retry_after = retry_after
+
+
+class _Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body) if self.body else {}
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise AsyncHTTPError(self.status, self.body, self.headers)
+
+
+class _Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class AsyncMailTmClient:
+    """Async counterpart of api_client.MailTmClient.
+
+    Shares the token cache and rate limiter with the blocking client by default,
+    so an account authenticated on either side is reused by both and their
+    requests count against the same budget.
+    """
+
+    def __init__(self, base_url=api_client.BASE_URL, concurrency=64, max_idle_per_host=None,
+                 timeouts=None, token_cache=None, domain_cache=None, limiter=None,
+                 max_rate_limit_wait=None):
+        parts = urlsplit(base_url)
+        self.base_url = base_url
+        self._scheme = parts.scheme
+        self._host = parts.hostname
+        self._port = parts.port or (443 if parts.scheme == "https" else 80)
+        self._prefix = parts.path.rstrip("/")
+
+        self.concurrency = max(1, concurrency)
+        self.max_idle = max_idle_per_host or self.concurrency
+        self.timeouts = dict(api_client.DEFAULT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+
+        shared = api_client.get_client()
+        self.token_cache = token_cache or shared.token_cache
+        self.domain_cache = domain_cache or shared.domain_cache
+        self.limiter = limiter or shared.limiter
+        self.max_rate_limit_wait = (shared.max_rate_limit_wait if max_rate_limit_wait is None
+                                    else max_rate_limit_wait)
+
+        self._idle = []
+        self._semaphore = None
+        self._domain_fetch = None  # In-flight GET /domains shared by concurrent get_domain() calls
+        self._ssl_context = ssl.create_default_context() if self._scheme == "https" else None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """Closes all idle keep-alive connections."""
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _get_semaphore(self):
+        # Created lazily so the client can be built outside of a running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _connect(self, timeout):
+        while self._idle:
+            conn = self._idle.pop()
+            if not conn.reader.at_eof() and not conn.writer.is_closing():
+                return conn, True
+            conn.close()
+        # Bounded like the read, so a peer that stalls the TCP or TLS handshake can't hold a semaphore slot forever
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self._host, self._port, ssl=self._ssl_context), timeout)
+        return _Connection(reader, writer), False
+
+    def _release(self, conn):
+        if len(self._idle) < self.max_idle and not conn.writer.is_closing():
+            self._idle.append(conn)
+        else:
+            conn.close()
+
+    async def _read_response(self, reader, method):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed before response")
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        reusable = headers.get("connection", "").lower() != "close"
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            body = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip(), 16)
+                if size == 0:
+                    # Skip trailers up to the terminating blank line
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await reader.read()
+            reusable = False
+        return _Response(status, headers, body), reusable
+
+    async def _send(self, method, path, headers, body, timeout):
+        request_headers = {
+            "Host": self._host if self._port in (80, 443) else f"{self._host}:{self._port}",
+            "Accept": "*/*",
+            "Connection": "keep-alive",
+            "Content-Length": str(len(body)),
+        }
+        request_headers.update(headers)
+        head = f"{method} {self._prefix}{path} HTTP/1.1\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in request_headers.items()) + "\r\n"
+        payload = head.encode("latin-1") + body
+
+        for attempt in range(2):
+            conn, reused = await self._connect(timeout)
+            try:
+                conn.writer.write(payload)
+                await asyncio.wait_for(conn.writer.drain(), timeout)
+                response, reusable = await asyncio.wait_for(self._read_response(conn.reader, method), timeout)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                conn.close()
+                # An idle keep-alive connection may have been dropped by the server; retry once fresh
+                if reused and attempt == 0:
+                    continue
+                raise ConnectionError(str(e)) from e
+            except BaseException:
+                # Includes cancellation and timeouts: the connection state is unknown, so drop it
+                conn.close()
+                raise
+            if reusable:
+                self._release(conn)
+            else:
+                conn.close()
+            return response
+
+    async def _send_limited(self, method, path, endpoint, headers, body, timeout):
+        """Sends once through the rate limiter; a 429 pauses everyone and is retried once if the wait is short."""
+        for attempt in range(2):
+            paused = self.limiter.paused_for()
+            if paused > self.max_rate_limit_wait:
+                metrics.increment("rate_limited_fast_fail")
+                raise AsyncRateLimited(retry_after=paused)
+            delay = self.limiter.reserve()
+            if delay:
+                with metrics.timer("api.rate_limiter_wait"):
+                    await asyncio.sleep(delay)
+            async with self._get_semaphore():
+                start = time.perf_counter()
+                try:
+                    response = await self._send(method, path, headers, body, timeout)
+                except (OSError, asyncio.TimeoutError) as e:
+                    metrics.observe_request(endpoint, time.perf_counter() - start, error=type(e).__name__)
+                    raise
+            metrics.observe_request(endpoint, time.perf_counter() - start, status=response.status,
+                                    nbytes=len(response.body))
+            if response.status != 429:
+                return response
+            retry_after = api_client.parse_retry_after(response.headers.get("retry-after"))
+            wait = 1.0 if retry_after is None else retry_after
+            self.limiter.pause(wait)
+            if attempt or wait > self.max_rate_limit_wait:
+                break
+        raise AsyncRateLimited(response.status, response.body, response.headers, retry_after=retry_after)
+
+    async def request(self, method, path, endpoint, token=None, json_body=None, headers=None):
+        """Performs a request under the rate limiter and concurrency semaphore; raises AsyncHTTPError for HTTP errors.
+
+        Like the blocking client, a 401 re-authenticates once through the token cache and retries,
+        and a 429 raises AsyncRateLimited.
+        """
+        headers = dict(headers or {})
+        body = b""
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers.setdefault("Content-Type", "application/json")
+        if token:
+            token = self.token_cache.resolve(token)
+            headers["Authorization"] = f"Bearer {token}"
+        timeout = self.timeouts.get(endpoint, 10)
+
+        response = await self._send_limited(method, path, endpoint, headers, body, timeout)
+
+        if response.status == 401 and token:
+            credentials = self.token_cache.credentials_for(token)
+            if credentials:
+                new_token = await self.get_token(*credentials, force=True)
+                if new_token:
+                    headers["Authorization"] = f"Bearer {new_token}"
+                    response = await self._send_limited(method, path, endpoint, headers, body, timeout)
+
+        response.raise_for_status()
+        return response
+
+    async def fetch_domains(self):
+        """Fetches the list of active domains from the API (uncached); raises AsyncRateLimited rather than returning []."""
+        try:
+            data = (await self.request("GET", "/domains", "domains")).json()
+            return [d['domain'] for d in data.get('hydra:member', []) if d.get('isActive', True)]
+        except AsyncRateLimited:
+            raise
+        except (AsyncHTTPError, OSError, asyncio.TimeoutError, ValueError) as e:
+            print(f"Error getting domain: {e}")
+            return []
+
+    async def _refresh_domains(self):
+        try:
+            fetched = await self.fetch_domains()
+            return self.domain_cache.store(fetched) if fetched else None
+        finally:
+            self._domain_fetch = None
+
+    async def get_domain(self):
+        """Returns a valid domain for account creation, using the shared domain cache.
+
+        On a cold or stale cache, concurrent callers share one GET /domains.
+        """
+        domains, stale = self.domain_cache.peek()
+        if not domains or stale:
+            if self._domain_fetch is None:
+                self._domain_fetch = asyncio.ensure_future(self._refresh_domains())
+            # Shielded so one caller being cancelled doesn't cancel the fetch for the others
+            domains = await asyncio.shield(self._domain_fetch) or domains
+        return domains[0] if domains else None
+
+    async def create_account(self):
+        """Creates a new random account and returns details (address, password, token).
+
+        Returns None on failure; raises AsyncRateLimited if mail.tm is throttling us.
+        """
+        domain = await self.get_domain()
+        if not domain:
+            return None
+
+        generator = api_client.get_username_generator()
+        password = api_client.generate_password()
+
+        try:
+            # Move on to a fresh name if /accounts says this one is already taken
+            for attempt in range(api_client.USERNAME_ATTEMPTS):
+                address = f"{generator.generate()}@{domain}"
+                try:
+                    await self.request("POST", "/accounts", "accounts", json_body={
+                        "address": address,
+                        "password": password
+                    })
+                    break
+                except AsyncHTTPError as e:
+                    if e.status != 422 or b"already used" not in e.body.lower():
+                        raise
+                    generator.mark_used(address)
+                    metrics.increment("accounts.username_conflicts")
+                    if attempt == api_client.USERNAME_ATTEMPTS - 1:
+                        raise
+            token = await self.get_token(address, password)
+            if token:
+                return {
+                    "address": address,
+                    "password": password,
+                    "token": token
+                }
+            return None
+        except AsyncRateLimited:
+            raise
+        except (AsyncHTTPError, OSError, asyncio.TimeoutError) as e:
+            print(f"Error creating account: {e}")
+            return None
+
+    async def create_accounts(self, n, retries=2, backoff=0.5):
+        """Creates n accounts concurrently, yielding each one as it completes."""
+        async def create_with_retries():
+            for attempt in range(retries + 1):
+                delay = backoff * (2 ** attempt)
+                try:
+                    account = await self.create_account()
+                except AsyncRateLimited as e:
+                    account = None
+                    delay = max(delay, e.retry_after or 0)
+                if account:
+                    return account
+                if attempt < retries:
+                    await asyncio.sleep(delay)
+            return None
+
+        tasks = [asyncio.ensure_future(create_with_retries()) for _ in range(n)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                account = await next_done
+                if account:
+                    yield account
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_token(self, address, password, force=False):
+        """Obtains a Bearer token for an existing account, reusing a cached one while it is valid."""
+        if not force:
+            token = self.token_cache.get(address)
+            if token:
+                self.token_cache.remember_password(address, password)
+                return token
+        try:
+            response = await self.request("POST", "/token", "token", json_body={
+                "address": address,
+                "password": password
+            })
+            token = response.json().get('token')
+            if token:
+                self.token_cache.put(address, token, password)
+            return token
+        except AsyncRateLimited:
+            raise
+        except (AsyncHTTPError, OSError, asyncio.TimeoutError, ValueError) as e:
+            if isinstance(e, AsyncHTTPError) and e.status == 401:
+                self.token_cache.invalidate(address)
+            print(f"Error getting token: {e}")
+            return None
+
+    async def get_messages(self, token):
+        """Fetches list of messages using the Auth token; raises AsyncRateLimited rather than returning []."""
+        try:
+            response = await self.request("GET", "/messages", "messages", token=token)
+            return response.json().get('hydra:member', [])
+        except AsyncRateLimited:
+            raise
+        except (AsyncHTTPError, OSError, asyncio.TimeoutError, ValueError) as e:
+            print(f"Error fetching messages: {e}")
+            return []
+
+    async def get_message_content(self, token, message_id):
+        """Fetches full message content."""
+        try:
+            response = await self.request("GET", f"/messages/{message_id}", "message", token=token)
+            return response.json()
+        except AsyncRateLimited:
+            raise
+        except (AsyncHTTPError, OSError, asyncio.TimeoutError, ValueError) as e:
+            print(f"Error fetching message content: {e}")
+            return None
+
+    async def mark_message_as_seen(self, token, message_id):
+        """Marks a message as seen/read."""
+        try:
+            await self.request("PATCH", f"/messages/{message_id}", "seen", token=token,
+                               json_body={"seen": True},
+                               headers={"Content-Type": "application/merge-patch+json"})
+            return True
+        except AsyncRateLimited:
+            raise
+        except (AsyncHTTPError, OSError, asyncio.TimeoutError) as e:
+            print(f"Error marking message as seen: {e}")
+            return False
+
+    async def poll_inboxes(self, tokens):
+        """Fetches the message lists of many accounts at once.
+
+        Returns {token: messages}; an inbox that couldn't be read because of rate
+        limiting maps to None rather than to an empty list.
+        """
+        async def poll(token):
+            try:
+                return await self.get_messages(token)
+            except AsyncRateLimited:
+                return None
+
+        results = await asyncio.gather(*(poll(t) for t in tokens))
+        return dict(zip(tokens, results))
+
+    async def mark_messages_as_seen(self, token, message_ids):
+        """Marks several messages as seen concurrently. Returns {message_id: success}."""
+        results = await asyncio.gather(*(self.mark_message_as_seen(token, m) for m in message_ids))
+        return dict(zip(message_ids, results))
+
+
+class BackgroundLoop:
+    """Runs an asyncio event loop on a daemon thread next to the Tk main loop.
+
+    submit() returns a concurrent.futures.Future; cancel it to cancel the coroutine.
+    Deliver results to Tk with root.after(0, ...) from a done-callback.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self, timeout=1.0):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+
+def run(coro):
+    """Runs a coroutine to completion from a plain script."""
+    return asyncio.run(coro)
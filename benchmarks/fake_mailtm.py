@@ -0,0 +1,392 @@
+"""Local stand-in for the mail.tm endpoints the app uses.
+
+Serves /domains, /accounts, /token, /me, /messages, /messages/{id} (GET and
+PATCH) from memory on a background thread, plus a Mercure-style event stream
+at /.well-known/mercure that replays from Last-Event-ID. Latency, server errors
+and 429s can be injected to see how the client behaves under a slow or
+throttling server:
+
+    server = FakeMailTm(latency=0.05, error_rate=0.01, rate_limit_qps=8).start()
+    client = api_client.MailTmClient(base_url=server.url, ...)
+    ...
+    server.stop()
+"""
+import base64
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+PAGE_SIZE = 30
+DOMAIN = "bench.test"
+MERCURE_PATH = "/.well-known/mercure"
+
+
+def make_token(address, ttl=3600):
+    """Builds an unsigned JWT carrying the claims api_client reads (username, exp)."""
+    def part(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+    claims = {"username": address, "exp": int(time.time()) + ttl, "jti": uuid.uuid4().hex}
+    return f"{part({'alg': 'none', 'typ': 'JWT'})}.{part(claims)}.sig"
+
+
+def make_message(index, created_at=None, text_size=2000, attachments=0, attachment_size=256 * 1024):
+    msg_id = uuid.uuid4().hex[:24]
+    created = time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(time.time() if created_at is None else created_at))
+    summary = {
+        "@id": f"/messages/{msg_id}",
+        "@type": "Message",
+        "id": msg_id,
+        "from": {"address": f"sender{index}@example.com", "name": f"Sender {index}"},
+        "subject": f"Benchmark message {index}",
+        "intro": "Lorem ipsum dolor sit amet",
+        "seen": False,
+        "isDeleted": False,
+        "createdAt": created,
+    }
+    summary["hasAttachments"] = bool(attachments)
+    detail = dict(summary, text=("Lorem ipsum dolor sit amet. " * (text_size // 28 + 1))[:text_size],
+                  html=[], downloadUrl=f"/messages/{msg_id}/download", attachments=[
+                      {"id": f"ATTACH{n:06d}", "filename": f"file{n}.bin", "contentType": "application/octet-stream",
+                       "size": attachment_size, "downloadUrl": f"/messages/{msg_id}/attachment/ATTACH{n:06d}"}
+                      for n in range(attachments)])
+    return summary, detail
+
+
+def message_source(detail):
+    """Raw RFC 822 source for a fake message."""
+    return (f"From: {detail['from']['name']} <{detail['from']['address']}>\r\n"
+            f"Subject: {detail['subject']}\r\nDate: {detail['createdAt']}\r\n"
+            f"Message-ID: <{detail['id']}@{DOMAIN}>\r\n\r\n{detail['text']}\r\n").encode()
+
+
+def attachment_bytes(attachment):
+    seed = attachment["id"].encode()
+    return (seed * (attachment["size"] // len(seed) + 1))[:attachment["size"]]
+
+
+class FakeMailTm:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit_qps=None,
+                 retry_after=1, throttle_rate=0.0, messages_per_account=0, text_size=2000,
+                 attachments_per_message=0, attachment_size=256 * 1024, sse_keepalive=15.0):
+        self.latency = latency              # seconds added to every response
+        self.jitter = jitter                # +/- random seconds on top of latency
+        self.error_rate = error_rate        # fraction of requests answered with a 500
+        self.rate_limit_qps = rate_limit_qps  # enforce a global QPS, answering 429 above it
+        self.retry_after = retry_after      # Retry-After sent with 429s
+        self.throttle_rate = throttle_rate  # fraction of requests answered with a 429 regardless of rate
+        self.messages_per_account = messages_per_account
+        self.text_size = text_size
+        self.attachments_per_message = attachments_per_message
+        self.attachment_size = attachment_size
+        self.sse_keepalive = sse_keepalive  # seconds between ":" comments on an idle event stream
+        self.stream_failures = 0            # answer this many upcoming stream requests with a 503
+
+        self.accounts = {}   # address -> password
+        self.tokens = {}     # token -> address
+        self.messages = {}   # address -> list of (summary, detail), newest first
+        self.events = {}     # address -> list of (event id, payload), oldest first
+        self.stream_connects = []  # (address, Last-Event-ID header, time.monotonic()) per stream opened
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0}
+        self._window = []    # send times within the last second, for rate_limit_qps
+        self._clock = 0.0    # createdAt of the newest message handed out
+        self._lock = threading.Lock()
+        self._events_changed = threading.Condition(self._lock)
+        self._event_seq = 0
+        self._stream_epoch = 0  # bumped by drop_streams() to end every open stream
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, host="127.0.0.1", port=0):
+        fake = self
+
+        class Handler(_Handler):
+            server_state = fake
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.drop_streams()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def add_messages(self, address, count):
+        with self._lock:
+            box = self.messages.setdefault(address, [])
+            # One second apart, every new message strictly newer than what the box already holds
+            self._clock = max(self._clock, time.time() - count)
+            for _ in range(count):
+                self._clock += 1
+                summary, detail = make_message(len(box), self._clock, self.text_size,
+                                               self.attachments_per_message, self.attachment_size)
+                box.insert(0, (summary, detail))
+                self._publish(address, summary)
+
+    def _publish(self, address, payload):
+        # Caller holds self._lock
+        self._event_seq += 1
+        self.events.setdefault(address, []).append((str(self._event_seq), payload))
+        self._events_changed.notify_all()
+
+    def publish(self, address, payload):
+        """Sends an event (e.g. an updated Message resource) to the account's stream subscribers."""
+        with self._lock:
+            self._publish(address, payload)
+
+    def drop_streams(self):
+        """Closes every open event stream, as a hub restart or network blip would."""
+        with self._lock:
+            self._stream_epoch += 1
+            self._events_changed.notify_all()
+
+    def _admit(self):
+        """Returns None to serve the request, or the status code to fail it with."""
+        with self._lock:
+            self.stats["requests"] += 1
+            now = time.monotonic()
+            if self.rate_limit_qps:
+                self._window = [t for t in self._window if now - t < 1.0]
+                if len(self._window) >= self.rate_limit_qps:
+                    self.stats["throttled"] += 1
+                    return 429
+                self._window.append(now)
+            if self.throttle_rate and random.random() < self.throttle_rate:
+                self.stats["throttled"] += 1
+                return 429
+            if self.error_rate and random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 500
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes
+    server_state = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/ld+json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _account(self):
+        auth = self.headers.get("Authorization", "")
+        token = auth[7:] if auth.startswith("Bearer ") else None
+        return self.server_state.tokens.get(token)
+
+    def _handle(self, method):
+        fake = self.server_state
+        body = self._body() if method in ("POST", "PATCH") else None
+        delay = fake.latency + (random.uniform(-fake.jitter, fake.jitter) if fake.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        failure = fake._admit()
+        if failure == 429:
+            return self._send(429, {"detail": "Too Many Requests"}, {"Retry-After": str(fake.retry_after)})
+        if failure:
+            return self._send(failure, {"detail": "Injected failure"})
+
+        path, _, query = self.path.partition("?")
+        if method == "GET" and path == "/domains":
+            return self._send(200, {"hydra:member": [{"id": "1", "domain": DOMAIN, "isActive": True}],
+                                    "hydra:totalItems": 1})
+        if method == "POST" and path == "/accounts":
+            return self._create_account(body)
+        if method == "POST" and path == "/token":
+            with fake._lock:
+                ok = fake.accounts.get(body.get("address")) == body.get("password")
+            if not ok:
+                return self._send(401, {"code": 401, "message": "Invalid credentials."})
+            token = make_token(body["address"])
+            with fake._lock:
+                fake.tokens[token] = body["address"]
+            return self._send(200, {"token": token, "id": body["address"]})
+
+        address = self._account()
+        if address is None:
+            return self._send(401, {"code": 401, "message": "JWT Token not found"})
+        if method == "GET" and path == "/me":
+            return self._send(200, {"id": address, "address": address})
+        if method == "GET" and path == MERCURE_PATH:
+            return self._stream_events(address, query)
+        if method == "GET" and path == "/messages":
+            return self._list_messages(address, query)
+        if path.startswith("/messages/"):
+            parts = path.split("/")
+            if len(parts) > 3 and method == "GET":
+                return self._download(address, parts[2], parts[3:])
+            return self._message(address, parts[2], method, body)
+        self._send(404, {"detail": "Not Found"})
+
+    def _create_account(self, body):
+        fake = self.server_state
+        address = body.get("address", "")
+        if not address.endswith(f"@{DOMAIN}"):
+            return self._send(422, {"violations": [{"propertyPath": "address",
+                                                    "message": "This domain is not valid."}]})
+        with fake._lock:
+            if address in fake.accounts:
+                return self._send(422, {"violations": [{"propertyPath": "address",
+                                                        "message": "This value is already used."}]})
+            fake.accounts[address] = body.get("password")
+        if fake.messages_per_account:
+            fake.add_messages(address, fake.messages_per_account)
+        self._send(201, {"id": uuid.uuid4().hex, "address": address})
+
+    def _stream_events(self, address, query):
+        fake = self.server_state
+        if f"/accounts/{address}" not in parse_qs(query).get("topic", []):
+            return self._send(403, {"detail": "Forbidden topic"})
+        last_id = self.headers.get("Last-Event-ID")
+        with fake._lock:
+            fake.stream_connects.append((address, last_id, time.monotonic()))
+            if fake.stream_failures > 0:
+                fake.stream_failures -= 1
+                failed = True
+            else:
+                failed = False
+            epoch = fake._stream_epoch
+            events = fake.events.get(address, [])
+            # Replay whatever the client missed since the last event it saw
+            cursor = len(events)
+            if last_id is not None:
+                cursor = next((i + 1 for i, (event_id, _) in enumerate(events) if event_id == last_id), 0)
+        if failed:
+            return self._send(503, {"detail": "Hub unavailable"})
+
+        # Chunked like the real hub, so clients see each event as soon as it is written
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def write_chunk(data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            write_chunk(b":ok\n\n")
+            while True:
+                with fake._lock:
+                    events = fake.events.get(address, [])
+                    if cursor >= len(events) and fake._stream_epoch == epoch:
+                        fake._events_changed.wait(fake.sse_keepalive)
+                    if fake._stream_epoch != epoch:
+                        break
+                    pending = events[cursor:]
+                    cursor = len(events)
+                out = "".join(f"id: {event_id}\ndata: {json.dumps(payload)}\n\n" for event_id, payload in pending)
+                write_chunk((out or ":\n\n").encode())
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            return
+
+    def _list_messages(self, address, query):
+        fake = self.server_state
+        page = 1
+        for pair in query.split("&"):
+            if pair.startswith("page="):
+                page = max(1, int(pair[5:] or 1))
+        with fake._lock:
+            box = fake.messages.get(address, [])
+            members = [summary for summary, _ in box[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]]
+            total = len(box)
+        view = {"@id": f"/messages?page={page}", "@type": "hydra:PartialCollectionView"}
+        if total > PAGE_SIZE:
+            last = (total + PAGE_SIZE - 1) // PAGE_SIZE
+            view.update({"hydra:first": "/messages?page=1", "hydra:last": f"/messages?page={last}"})
+            if page < last:
+                view["hydra:next"] = f"/messages?page={page + 1}"
+            if page > 1:
+                view["hydra:previous"] = f"/messages?page={page - 1}"
+        self._send(200, {"hydra:member": members, "hydra:totalItems": total, "hydra:view": view})
+
+    def _message(self, address, msg_id, method, body):
+        fake = self.server_state
+        found = None
+        with fake._lock:
+            for summary, detail in fake.messages.get(address, []):
+                if summary["id"] == msg_id:
+                    if method == "PATCH":
+                        summary["seen"] = detail["seen"] = bool(body.get("seen", True))
+                    found = dict(detail)
+                    break
+        if found is None:
+            return self._send(404, {"detail": "Not Found"})
+        self._send(200, found)
+
+    def _download(self, address, msg_id, rest):
+        fake = self.server_state
+        with fake._lock:
+            detail = next((d for s, d in fake.messages.get(address, []) if s["id"] == msg_id), None)
+        data = None
+        if detail and rest == ["download"]:
+            data, content_type = message_source(detail), "message/rfc822"
+        elif detail and rest[0] == "attachment" and len(rest) == 2:
+            attachment = next((a for a in detail["attachments"] if a["id"] == rest[1]), None)
+            if attachment:
+                data, content_type = attachment_bytes(attachment), attachment["contentType"]
+        if data is None:
+            return self._send(404, {"detail": "Not Found"})
+
+        status, start = 200, 0
+        range_header = self.headers.get("Range", "")
+        if range_header.startswith("bytes=") and range_header.endswith("-"):
+            start = int(range_header[6:-1] or 0)
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+        body = data[start:]
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
@@ -0,0 +1,249 @@
+"""Benchmarks for api_client and storage, run against a local fake mail.tm.
+
+Usage: python -m benchmarks.run [-o results.json] [--latency 0.02] [--sizes 1000,10000]
+
+Measures account creation throughput, inbox poll latency and message-open
+latency through api_client.MailTmClient, and storage insert, load, search and
+reorder times for every backend at each address-book size. Results are
+written as one JSON document so runs can be diffed for regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import api_client
+import search_index
+import storage
+from benchmarks.fake_mailtm import FakeMailTm, DOMAIN
+
+BACKENDS = ("sqlite", "journal", "json")
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+
+def summarize(samples):
+    """Latency summary in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+# --- API ---
+
+def bench_account_creation(client, count, concurrency):
+    start = time.perf_counter()
+    accounts = list(client.create_accounts(count, concurrency=concurrency, retries=2, backoff=0.1))
+    elapsed = time.perf_counter() - start
+    return {
+        "requested": count,
+        "created": len(accounts),
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "accounts_per_second": round(len(accounts) / elapsed, 2) if elapsed else None,
+    }, accounts
+
+
+def bench_poll(client, accounts, rounds):
+    samples, errors = [], 0
+    for _ in range(rounds):
+        for account in accounts:
+            start = time.perf_counter()
+            try:
+                client.get_messages_page(account['token'])
+                samples.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+    return dict(summarize(samples), errors=errors)
+
+
+def bench_message_open(client, accounts, limit):
+    samples, errors = [], 0
+    for account in accounts:
+        try:
+            ids = [m['id'] for m in client.get_messages_page(account['token'])]
+        except Exception:
+            errors += 1
+            continue
+        for msg_id in ids[:limit]:
+            start = time.perf_counter()
+            if client.get_message_content(account['token'], msg_id):
+                samples.append(time.perf_counter() - start)
+            else:
+                errors += 1
+    return dict(summarize(samples), errors=errors)
+
+
+def run_api(args, workdir):
+    server = FakeMailTm(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                        rate_limit_qps=args.server_qps, throttle_rate=args.throttle_rate,
+                        retry_after=args.retry_after, messages_per_account=args.messages).start()
+    client = api_client.MailTmClient(
+        base_url=server.url, pool_size=args.concurrency, qps=args.qps, burst=args.qps or 1,
+        domain_cache_path=os.path.join(workdir, "domains.json"),
+        token_cache_path=os.path.join(workdir, "tokens.json"))
+    try:
+        creation, accounts = bench_account_creation(client, args.accounts, args.concurrency)
+        results = {
+            "account_creation": creation,
+            "poll": bench_poll(client, accounts, args.poll_rounds),
+            "message_open": bench_message_open(client, accounts[:10], args.messages),
+        }
+        results["server"] = dict(server.stats)
+        return results
+    finally:
+        client.close()
+        server.stop()
+
+
+# --- Storage ---
+
+def make_backend(kind, directory):
+    json_path = os.path.join(directory, "saved_emails.json")
+    if kind == "json":
+        return storage.JsonStorage(path=json_path)
+    if kind == "journal":
+        return storage.JournalStorage(journal_path=os.path.join(directory, "saved_emails.journal"),
+                                      snapshot_path=os.path.join(directory, "saved_emails.snapshot.json"),
+                                      json_path=json_path)
+    return storage.SqliteStorage(path=os.path.join(directory, "saved_emails.db"), json_path=json_path)
+
+
+def close_backend(backend):
+    close = getattr(backend, "close", None)
+    if close:
+        close()
+
+
+def bench_storage(kind, size, workdir, moves=50, queries=20):
+    directory = tempfile.mkdtemp(prefix=f"{kind}-{size}-", dir=workdir)
+    accounts = [{"address": f"user{i:06d}-{random.randrange(10**6):06d}@{DOMAIN}", "password": "p" * 12}
+                for i in range(size)]
+    result = {"backend": kind, "size": size}
+    try:
+        backend = make_backend(kind, directory)
+        result["insert_s"], _ = timed(backend.add_many, accounts)
+        close_backend(backend)
+
+        # Cold load from disk, then a warm (cached) one
+        backend = make_backend(kind, directory)
+        result["cold_load_s"], records = timed(backend.load)
+        result["warm_load_s"], _ = timed(backend.load)
+        result["loaded"] = len(records)
+
+        index = search_index.SearchIndex()
+        result["index_build_s"], _ = timed(index.rebuild, records)
+        terms = [r['address'][4:9] for r in random.sample(records, min(queries, len(records)))]
+        samples = [timed(index.search, term)[0] for term in terms]
+        result["search"] = summarize(samples)
+
+        samples = []
+        for _ in range(moves):
+            address = random.choice(records)['address']
+            samples.append(timed(backend.move, address, random.randrange(size))[0])
+        result["move"] = summarize(samples)
+
+        samples = [timed(backend.get, random.choice(records)['address'])[0] for _ in range(queries)]
+        result["get"] = summarize(samples)
+        close_backend(backend)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    for key in ("insert_s", "cold_load_s", "warm_load_s", "index_build_s"):
+        result[key] = round(result[key], 4)
+    return result
+
+
+def run_storage(args, workdir):
+    results = []
+    for size in args.sizes:
+        for kind in args.backends:
+            print(f"storage: {kind} x {size}", file=sys.stderr)
+            results.append(bench_storage(kind, size, workdir, moves=args.moves))
+    return results
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", help="write results to FILE (default: stdout)")
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--skip-storage", action="store_true")
+
+    api = parser.add_argument_group("api")
+    api.add_argument("--accounts", type=int, default=50, help="accounts to create (default: 50)")
+    api.add_argument("--concurrency", type=int, default=8)
+    api.add_argument("--messages", type=int, default=30, help="messages per account (default: 30)")
+    api.add_argument("--poll-rounds", type=int, default=5)
+    api.add_argument("--qps", type=float, default=0, help="client rate limit, 0 = off (default: 0)")
+
+    server = parser.add_argument_group("fake server")
+    server.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    server.add_argument("--jitter", type=float, default=0.0)
+    server.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses")
+    server.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of random 429 responses")
+    server.add_argument("--server-qps", type=float, default=None, help="answer 429 above this rate")
+    server.add_argument("--retry-after", type=int, default=1)
+
+    store = parser.add_argument_group("storage")
+    store.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                       help="comma-separated address-book sizes (default: 1000,10000,100000)")
+    store.add_argument("--backends", default=",".join(BACKENDS))
+    store.add_argument("--moves", type=int, default=50)
+
+    args = parser.parse_args(argv)
+    args.sizes = [int(s) for s in args.sizes.split(",") if s]
+    args.backends = [b for b in args.backends.split(",") if b]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="tempmail-bench-")
+    results = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+    }
+    try:
+        if not args.skip_api:
+            print("api: running against the fake server", file=sys.stderr)
+            results["api"] = run_api(args, workdir)
+        if not args.skip_storage:
+            results["storage"] = run_storage(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
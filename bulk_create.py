@@ -0,0 +1,40 @@
+"""Command-line entry point for creating many Mail.tm accounts at once.
+
+Usage: python bulk_create.py 500 --concurrency 16 --save > accounts.jsonl
+"""
+import argparse
+import json
+import sys
+
+import api_client
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create disposable Mail.tm accounts in bulk.")
+    parser.add_argument("count", type=int, help="number of accounts to create")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="parallel registrations (default: 8)")
+    parser.add_argument("-r", "--retries", type=int, default=2, help="retries per failed account (default: 2)")
+    parser.add_argument("--save", action="store_true", help="add the created accounts to saved addresses")
+    parser.add_argument("--no-token", action="store_true", help="omit the bearer token from the output")
+    args = parser.parse_args(argv)
+
+    # Keep enough pooled sessions around for every worker
+    api_client.configure(pool_size=args.concurrency)
+
+    created = 0
+    for account in api_client.create_accounts(args.count, concurrency=args.concurrency,
+                                              retries=args.retries, save=args.save):
+        if args.no_token:
+            account = {k: v for k, v in account.items() if k != "token"}
+        sys.stdout.write(json.dumps(account) + "\n")
+        sys.stdout.flush()
+        created += 1
+
+    if created < args.count:
+        print(f"Created {created} of {args.count} accounts", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""Headless command-line interface for scripts and CI.
+
+Usage: python -m cli <command> [options]
+
+  create [--save]                  create an account
+  list [--filter TEXT]             list saved addresses (without passwords)
+  login ADDRESS                    print a bearer token for a saved address
+  wait ADDRESS [--timeout S]       block until a new message arrives
+  read ADDRESS [MESSAGE_ID]        print a message (the newest by default)
+  export [-o FILE]                 dump all saved addresses, passwords included
+
+Every command prints JSON on stdout. Errors are printed as {"error": ...} on
+stderr with a non-zero exit code (3 when mail.tm is rate limiting). Nothing
+here imports tkinter, and the HTTP client is only imported by the commands
+that go to the network, so list/export start as fast as Python itself.
+"""
+import argparse
+import json
+import sys
+import time
+
+import storage
+
+EXIT_ERROR = 1
+EXIT_TIMEOUT = 2
+EXIT_RATE_LIMITED = 3
+
+
+class CliError(Exception):
+    def __init__(self, message, code=EXIT_ERROR, **extra):
+        super().__init__(message)
+        self.code = code
+        self.extra = extra
+
+
+def emit(data):
+    sys.stdout.write(json.dumps(data, indent=2) + "\n")
+
+
+def public_record(record):
+    return {k: v for k, v in record.items() if k != "password"}
+
+
+def credentials(address, password=None):
+    """Returns (address, password) from the arguments or saved addresses."""
+    if password:
+        return address, password
+    record = storage.get_email(address)
+    if not record:
+        raise CliError(f"{address} is not a saved address; pass --password")
+    return record['address'], record['password']
+
+
+def login(address, password=None):
+    import api_client
+    address, password = credentials(address, password)
+    token = api_client.get_token(address, password)
+    if not token:
+        raise CliError(f"Could not log in to {address}")
+    return token
+
+
+def cmd_create(args):
+    import api_client
+    account = api_client.create_account()
+    if not account:
+        raise CliError("Failed to create an account")
+    if args.save:
+        storage.save_email(account['address'], account['password'])
+    emit(account)
+
+
+def cmd_list(args):
+    records = storage.load_emails()
+    if args.filter:
+        import search_index
+        index = search_index.SearchIndex()
+        index.rebuild(records)
+        matches = index.search(args.filter)
+        records = [r for r in records if r.get('address') in matches]
+    emit([public_record(r) for r in records])
+
+
+def cmd_login(args):
+    emit({"address": args.address, "token": login(args.address, args.password)})
+
+
+def matches(msg, sender, subject):
+    from_field = msg.get('from') or {}
+    if sender and sender.lower() not in f"{from_field.get('name', '')} {from_field.get('address', '')}".lower():
+        return False
+    if subject and subject.lower() not in (msg.get('subject') or '').lower():
+        return False
+    return True
+
+
+def cmd_wait(args):
+    import api_client
+    token = login(args.address, args.password)
+    seen = set() if args.existing else {m['id'] for m in api_client.get_messages_page(token)}
+    deadline = time.monotonic() + args.timeout
+    while True:
+        for msg in api_client.get_messages_page(token):
+            if msg['id'] not in seen and matches(msg, args.sender, args.subject):
+                emit(api_client.get_message_content(token, msg['id']) if args.full else msg)
+                return
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise CliError(f"No matching message within {args.timeout}s", code=EXIT_TIMEOUT)
+        time.sleep(min(args.interval, remaining))
+
+
+def cmd_read(args):
+    import api_client
+    token = login(args.address, args.password)
+    message_id = args.message_id
+    if not message_id:
+        msgs = api_client.get_messages_page(token)
+        if not msgs:
+            raise CliError(f"{args.address} has no messages")
+        message_id = msgs[0]['id']
+    message = api_client.get_message_content(token, message_id)
+    if not message:
+        raise CliError(f"Could not read message {message_id}")
+    emit(message)
+
+
+def cmd_export(args):
+    records = storage.load_emails()
+    if args.output:
+        storage.atomic_write_json(args.output, {"emails": records}, indent=4)
+        emit({"exported": len(records), "path": args.output})
+    else:
+        emit({"emails": records})
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Headless Mail.tm temp mail client.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("create", help="create a new account")
+    p.add_argument("--save", action="store_true", help="add it to saved addresses")
+    p.set_defaults(func=cmd_create)
+
+    p = commands.add_parser("list", help="list saved addresses")
+    p.add_argument("-f", "--filter", help="only addresses whose fields contain TEXT")
+    p.set_defaults(func=cmd_list)
+
+    for name, func, text in (("login", cmd_login, "print a bearer token"),
+                             ("wait", cmd_wait, "wait for a new message"),
+                             ("read", cmd_read, "print a message as JSON")):
+        p = commands.add_parser(name, help=text)
+        p.add_argument("address")
+        p.add_argument("-p", "--password", help="password, if the address isn't saved")
+        p.set_defaults(func=func)
+        if name == "wait":
+            p.add_argument("-t", "--timeout", type=float, default=120, help="seconds to wait (default: 120)")
+            p.add_argument("-i", "--interval", type=float, default=3, help="seconds between checks (default: 3)")
+            p.add_argument("--from", dest="sender", help="sender name or address contains TEXT")
+            p.add_argument("--subject", help="subject contains TEXT")
+            p.add_argument("--existing", action="store_true", help="also accept messages already in the inbox")
+            p.add_argument("--full", action="store_true", help="print the full message instead of the summary")
+        elif name == "read":
+            p.add_argument("message_id", nargs="?", help="message id (default: newest)")
+
+    p = commands.add_parser("export", help="export saved addresses with passwords")
+    p.add_argument("-o", "--output", help="write to FILE instead of stdout")
+    p.set_defaults(func=cmd_export)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+        return 0
+    except CliError as e:
+        error = {"error": str(e), **e.extra}
+        code = e.code
+    except Exception as e:
+        # Only the network commands can get here with a network error, so api_client is already imported
+        api_client = sys.modules.get("api_client")
+        if api_client and isinstance(e, api_client.RateLimited):
+            error, code = {"error": "rate limited", "retry_after": e.retry_after}, EXIT_RATE_LIMITED
+        elif api_client and isinstance(e, api_client.requests.RequestException):
+            error, code = {"error": str(e)}, EXIT_ERROR
+        else:
+            # Storage failures, unreadable files or malformed payloads: still one JSON line, no traceback
+            error, code = {"error": str(e) or type(e).__name__, "type": type(e).__name__}, EXIT_ERROR
+    sys.stderr.write(json.dumps(error) + "\n")
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
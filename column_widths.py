@@ -0,0 +1,91 @@
+"""Incremental column autosizing for Treeviews.
+
+ColumnWidthEngine memoizes measured text widths per font and keeps, for every
+column, a count of how many rows need each width. Adding, editing or removing a
+row only touches that row's cells, and the column width is the largest width
+still in use, so nothing is re-measured unless the font changes.
+"""
+from collections import Counter
+
+
+class ColumnWidthEngine:
+    def __init__(self, columns, min_widths=None, cell_padding=25, header_padding=20,
+                 max_width=800, default_min=50):
+        self.columns = list(columns)
+        self.min_widths = min_widths or {}
+        self.cell_padding = cell_padding
+        self.header_padding = header_padding
+        self.max_width = max_width
+        self.default_min = default_min
+
+        self._font = None
+        self._font_spec = None
+        self._measured = {}  # text -> pixel width in the current font
+        self._rows = {}      # row key -> tuple of cell texts
+        self._counts = [Counter() for _ in self.columns]  # per column: width -> number of rows
+        self._max = [0] * len(self.columns)
+
+    def set_font(self, font_spec):
+        """Switches fonts; cached measurements are dropped and all rows re-measured."""
+        if font_spec == self._font_spec:
+            return
+        from tkinter import font
+        self._font_spec = font_spec
+        self._font = font.Font(font=font_spec)
+        self._measured = {}
+        rows = self._rows
+        self._rows = {}
+        self._counts = [Counter() for _ in self.columns]
+        self._max = [0] * len(self.columns)
+        for key, values in rows.items():
+            self.add(key, values)
+
+    def measure(self, text):
+        width = self._measured.get(text)
+        if width is None:
+            width = self._font.measure(text)
+            self._measured[text] = width
+        return width
+
+    def clear(self):
+        self._rows = {}
+        self._counts = [Counter() for _ in self.columns]
+        self._max = [0] * len(self.columns)
+
+    def add(self, key, values):
+        values = tuple(str(v) for v in values[:len(self.columns)])
+        if key in self._rows:
+            self.remove(key)
+        self._rows[key] = values
+        for i, text in enumerate(values):
+            width = self.measure(text) + self.cell_padding
+            self._counts[i][width] += 1
+            if width > self._max[i]:
+                self._max[i] = width
+
+    def remove(self, key):
+        values = self._rows.pop(key, None)
+        if values is None:
+            return
+        for i, text in enumerate(values):
+            width = self.measure(text) + self.cell_padding
+            counts = self._counts[i]
+            counts[width] -= 1
+            if counts[width] <= 0:
+                del counts[width]
+                if width == self._max[i]:
+                    # Next widest among the distinct widths still in use
+                    self._max[i] = max(counts, default=0)
+
+    def update(self, key, values):
+        self.add(key, values)
+
+    def widths(self):
+        """Returns {column: width}, honouring header width, minimums and the cap."""
+        result = {}
+        for i, col in enumerate(self.columns):
+            width = max(self.measure(col) + self.header_padding,
+                        self.min_widths.get(col, self.default_min),
+                        self._max[i])
+            result[col] = min(width, self.max_width)
+        return result
@@ -0,0 +1,142 @@
+"""Incremental inbox synchronisation.
+
+InboxSync remembers which messages the inbox view already shows (id, seen flag,
+createdAt) plus a createdAt watermark. Each refresh pages through /messages
+newest-first only until it reaches messages it already knows, and produces an
+InboxDiff holding just the inserts, removals and seen-flag changes to apply.
+Older pages are not fetched up front; add_older() merges them in as the view
+asks for them.
+"""
+import threading
+
+from api_client import MESSAGES_PAGE_SIZE
+
+
+class InboxDiff:
+    """Changes between the known inbox state and the server."""
+
+    def __init__(self, inserted=None, updated=None, removed=None):
+        self.inserted = inserted or []  # New messages, newest first
+        self.updated = updated or []    # Known messages whose seen flag changed
+        self.removed = removed or []    # Ids of messages that are gone
+        self.more = False               # True when older pages were left unfetched
+
+    def __bool__(self):
+        return bool(self.inserted or self.updated or self.removed)
+
+
+class InboxSync:
+    def __init__(self, page_size=MESSAGES_PAGE_SIZE, max_pages=None):
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.messages = {}  # id -> {"seen": bool, "createdAt": str}
+        self.watermark = ""  # createdAt of the newest known message
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.messages = {}
+            self.watermark = ""
+
+    def _state(self, msg):
+        return {"seen": bool(msg.get('seen', False)), "createdAt": msg.get('createdAt', '')}
+
+    def plan(self, pages):
+        """Consumes pages (an iterable of message lists, newest first) until known messages are reached.
+
+        Pass a lazy pager such as api_client.iter_message_pages(token): pages
+        past the point where nothing new can appear are never fetched. The
+        first sync reads only the first page. Exceptions raised by the pager
+        propagate to the caller. Safe to call from a worker thread; the state
+        only changes in apply().
+        """
+        with self._lock:
+            first_sync = not self.messages
+            watermark = self.watermark
+
+        fetched = []
+        page = 0
+        complete = True
+        iterator = iter(pages)
+        for msgs in iterator:
+            page += 1
+            fetched.extend(msgs)
+            if len(msgs) < self.page_size:
+                break
+            if first_sync or (self.max_pages and page >= self.max_pages):
+                complete = False
+                break
+            with self._lock:
+                reached_known = any(m.get('id') in self.messages for m in msgs)
+            if reached_known or msgs[-1].get('createdAt', '') <= watermark:
+                complete = False
+                break
+        close = getattr(iterator, "close", None)
+        if close:
+            close()
+
+        diff = InboxDiff()
+        fetched_ids = set()
+        with self._lock:
+            for msg in fetched:
+                msg_id = msg.get('id')
+                fetched_ids.add(msg_id)
+                known = self.messages.get(msg_id)
+                if known is None:
+                    diff.inserted.append(msg)
+                elif known["seen"] != bool(msg.get('seen', False)):
+                    diff.updated.append(msg)
+
+            # Only messages inside the fetched window can be judged as removed
+            oldest = min((m.get('createdAt', '') for m in fetched), default=None)
+            for msg_id, known in self.messages.items():
+                if msg_id in fetched_ids:
+                    continue
+                if complete or (oldest is not None and known["createdAt"] >= oldest):
+                    diff.removed.append(msg_id)
+        diff.more = not complete
+        return diff
+
+    def add_older(self, msgs):
+        """Records a page of older messages loaded on demand. Returns the ones not already known."""
+        added = []
+        with self._lock:
+            for msg in msgs:
+                if msg.get('id') not in self.messages:
+                    self._record(msg)
+                    added.append(msg)
+        return added
+
+    def apply(self, diff):
+        """Records a diff as applied to the view."""
+        with self._lock:
+            for msg_id in diff.removed:
+                self.messages.pop(msg_id, None)
+            for msg in diff.inserted + diff.updated:
+                self._record(msg)
+
+    def _record(self, msg):
+        state = self._state(msg)
+        self.messages[msg.get('id')] = state
+        if state["createdAt"] > self.watermark:
+            self.watermark = state["createdAt"]
+
+    def upsert(self, msg):
+        """Records a single pushed message. Returns 'insert', 'update' or None if unchanged."""
+        with self._lock:
+            known = self.messages.get(msg.get('id'))
+            self._record(msg)
+            if known is None:
+                return 'insert'
+            if known != self.messages[msg.get('id')]:
+                return 'update'
+            return None
+
+    def remove(self, msg_id):
+        with self._lock:
+            return self.messages.pop(msg_id, None) is not None
+
+    def mark_seen(self, msg_id):
+        with self._lock:
+            if msg_id in self.messages:
+                self.messages[msg_id]["seen"] = True
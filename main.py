@@ -1,13 +1,25 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, font
+from tkinter import ttk, messagebox
 import api_client
+import column_widths
+import inbox_sync
+import message_cache
+import message_render
+import metrics
+import realtime
+import search_index
 import storage
-import threading
+import tasks
+import virtual_list
+import watcher
 import time
 
+import os
 import sys
 import platform
 
+METRICS_FILE_ENV_VAR = "TEMPMAIL_METRICS_FILE" # Prometheus textfile to refresh periodically
+
 class EmailApp:
     def __init__(self, root):
         self.root = root
@@ -39,6 +51,29 @@ class EmailApp:
         self.is_fetching_msgs = False
         self.is_editing_saved = False
         self.is_dark_mode = True 
+        self.stream = None
+        self.stream_connected = False
+        self.inbox_sync = inbox_sync.InboxSync()
+        self.older_page = None # Next older page to load as the inbox is scrolled, or None
+        self.older_started = False # Set once the first refresh for the account has landed
+        self.is_loading_older = False
+        self.row_height = 35 # Significantly taller used for touch/readability
+        self.visible_saved = set() # addresses that match the search filter
+        self.search_index = search_index.SearchIndex()
+        self.saved_widths = column_widths.ColumnWidthEngine(
+            ["Address", "Stage", "Prod", "Name", "Unread"],
+            min_widths={"Address": 150, "Stage": 60, "Prod": 60, "Name": 80, "Unread": 70})
+        self.applied_saved_widths = {}
+        self.unread_counts = {}
+        self.watcher = watcher.InboxWatcher(self.on_watcher_update)
+        self.message_cache = message_cache.MessageCache(
+            spill_dir=storage.get_data_path(message_cache.SPILL_DIR_NAME))
+        self.message_open_started = None
+        self.current_message = None # Full message shown in the reading pane
+        self.render_cache = message_render.RenderCache()
+        self.diagnostics_window = None
+        self.metrics_file = os.environ.get(METRICS_FILE_ENV_VAR)
+        self.executor = tasks.TaskExecutor(workers=4, dispatch=lambda fn: self.root.after(0, fn))
         
         # Styles
         self.style = ttk.Style()
@@ -55,19 +90,16 @@ class EmailApp:
         
         # Start Polling
         self.start_polling()
+        self.watcher.start()
+        if self.metrics_file:
+            self.export_metrics_periodically()
 
-    def run_in_thread(self, target, args=(), callback=None):
-        """Helper to run a task in a background thread and call callback safely."""
-        def wrapper():
-            try:
-                result = target(*args)
-                if callback:
-                    self.root.after(0, lambda: callback(result))
-            except Exception as e:
-                print(f"Thread error: {e}")
-        
-        thread = threading.Thread(target=wrapper, daemon=True)
-        thread.start()
+    def run_in_thread(self, target, args=(), callback=None, lane="interactive", key=None):
+        """Runs a task on the shared executor and calls callback on the Tk thread.
+
+        Tasks sharing a key supersede each other: only the newest one's callback runs.
+        """
+        return self.executor.submit(target, args, callback=callback, lane=lane, key=key)
 
     def apply_theme(self):
         # Premium/Modern Color Palettes
@@ -131,7 +163,7 @@ class EmailApp:
         self.style.configure("TPanedwindow", background=self.colors["bg"])
         
         # Treeview styles - Essential for modern look
-        row_height = 35 # Significantly taller used for touch/readability
+        row_height = self.row_height
         self.style.configure("Treeview", 
             background=self.colors["input_bg"], 
             foreground=self.colors["input_fg"],
@@ -151,6 +183,7 @@ class EmailApp:
             foreground=[('selected', self.colors["select_fg"])])
             
         self.style.configure("Unread.Treeview", font=(self.listbox_font[0], self.listbox_font[1], "bold")) 
+        self.saved_widths.set_font(self.listbox_font)
         self.saved_tree.tag_configure('active', foreground=self.colors['success'], font=(self.listbox_font[0], self.listbox_font[1], "bold"))
         
         # Manual Widget Updates
@@ -205,6 +238,9 @@ class EmailApp:
         
         btn_theme = ttk.Button(top_bar, text="🌗 Theme", command=self.toggle_theme)
         btn_theme.pack(side=tk.RIGHT, padx=5)
+
+        btn_diagnostics = ttk.Button(top_bar, text="📊", width=4, command=self.show_diagnostics)
+        btn_diagnostics.pack(side=tk.RIGHT, padx=5)
         
         # separator
         ttk.Separator(self.root, orient='horizontal').pack(fill='x', padx=20, pady=5)
@@ -244,21 +280,24 @@ class EmailApp:
         tree_scroll = ttk.Scrollbar(tree_frame)
         tree_scroll.pack(side=tk.RIGHT, fill=tk.Y)
         
-        self.saved_tree = ttk.Treeview(tree_frame, columns=("Address", "Stage", "Prod", "Name"), show="headings", selectmode="browse", yscrollcommand=tree_scroll.set)
-        tree_scroll.config(command=self.saved_tree.yview)
+        self.saved_tree = ttk.Treeview(tree_frame, columns=("Address", "Stage", "Prod", "Name", "Unread"), show="headings", selectmode="browse")
+        # Only the rows in view are real Treeview items; the view maps them to addresses
+        self.saved_view = virtual_list.VirtualTreeview(self.saved_tree, tree_scroll, row_height=self.row_height,
+                                                       on_select=lambda: self.on_saved_email_select(None))
         
         self.saved_tree.heading("Address", text="Address")
         self.saved_tree.heading("Stage", text="Stage")
         self.saved_tree.heading("Prod", text="Prod")
         self.saved_tree.heading("Name", text="Name")
+        self.saved_tree.heading("Unread", text="Unread")
         
         self.saved_tree.column("Address", width=200)
         self.saved_tree.column("Stage", width=70)
         self.saved_tree.column("Prod", width=70)
         self.saved_tree.column("Name", width=100)
+        self.saved_tree.column("Unread", width=70, anchor=tk.CENTER)
         
         self.saved_tree.pack(fill=tk.BOTH, expand=True)
-        self.saved_tree.bind('<<TreeviewSelect>>', self.on_saved_email_select)
         self.saved_tree.bind('<Triple-Button-1>', self.login_to_saved_email)
         self.saved_tree.bind('<Double-1>', self.on_saved_email_double_click)
         
@@ -284,8 +323,10 @@ class EmailApp:
         inbox_scroll = ttk.Scrollbar(inbox_tree_frame)
         inbox_scroll.pack(side=tk.RIGHT, fill=tk.Y)
 
-        self.tree = ttk.Treeview(inbox_tree_frame, columns=("Sender", "Subject", "Date"), show="headings", selectmode="browse", yscrollcommand=inbox_scroll.set)
-        inbox_scroll.config(command=self.tree.yview)
+        self.tree = ttk.Treeview(inbox_tree_frame, columns=("Sender", "Subject", "Date"), show="headings", selectmode="browse")
+        self.inbox_view = virtual_list.VirtualTreeview(self.tree, inbox_scroll, row_height=self.row_height,
+                                                       on_select=lambda: self.on_message_select(None),
+                                                       on_scroll=self.maybe_load_older)
         
         self.tree.heading("Sender", text="Sender")
         self.tree.heading("Subject", text="Subject")
@@ -296,144 +337,366 @@ class EmailApp:
         self.tree.column("Date", width=150)
         
         self.tree.pack(fill=tk.BOTH, expand=True)
-        self.tree.bind('<<TreeviewSelect>>', self.on_message_select)
         
         # Message Content
         content_frame = ttk.LabelFrame(right_paned, text=" Message ", padding="15")
         right_paned.add(content_frame, weight=3) # Give more weight to reading area
+
+        msg_actions = ttk.Frame(content_frame)
+        msg_actions.pack(fill=tk.X, pady=(0, 10))
+        self.btn_save_source = ttk.Button(msg_actions, text="⬇ Save .eml", state="disabled", command=self.download_message_source)
+        self.btn_save_source.pack(side=tk.LEFT, padx=(0, 5))
+        self.btn_attachments = ttk.Button(msg_actions, text="📎 Attachments", state="disabled", command=self.download_attachments)
+        self.btn_attachments.pack(side=tk.LEFT, padx=5)
+        self.download_var = tk.StringVar()
+        ttk.Label(msg_actions, textvariable=self.download_var).pack(side=tk.LEFT, padx=10)
         
         self.msg_text = tk.Text(content_frame, font=self.message_font, wrap=tk.WORD, state="disabled", highlightthickness=0, borderwidth=0)
         self.msg_text.pack(fill=tk.BOTH, expand=True)
+        self.msg_writer = message_render.ChunkedWriter(self.msg_text)
+
+    def rate_limit_message(self, error):
+        wait = f" Try again in {int(error.retry_after) + 1}s." if error.retry_after else " Try again shortly."
+        return "Mail.tm is rate limiting requests." + wait
 
     def generate_new_email(self):
         self.email_var.set("Generating...")
         
+        def task():
+            try:
+                return api_client.create_account()
+            except api_client.RateLimited as e:
+                return e
+
         def on_done(account):
-            if account:
+            if isinstance(account, api_client.RateLimited):
+                messagebox.showwarning("Rate Limited", self.rate_limit_message(account))
+                self.email_var.set("Rate limited")
+            elif account:
                 self.set_current_account(account['address'], account['password'], account['token'])
             else:
                 messagebox.showerror("Error", "Failed to generate email.")
                 self.email_var.set("Error")
         
-        self.run_in_thread(api_client.create_account, callback=on_done)
+        self.run_in_thread(task, callback=on_done, key="account")
 
 
     def set_current_account(self, address, password, token):
+        previous_email = self.current_email
         self.current_email = address
         self.current_password = password
         self.current_token = token
         
         self.email_var.set(address)
+        self.start_stream(token)
         
         # Clear UI
-        self.tree.delete(*self.tree.get_children())
-        self.msg_text.config(state="normal")
-        self.msg_text.delete(1.0, tk.END)
-        self.msg_text.config(state="disabled")
-        
-        self.load_saved_emails() # Refresh to update active highlight
-        self.refresh_inbox(force=True)
+        self.inbox_view.clear()
+        self.inbox_sync.reset()
+        self.older_page = None
+        self.older_started = False
+        self.is_loading_older = False
+        self.is_fetching_msgs = False # Any in-flight refresh belongs to the previous account
+        self.show_status_text("")
+        self.set_current_message(None)
+        
+        self.executor.invalidate("message") # Don't show a message from the previous account
+        self.update_active_saved_rows(previous_email, address)
+        self.refresh_inbox(lane="interactive")
+
+    def start_stream(self, token):
+        """Subscribes to push updates for the current account, replacing any previous stream."""
+        if self.stream:
+            self.stream.stop()
+        self.stream_connected = False
+
+        def on_event(data):
+            self.root.after(0, lambda: self.on_stream_event(stream_ref, data))
+
+        def on_state(connected):
+            self.root.after(0, lambda: self.on_stream_state(stream_ref, connected))
+
+        stream_ref = realtime.MercureSubscriber(token, on_event, on_state)
+        self.stream = stream_ref.start()
 
-    def refresh_inbox(self, force=False):
+    def on_stream_state(self, stream, connected):
+        if stream is not self.stream:
+            return # Event from a stream we already replaced
+        self.stream_connected = connected
+        if connected:
+            # Catch up on anything that arrived while the stream was down
+            self.refresh_inbox()
+
+    def on_stream_event(self, stream, data):
+        if stream is not self.stream:
+            return
+        if data.get('@type') == 'Message' or data.get('@id', '').startswith('/messages/'):
+            self.upsert_message_row(data)
+
+    def message_row(self, msg):
+        """Returns (values, tags) for a message's row in the inbox tree."""
+        raw_date = msg.get('createdAt', '')
+        date_str = raw_date.replace('T', ' ')[:16] if 'T' in raw_date else raw_date
+        sender_name = msg.get('from', {}).get('name') or msg.get('from', {}).get('address')
+        is_seen = msg.get('seen', False)
+        tags = ('unread',) if not is_seen else ()
+        return (sender_name, msg.get('subject'), date_str, msg.get('id')), tags
+
+    def upsert_message_row(self, msg):
+        """Inserts a pushed message at the top of the inbox, or updates its existing row."""
+        msg_id = msg.get('id')
+        if msg.get('isDeleted'):
+            self.inbox_sync.remove(msg_id)
+            self.inbox_view.delete(msg_id)
+            return
+
+        values, tags = self.message_row(msg)
+        change = self.inbox_sync.upsert(msg)
+        if self.inbox_view.exists(msg_id):
+            if change:
+                self.inbox_view.update(msg_id, values=values, tags=tags)
+        else:
+            self.inbox_view.insert(msg_id, values, tags, index=0)
+            self.prefetch_messages([msg])
+        self.tree.tag_configure('unread', font=(self.listbox_font[0], self.listbox_font[1], 'bold'))
+
+    def prefetch_messages(self, msgs):
+        """Warms the message cache with unread (newly arrived) messages in the background."""
+        token = self.current_token
+        unread_ids = [m['id'] for m in msgs if not m.get('seen', False)]
+        if token and unread_ids:
+            self.message_cache.prefetch(unread_ids, lambda msg_id: api_client.get_message_content(token, msg_id))
+
+    def refresh_inbox(self, lane="background"):
         if not self.current_token or self.is_fetching_msgs:
             return
 
         self.is_fetching_msgs = True
+        token = self.current_token
+        started = time.perf_counter()
         
         def task():
             try:
-                return api_client.get_messages(self.current_token)
+                return self.inbox_sync.plan(api_client.iter_message_pages(token))
             except Exception as e:
                 print(f"Error fetching messages: {e}")
                 return None
 
-        def on_done(msgs):
+        def on_done(diff):
+            if token != self.current_token:
+                return # Account switched while fetching
             self.is_fetching_msgs = False
-            if msgs is None: return
-            
-            existing_ids = {self.tree.item(item)['values'][3] for item in self.tree.get_children()}
-            new_ids = {m['id'] for m in msgs}
-            
-            if existing_ids == new_ids and not force:
-                 # Update tags for read/unread
-                 for msg in msgs:
-                     item_id = next((i for i in self.tree.get_children() if self.tree.item(i)['values'][3] == msg['id']), None)
-                     if item_id:
-                         current_tags = self.tree.item(item_id, 'tags')
-                         is_seen = msg.get('seen', False)
-                         if not is_seen and 'unread' not in current_tags:
-                             self.tree.item(item_id, tags=('unread',))
-                         elif is_seen and 'unread' in current_tags:
-                             self.tree.item(item_id, tags=())
-                 return
-                
-            self.tree.delete(*self.tree.get_children())
-            for msg in msgs:
-                raw_date = msg.get('createdAt', '')
-                date_str = raw_date.replace('T', ' ')[:16] if 'T' in raw_date else raw_date
-                sender_name = msg.get('from', {}).get('name') or msg.get('from', {}).get('address')
-                is_seen = msg.get('seen', False)
-                tags = ('unread',) if not is_seen else ()
-                self.tree.insert("", "end", values=(sender_name, msg.get('subject'), date_str, msg.get('id')), tags=tags)
-            
-            self.tree.tag_configure('unread', font=(self.listbox_font[0], self.listbox_font[1], 'bold'))
+            if diff is None: return # Fetch failed; the next refresh tries again
+
+            if diff:
+                self.apply_inbox_diff(diff, started)
+
+            if not self.older_started:
+                self.older_started = True
+                if diff.more:
+                    # Only the first page was read (stream events may have landed first); fetch the rest on scroll
+                    self.older_page = 2
+                    self.inbox_view.render_now()
+                    self.maybe_load_older()
 
-        self.run_in_thread(task, callback=on_done)
+        # A newer refresh (e.g. after an account switch) drops this one's result
+        self.run_in_thread(task, callback=on_done, lane=lane, key="inbox")
+
+    def apply_inbox_diff(self, diff, started):
+        """Applies a refresh's changes to the inbox view instead of rebuilding the tree."""
+        render_started = time.perf_counter()
+        self.inbox_view.delete(*diff.removed)
+
+        for msg in diff.updated:
+            if self.inbox_view.exists(msg['id']):
+                self.inbox_view.update(msg['id'], tags=self.message_row(msg)[1])
+
+        # A stream event may have added some of these rows while plan() ran; refresh those in place
+        inserted = []
+        for msg in diff.inserted:
+            values, tags = self.message_row(msg)
+            if self.inbox_view.exists(msg['id']):
+                self.inbox_view.update(msg['id'], values=values, tags=tags)
+            else:
+                inserted.append((msg, values, tags))
+
+        # New mail is newest-first; on an empty tree append, otherwise stack on top
+        position = "end" if not len(self.inbox_view) else 0
+        for msg, values, tags in (inserted if position == "end" else reversed(inserted)):
+            self.inbox_view.insert(msg['id'], values, tags, index=position)
+
+        self.inbox_sync.apply(diff)
+        if self.older_started:
+            # The first refresh fills the whole page; only mail arriving after it is worth warming
+            self.prefetch_messages([msg for msg, _, _ in inserted])
+        self.tree.tag_configure('unread', font=(self.listbox_font[0], self.listbox_font[1], 'bold'))
+        now = time.perf_counter()
+        metrics.observe("ui.refresh_render", now - render_started)
+        metrics.observe("ui.refresh_total", now - started)
+
+    def maybe_load_older(self):
+        """Loads the next older page once the inbox is scrolled near its bottom."""
+        if self.older_page is None or self.is_loading_older or not self.inbox_view.at_end(margin=10):
+            return
+        self.is_loading_older = True
+        page = self.older_page
+        token = self.current_token
+
+        def task():
+            try:
+                return api_client.fetch_messages_page(token, page)
+            except Exception as e:
+                print(f"Error fetching older messages: {e}")
+                return e
+
+        def on_done(result):
+            if token != self.current_token or page != self.older_page:
+                return # Account switched while loading
+            self.is_loading_older = False
+            if isinstance(result, Exception):
+                return # older_page is unchanged, so scrolling again retries the same page
+            msgs, next_page = result
+            self.older_page = next_page if msgs else None # None once the oldest page is reached
+            for msg in self.inbox_sync.add_older(msgs):
+                values, tags = self.message_row(msg)
+                self.inbox_view.insert(msg['id'], values, tags)
+            self.inbox_view.render_now()
+            self.maybe_load_older() # Still at the bottom (e.g. a tall window): keep going
+
+        self.run_in_thread(task, callback=on_done, key="older")
 
     def on_message_select(self, event):
-        selected_item = self.tree.selection()
-        if not selected_item:
+        msg_id = self.inbox_view.selection()
+        if not msg_id:
             return
-            
-        item = self.tree.item(selected_item)
-        msg_id = item['values'][3]
         
-        self.tree.item(selected_item, tags=()) 
-        threading.Thread(target=self.mark_as_read_async, args=(msg_id,), daemon=True).start()
+        self.inbox_view.update(msg_id, tags=()) 
+        self.inbox_sync.mark_seen(msg_id)
+        if self.current_email:
+            self.watcher.poll_soon(self.current_email) # Refresh its unread badge
+        self.run_in_thread(self.mark_as_read_async, args=(self.current_token, msg_id), lane="background")
         
+        self.message_open_started = time.perf_counter()
         self.load_message_content(msg_id)
 
-    def mark_as_read_async(self, msg_id):
+    def mark_as_read_async(self, token, msg_id):
         try:
-            api_client.mark_message_as_seen(self.current_token, msg_id)
+            api_client.mark_message_as_seen(token, msg_id)
         except:
             pass
 
     def load_message_content(self, msg_id):
-        self.msg_text.config(state="normal")
-        self.msg_text.delete(1.0, tk.END)
-        self.msg_text.insert(tk.END, "Loading message content...")
-        self.msg_text.config(state="disabled")
+        cached = self.message_cache.get(msg_id)
+        metrics.increment("message_cache_hit" if cached else "message_cache_miss")
+        if cached:
+            self.executor.invalidate("message") # A slower earlier load must not replace it
+            self.show_message_content(cached)
+            return
+
+        self.set_current_message(None)
+        self.show_status_text("Loading message content...")
+        token = self.current_token
         
         def task():
             try:
-                return api_client.get_message_content(self.current_token, msg_id)
+                return api_client.get_message_content(token, msg_id)
+            except api_client.RateLimited as e:
+                return e
             except:
                 return None
 
         def on_done(full_msg):
-            self.msg_text.config(state="normal")
-            self.msg_text.delete(1.0, tk.END)
-            
+            if isinstance(full_msg, api_client.RateLimited):
+                self.show_status_text(self.rate_limit_message(full_msg))
+                return
             if full_msg:
-                text_content = full_msg.get('text', '') or full_msg.get('intro', '')
-                if not text_content:
-                    text_content = "(This email contains only HTML content. Open in a full email client to view.)"
-                
-                from_name = full_msg.get('from', {}).get('name', '')
-                from_addr = full_msg.get('from', {}).get('address', '')
-                
-                self.msg_text.insert(tk.END, f"FROM: {from_name} <{from_addr}>\n")
-                self.msg_text.insert(tk.END, f"SUBJECT: {full_msg.get('subject')}\n")
-                self.msg_text.insert(tk.END, f"DATE: {full_msg.get('createdAt')}\n")
-                self.msg_text.insert(tk.END, "_"*50 + "\n\n")
-                self.msg_text.insert(tk.END, text_content)
-            else:
-                self.msg_text.insert(tk.END, "Failed to load message content.")
-                
-            self.msg_text.config(state="disabled")
+                self.message_cache.put(msg_id, full_msg)
+            self.show_message_content(full_msg)
+
+        # Clicking through messages quickly only renders the last one
+        self.run_in_thread(task, callback=on_done, key="message")
+
+    def set_current_message(self, full_msg):
+        """Remembers the shown message and enables the download buttons that apply to it."""
+        self.current_message = full_msg or None
+        attachments = (full_msg or {}).get('attachments') or []
+        self.btn_save_source.config(state="normal" if full_msg else "disabled")
+        self.btn_attachments.config(state="normal" if attachments else "disabled",
+                                    text=f"📎 Attachments ({len(attachments)})" if attachments else "📎 Attachments")
+        self.download_var.set("")
+
+    def download_message_source(self):
+        self.start_download(lambda token, msg: api_client.download_message_source(token, msg), "message source")
+
+    def download_attachments(self):
+        self.start_download(lambda token, msg: api_client.download_attachments(token, msg), "attachments")
+
+    def start_download(self, download, label):
+        """Streams files to the downloads folder on a background worker and reports where they went."""
+        msg = self.current_message
+        token = self.current_token
+        if not msg or not token:
+            return
+        self.download_var.set(f"Downloading {label}...")
+
+        def task():
+            try:
+                return download(token, msg)
+            except api_client.RateLimited as e:
+                return e
+
+        def on_done(result):
+            if self.current_message is not msg:
+                return # Another message is shown now
+            if isinstance(result, api_client.RateLimited):
+                self.download_var.set(self.rate_limit_message(result))
+                return
+            paths = result if isinstance(result, list) else [result]
+            saved = [p for p in paths if p]
+            if not saved:
+                self.download_var.set(f"Could not download {label}.")
+                return
+            failed = len(paths) - len(saved)
+            self.download_var.set(f"Saved {len(saved)} file(s)" + (f", {failed} failed" if failed else ""))
+            storage.open_folder(os.path.dirname(saved[0]))
+
+        self.run_in_thread(task, callback=on_done, lane="background")
+
+    def show_status_text(self, text):
+        self.msg_writer.write(text) # Also stops feeding in a previous message
+
+    def show_message_content(self, full_msg):
+        if self.message_open_started is not None:
+            metrics.observe("ui.message_open", time.perf_counter() - self.message_open_started)
+            self.message_open_started = None
+        self.set_current_message(full_msg)
+        if not full_msg:
+            self.show_status_text("Failed to load message content.")
+            return
+
+        msg_id = full_msg.get('id')
+        rendered = self.render_cache.get(msg_id)
+        if rendered is None and full_msg.get('text'):
+            # Plain text only needs its header lines; the writer does the slow part (layout) in chunks
+            rendered = message_render.render_message(full_msg)
+            self.render_cache.put(msg_id, rendered)
+        if rendered is not None:
+            self.msg_writer.write(rendered)
+            return
+
+        # HTML conversion of a large newsletter can take a while; keep it off the Tk thread
+        self.show_status_text("Rendering message...")
 
-        self.run_in_thread(task, callback=on_done)
+        def task():
+            with metrics.timer("ui.message_render"):
+                return message_render.render_message(full_msg)
+
+        def on_done(text):
+            self.render_cache.put(msg_id, text)
+            if self.current_message is full_msg:
+                self.msg_writer.write(text)
+
+        self.run_in_thread(task, callback=on_done, key="render")
 
     def copy_to_clipboard(self, event=None):
         if self.current_email:
@@ -455,7 +718,7 @@ class EmailApp:
     def save_current_email(self):
         if self.current_email and self.current_password:
             if storage.save_email(self.current_email, self.current_password):
-                self.load_saved_emails()
+                self.add_saved_row(storage.get_email(self.current_email))
                 self.show_save_feedback(success=True)
             else:
                 self.show_save_feedback(success=False)
@@ -475,65 +738,126 @@ class EmailApp:
         if self.is_editing_saved and not force:
             return
             
-        self.saved_tree.delete(*self.saved_tree.get_children())
         emails = storage.load_emails()
+        self.watcher.set_accounts(emails)
+        self.search_index.rebuild(emails)
+        self.saved_widths.clear()
         
+        self.saved_view.set_rows(self.saved_row(email_data) for email_data in emails)
+        self.visible_saved = set(self.saved_view.all_keys())
+        self.apply_saved_filter()
+        self.autosize_saved_columns()
+
+    def saved_row(self, email_data):
+        """Returns (address, values, tags) for a saved record and counts it for column sizing."""
+        addr = email_data.get('address', 'Unknown')
+        stage = email_data.get('stage_id', '')
+        prod = email_data.get('prod_id', '')
+        name = email_data.get('name', '')
+        
+        tags = ('active',) if addr == self.current_email else ()
+        unread = self.unread_badge(addr)
+        values = (addr, stage, prod, name, unread)
+        self.saved_widths.add(addr, values)
+        return addr, values, tags
+
+    def add_saved_row(self, email_data):
+        """Adds one newly saved record without rebuilding the tree."""
+        if not email_data or self.saved_view.exists(email_data.get('address')):
+            return
+        self.saved_view.insert(*self.saved_row(email_data))
+        self.visible_saved.add(email_data['address'])
+        self.search_index.add(email_data['address'], email_data)
+        self.watcher.set_accounts(storage.load_emails())
+        self.apply_saved_filter()
+        self.autosize_saved_columns()
+
+    def remove_saved_row(self, address):
+        self.saved_view.delete(address)
+        self.visible_saved.discard(address)
+        self.search_index.remove(address)
+        self.saved_widths.remove(address)
+        self.watcher.set_accounts(storage.load_emails())
+        self.autosize_saved_columns()
+
+    def update_active_saved_rows(self, *addresses):
+        for addr in addresses:
+            if self.saved_view.exists(addr):
+                self.saved_view.update(addr, tags=('active',) if addr == self.current_email else ())
+
+    def get_filter_text(self):
         # Handle placeholder
         raw_search = self.search_var.get() if hasattr(self, 'search_var') else ""
         if raw_search == self.search_placeholder:
-            filter_text = ""
+            return ""
+        return raw_search.lower()
+
+    def apply_saved_filter(self):
+        """Updates which rows are shown; only rows whose match state changed are touched."""
+        matches = self.search_index.search(self.get_filter_text())
+        to_hide = self.visible_saved - matches
+        to_show = matches - self.visible_saved
+        if not to_hide and not to_show:
+            return False
+        
+        # Only visible rows size the columns
+        for addr in to_hide:
+            self.saved_widths.remove(addr)
+        for addr in to_show:
+            self.saved_widths.add(addr, self.saved_view.values(addr))
+        
+        self.saved_view.set_hidden(a for a in self.saved_view.all_keys() if a not in matches)
+        self.visible_saved = matches
+        return True
+
+    def refilter_saved_row(self, address):
+        """Re-applies the active filter to one row after its searchable fields changed."""
+        matches = self.search_index.matches(address, self.get_filter_text())
+        if matches == (address in self.visible_saved):
+            return False
+        if matches:
+            self.visible_saved.add(address)
+            self.saved_widths.add(address, self.saved_view.values(address))
         else:
-            filter_text = raw_search.lower()
-        
-        for email_data in emails:
-            addr = email_data.get('address', 'Unknown')
-            stage = email_data.get('stage_id', '')
-            prod = email_data.get('prod_id', '')
-            name = email_data.get('name', '')
-            
-            if (filter_text in addr.lower() or 
-                filter_text in str(stage).lower() or 
-                filter_text in str(prod).lower() or
-                filter_text in str(name).lower()):
-                
-                tags = ('active',) if addr == self.current_email else ()
-                self.saved_tree.insert("", "end", values=(addr, stage, prod, name), tags=tags)
-        
-        self.autosize_saved_columns()
+            self.visible_saved.discard(address)
+            self.saved_widths.remove(address)
+        self.saved_view.set_row_hidden(address, not matches)
+        return True
+
+    def unread_badge(self, address):
+        count = self.unread_counts.get(address)
+        return f"● {count}" if count else ""
+
+    def on_watcher_update(self, address, unread):
+        # Called from a watcher worker thread
+        self.root.after(0, lambda: self.set_unread_count(address, unread))
+
+    def set_unread_count(self, address, unread):
+        self.unread_counts[address] = unread
+        if self.saved_view.exists(address):
+            self.saved_view.set(address, "Unread", self.unread_badge(address))
+            if address in self.visible_saved:
+                self.saved_widths.update(address, self.saved_view.values(address))
+                self.autosize_saved_columns()
 
     def autosize_saved_columns(self):
-        font_obj = font.Font(font=self.listbox_font)
-        columns = ["Address", "Stage", "Prod", "Name"]
-        
-        # Set a minimum width for headers
-        min_widths = {"Address": 150, "Stage": 60, "Prod": 60, "Name": 80}
-        
-        for col in columns:
-            # Start with header width
-            max_width = font_obj.measure(col) + 20 
-            if max_width < min_widths.get(col, 50):
-                max_width = min_widths.get(col, 50)
-            
-            for item in self.saved_tree.get_children():
-                # Get the value for this column
-                # columns list matches values index: Address=0, Stage=1, Prod=2, Name=3
-                val_idx = columns.index(col)
-                val = self.saved_tree.item(item, "values")[val_idx]
-                
-                val_width = font_obj.measure(str(val)) + 25 # + padding
-                if val_width > max_width:
-                    max_width = val_width
-            
-            # Cap at reasonable max to prevent screen takeover
-            if max_width > 800: max_width = 800
-                
-            self.saved_tree.column(col, width=max_width)
+        # Widths are maintained incrementally by saved_widths; only push columns that changed
+        for col, width in self.saved_widths.widths().items():
+            if self.applied_saved_widths.get(col) != width:
+                self.saved_tree.column(col, width=width)
+                self.applied_saved_widths[col] = width
 
     def filter_saved_emails(self, *args):
         # Debounce filter to avoid heavy resizing on every keystroke
         if hasattr(self, '_search_after_id'):
             self.root.after_cancel(self._search_after_id)
-        self._search_after_id = self.root.after(200, self.load_saved_emails)
+        self._search_after_id = self.root.after(200, self.on_search_changed)
+
+    def on_search_changed(self):
+        if self.is_editing_saved:
+            return
+        if self.apply_saved_filter():
+            self.autosize_saved_columns()
 
     def on_search_focus_in(self, event):
         if self.search_var.get() == self.search_placeholder:
@@ -545,7 +869,7 @@ class EmailApp:
 
     # --- Drag and Drop Reordering ---
     def on_drag_start(self, event):
-        item = self.saved_tree.identify_row(event.y)
+        item = self.saved_view.identify_row(event.y)
         if item:
             self.drag_item = item
             self.drag_occurred = False
@@ -556,7 +880,7 @@ class EmailApp:
         if not self.drag_item:
             return
             
-        target = self.saved_tree.identify_row(event.y)
+        target = self.saved_view.identify_row(event.y)
         if target and target != self.drag_item:
             # Check if filtered
             search_text = self.search_var.get().strip()
@@ -567,8 +891,9 @@ class EmailApp:
             self.drag_occurred = True
             
             # Move visually
-            index = self.saved_tree.index(target)
-            self.saved_tree.move(self.drag_item, "", index)
+            index = self.saved_view.index(target)
+            self.saved_view.move(self.drag_item, index)
+            self.saved_view.render_now()
 
     def on_drag_release(self, event):
         if not hasattr(self, 'drag_item') or not self.drag_item:
@@ -584,25 +909,12 @@ class EmailApp:
                 self.drag_occurred = False
                 return
 
-            # Save new order
-            new_order_data = []
-            all_current_emails = storage.load_emails()
-            # Map address to data
-            email_map = {e['address']: e for e in all_current_emails}
-            
-            children = self.saved_tree.get_children()
-            for child in children:
-                addr = self.saved_tree.item(child, 'values')[0]
-                if addr in email_map:
-                    new_order_data.append(email_map[addr])
-            
-            # Check if we lost anything (shouldn't if no filter)
-            if len(new_order_data) == len(all_current_emails):
-                storage.save_all_emails(new_order_data)
-                # print("Order saved")
-            else:
+            # Save new order: only the dragged row moves, so store just its new position
+            addr = self.drag_item
+            index = self.saved_view.index(addr)
+            if not storage.move_email(addr, index):
                 # Fallback if something went wrong
-                print("Mismatch in count, not saving order")
+                print("Could not save new order")
                 self.load_saved_emails()
 
         self.drag_item = None
@@ -614,7 +926,7 @@ class EmailApp:
             return
             
         column = self.saved_tree.identify_column(event.x)
-        item_id = self.saved_tree.identify_row(event.y)
+        item_id = self.saved_view.identify_row(event.y)
         
         if not item_id:
             return
@@ -626,9 +938,9 @@ class EmailApp:
             return
             
         self.is_editing_saved = True # Lock refreshes
-        current_values = self.saved_tree.item(item_id, "values")
+        current_values = self.saved_view.values(item_id)
         current_val = current_values[val_idx_map[column]]
-        bbox = self.saved_tree.bbox(item_id, column)
+        bbox = self.saved_view.bbox(item_id, column)
         
         if not bbox:
             return
@@ -662,10 +974,15 @@ class EmailApp:
             elif field == "name": name = new_val
             
             if storage.update_email_metadata(address, stage, prod, name):
-                if self.saved_tree.exists(item_id):
+                self.search_index.update(address, storage.get_email(address) or {})
+                if self.saved_view.exists(item_id):
                     new_values = list(current_values)
                     new_values[val_idx_map[column]] = new_val
-                    self.saved_tree.item(item_id, values=new_values)
+                    self.saved_view.update(item_id, values=new_values)
+                    self.refilter_saved_row(address)
+                    if address in self.visible_saved:
+                        self.saved_widths.update(address, new_values)
+                    self.autosize_saved_columns()
             
             self.is_editing_saved = False
             entry.destroy()
@@ -679,10 +996,8 @@ class EmailApp:
         entry.bind("<FocusOut>", commit)
 
     def on_saved_email_select(self, event):
-        selection = self.saved_tree.selection()
-        if selection:
-            item = self.saved_tree.item(selection[0])
-            address = item['values'][0]
+        address = self.saved_view.selection()
+        if address:
             self.selected_saved_address = address
 
     def login_to_saved_email(self, event=None):
@@ -691,40 +1006,47 @@ class EmailApp:
             if column != "#1":
                 return # Only log in if Address column is clicked
                 
-        selection = self.saved_tree.selection()
-        if not selection:
+        address = self.saved_view.selection()
+        if not address:
              # handle empty area clicks if needed
              pass
         
-        if selection:
-            item = self.saved_tree.item(selection[0])
-            address = item['values'][0]
+        if address:
             
-            emails = storage.load_emails()
-            creds = next((e for e in emails if e['address'] == address), None)
+            creds = storage.get_email(address)
             
             if creds:
+                # Reuse a still-valid token so switching accounts needs no network call
+                cached_token = api_client.get_cached_token(creds['address'], creds['password'])
+                if cached_token:
+                    self.set_current_account(creds['address'], creds['password'], cached_token)
+                    return
+
                 self.email_var.set(f"Logging in to {address}...")
                 
                 def task():
-                    return api_client.get_token(creds['address'], creds['password'])
+                    try:
+                        return api_client.get_token(creds['address'], creds['password'])
+                    except api_client.RateLimited as e:
+                        return e
                 
                 def on_done(token):
-                    if token:
+                    if isinstance(token, api_client.RateLimited):
+                        messagebox.showwarning("Rate Limited", self.rate_limit_message(token))
+                        self.email_var.set(creds['address']) # Revert text
+                    elif token:
                         self.set_current_account(creds['address'], creds['password'], token)
                     else:
                         messagebox.showerror("Auth Error", "Could not login. Account might be deleted by server.")
                         self.email_var.set(creds['address']) # Revert text
                 
-                self.run_in_thread(task, callback=on_done)
+                self.run_in_thread(task, callback=on_done, key="account")
 
     def delete_saved_email(self):
-        selection = self.saved_tree.selection()
-        if selection:
-            item = self.saved_tree.item(selection[0])
-            email = item['values'][0]
+        email = self.saved_view.selection()
+        if email:
             if storage.delete_email(email):
-                self.load_saved_emails()
+                self.remove_saved_row(email)
             else:
                 messagebox.showerror("Error", "Could not delete.")
 
@@ -733,9 +1055,66 @@ class EmailApp:
             self.is_auto_refreshing = True
             self.poll()
             
+    def show_diagnostics(self):
+        """Opens (or raises) a small window with live request and UI timing metrics."""
+        if self.diagnostics_window is not None and self.diagnostics_window.winfo_exists():
+            self.diagnostics_window.lift()
+            return
+
+        window = tk.Toplevel(self.root)
+        window.title("Diagnostics")
+        window.geometry("760x520")
+        window.configure(bg=self.colors["bg"])
+        self.diagnostics_window = window
+
+        text = tk.Text(window, font=self.code_font, wrap=tk.NONE, highlightthickness=0, borderwidth=0,
+                       bg=self.colors["input_bg"], fg=self.colors["input_fg"], padx=15, pady=15)
+        buttons = ttk.Frame(window, padding="10")
+        buttons.pack(side=tk.BOTTOM, fill=tk.X)
+        text.pack(fill=tk.BOTH, expand=True)
+
+        status_var = tk.StringVar()
+        ttk.Button(buttons, text="Export JSON", command=lambda: self.export_metrics("json", status_var)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Export Prometheus", command=lambda: self.export_metrics("prom", status_var)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Reset", command=metrics.REGISTRY.reset).pack(side=tk.LEFT, padx=5)
+        ttk.Label(buttons, textvariable=status_var).pack(side=tk.LEFT, padx=10)
+
+        def refresh():
+            if not window.winfo_exists():
+                return
+            text.config(state="normal")
+            text.delete(1.0, tk.END)
+            text.insert(tk.END, metrics.REGISTRY.format_text())
+            text.config(state="disabled")
+            window.after(1000, refresh)
+
+        refresh()
+
+    def export_metrics(self, kind, status_var=None):
+        path = storage.get_data_path("metrics.json" if kind == "json" else "metrics.prom")
+        try:
+            if kind == "json":
+                metrics.REGISTRY.export_json(path)
+            else:
+                metrics.REGISTRY.export_prometheus(path)
+            message = f"Saved to {path}"
+        except OSError as e:
+            message = f"Export failed: {e}"
+        if status_var is not None:
+            status_var.set(message)
+
+    def export_metrics_periodically(self):
+        try:
+            metrics.REGISTRY.export_prometheus(self.metrics_file)
+        except OSError as e:
+            print(f"Error writing metrics file: {e}")
+        self.root.after(15000, self.export_metrics_periodically)
+
     def poll(self):
+        # Push updates cover the inbox while the stream is up; poll only as a fallback
         try:
-            self.refresh_inbox()
+            if not self.stream_connected:
+                self.refresh_inbox()
         except Exception:
             pass
         self.root.after(5000, self.poll) 
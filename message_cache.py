@@ -0,0 +1,145 @@
+"""Bounded LRU cache of full message bodies, keyed by message id.
+
+Entries are evicted once either the item count or the total JSON size goes
+over its limit. With a spill directory configured, evicted entries are written
+there as JSON files and read back on a later miss. prefetch() fills the cache
+in the background so opening a new message is a memory lookup.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+SPILL_DIR_NAME = "message_cache"
+
+
+class MessageCache:
+    def __init__(self, max_items=200, max_bytes=16 * 1024 * 1024, spill_dir=None,
+                 max_spill_items=2000, prefetch_workers=2):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.max_spill_items = max_spill_items
+
+        self._entries = OrderedDict()  # id -> (message, size)
+        self._bytes = 0
+        self._spilled = OrderedDict()  # ids written to spill_dir, oldest first
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._prefetch_workers = prefetch_workers
+        self._executor = None
+
+        if self.spill_dir:
+            self._index_spill_dir()
+
+    def _index_spill_dir(self):
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            files = sorted(
+                (e for e in os.scandir(self.spill_dir) if e.name.endswith(".json")),
+                key=lambda e: e.stat().st_mtime)
+            for entry in files:
+                self._spilled[entry.name[:-5]] = None
+        except OSError as e:
+            print(f"Error opening message cache directory: {e}")
+            self.spill_dir = None
+
+    def _spill_path(self, msg_id):
+        # Message ids are hex strings; keep anything else from escaping the directory
+        safe_id = "".join(c for c in str(msg_id) if c.isalnum() or c in "-_")
+        return os.path.join(self.spill_dir, f"{safe_id}.json")
+
+    def __contains__(self, msg_id):
+        with self._lock:
+            return msg_id in self._entries or msg_id in self._spilled
+
+    def get(self, msg_id):
+        """Returns the cached message or None, promoting it to most recently used."""
+        with self._lock:
+            entry = self._entries.get(msg_id)
+            if entry:
+                self._entries.move_to_end(msg_id)
+                return entry[0]
+            if msg_id not in self._spilled:
+                return None
+        try:
+            with open(self._spill_path(msg_id), 'r') as f:
+                message = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self._spilled.pop(msg_id, None)
+            return None
+        self.put(msg_id, message)
+        return message
+
+    def put(self, msg_id, message):
+        if not message:
+            return
+        size = len(json.dumps(message))
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(msg_id, None)
+            if old:
+                self._bytes -= old[1]
+            self._entries[msg_id] = (message, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_items or self._bytes > self.max_bytes):
+                old_id, (old_msg, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                if old_id != msg_id:
+                    evicted.append((old_id, old_msg))
+        if self.spill_dir:
+            for old_id, old_msg in evicted:
+                self._spill(old_id, old_msg)
+
+    def _spill(self, msg_id, message):
+        try:
+            with open(self._spill_path(msg_id), 'w') as f:
+                json.dump(message, f)
+        except OSError as e:
+            print(f"Error writing message cache: {e}")
+            return
+        with self._lock:
+            self._spilled.pop(msg_id, None)
+            self._spilled[msg_id] = None
+            while len(self._spilled) > self.max_spill_items:
+                old_id, _ = self._spilled.popitem(last=False)
+                try:
+                    os.remove(self._spill_path(old_id))
+                except OSError:
+                    pass
+
+    def discard(self, msg_id):
+        with self._lock:
+            entry = self._entries.pop(msg_id, None)
+            if entry:
+                self._bytes -= entry[1]
+            spilled = self._spilled.pop(msg_id, False) is not False
+        if spilled:
+            try:
+                os.remove(self._spill_path(msg_id))
+            except OSError:
+                pass
+
+    def prefetch(self, msg_ids, fetch):
+        """Fetches uncached messages in the background via fetch(msg_id)."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._prefetch_workers)
+            todo = [m for m in msg_ids
+                    if m not in self._entries and m not in self._spilled and m not in self._pending]
+            self._pending.update(todo)
+        for msg_id in todo:
+            self._executor.submit(self._prefetch_one, msg_id, fetch)
+
+    def _prefetch_one(self, msg_id, fetch):
+        try:
+            message = fetch(msg_id)
+            if message:
+                self.put(msg_id, message)
+        except Exception as e:
+            print(f"Error prefetching message: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(msg_id)
@@ -0,0 +1,172 @@
+"""Turning full messages into display text, and feeding it to a Text widget.
+
+render_message() builds the reading-pane text, converting HTML-only bodies
+with a small stdlib HTML-to-text converter. It is pure and safe to run on a
+worker thread; RenderCache keeps recent results per message id. ChunkedWriter
+inserts long text into a Tk Text widget a chunk at a time from `after`
+callbacks, so the first screen appears at once and the window stays
+responsive while the rest is laid out.
+"""
+import re
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+
+BLOCK_TAGS = {"p", "div", "section", "article", "header", "footer", "table", "tr", "ul", "ol",
+              "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "hr", "center"}
+SKIP_TAGS = {"script", "style", "head", "title", "noscript"}
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+        self._pre = 0
+        self._href = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag == "br":
+            self.parts.append("\n")
+        elif tag == "li":
+            self.parts.append("\n• ")
+        elif tag in ("td", "th"):
+            self.parts.append("  ")
+        elif tag == "a":
+            self._href = dict(attrs).get("href")
+        elif tag == "img":
+            alt = dict(attrs).get("alt")
+            if alt:
+                self.parts.append(f"[{alt}]")
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n\n")
+            if tag == "pre":
+                self._pre += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag == "a":
+            href = self._href
+            self._href = None
+            # Show where a link goes unless its text already says so
+            if href and href.startswith(("http://", "https://")) and self.parts and href not in self.parts[-1]:
+                self.parts.append(f" ({href})")
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n\n")
+            if tag == "pre":
+                self._pre = max(0, self._pre - 1)
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if not self._pre:
+            data = re.sub(r"\s+", " ", data)
+        self.parts.append(data)
+
+
+def html_to_text(html):
+    """Converts an HTML body to readable plain text."""
+    parser = _TextExtractor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception as e:
+        print(f"Error converting HTML: {e}")
+    text = "".join(parser.parts)
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    text = re.sub(r"\n (?=\S)", "\n", text)  # Left over from collapsing source whitespace
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def message_body(full_msg):
+    text = full_msg.get('text', '')
+    if text:
+        return text
+    html = full_msg.get('html') or []
+    if isinstance(html, str):
+        html = [html]
+    if html:
+        return html_to_text("".join(html))
+    return full_msg.get('intro', '') or "(This email has no content.)"
+
+
+def render_message(full_msg):
+    """Returns the reading-pane text for a full message."""
+    from_name = full_msg.get('from', {}).get('name', '')
+    from_addr = full_msg.get('from', {}).get('address', '')
+    return (f"FROM: {from_name} <{from_addr}>\n"
+            f"SUBJECT: {full_msg.get('subject')}\n"
+            f"DATE: {full_msg.get('createdAt')}\n"
+            + "_" * 50 + "\n\n"
+            + message_body(full_msg))
+
+
+class RenderCache:
+    """Small LRU of rendered text per message id."""
+
+    def __init__(self, max_items=50):
+        self.max_items = max_items
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, msg_id):
+        with self._lock:
+            text = self._entries.get(msg_id)
+            if text is not None:
+                self._entries.move_to_end(msg_id)
+            return text
+
+    def put(self, msg_id, text):
+        with self._lock:
+            self._entries[msg_id] = text
+            self._entries.move_to_end(msg_id)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+
+class ChunkedWriter:
+    """Replaces a Text widget's content with long text, one chunk per event-loop turn."""
+
+    def __init__(self, widget, chunk_size=8192, delay=1):
+        self.widget = widget
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self._job = None
+        self._text = ""
+        self._pos = 0
+
+    def cancel(self):
+        if self._job is not None:
+            self.widget.after_cancel(self._job)
+            self._job = None
+
+    def write(self, text):
+        self.cancel()
+        self._text = text
+        self._pos = 0
+        self.widget.config(state="normal")
+        self.widget.delete(1.0, "end")
+        self.widget.config(state="disabled")
+        self._write_chunk()
+
+    def _write_chunk(self):
+        self._job = None
+        end = self._pos + self.chunk_size
+        if end < len(self._text):
+            # Break after a newline or space when one is near, so words aren't laid out twice
+            cut = max(self._text.rfind("\n", self._pos, end), self._text.rfind(" ", self._pos, end))
+            if cut > self._pos + self.chunk_size // 2:
+                end = cut + 1
+        chunk = self._text[self._pos:end]
+        self._pos = end
+        self.widget.config(state="normal")
+        self.widget.insert("end", chunk)
+        self.widget.config(state="disabled")
+        if self._pos < len(self._text):
+            self._job = self.widget.after(self.delay, self._write_chunk)
+        else:
+            self._text = ""
@@ -0,0 +1,214 @@
+"""In-process metrics: request counters, latency histograms and UI timings.
+
+api_client and async_client record every HTTP exchange per endpoint (count
+by status code or error class, bytes received, latency histogram); the UI
+records how long refreshes and message opens take. Everything lives in one
+thread-safe registry that can be read as a snapshot dict, or exported as JSON
+or as a Prometheus textfile (for node_exporter's textfile collector).
+"""
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimates a quantile as the upper bound of the bucket it falls in (capped at the max seen)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "max": round(self.max, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": {str(b): c for b, c in zip(self.buckets + ("+Inf",), self.counts)},
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._requests = {}   # endpoint -> {"outcomes": {status/error: n}, "bytes": n, "latency": Histogram}
+            self._counters = {}   # name -> n
+            self._timings = {}    # name -> Histogram
+            self._started = time.time()
+
+    def observe_request(self, endpoint, seconds, status=None, error=None, nbytes=0):
+        """Records one HTTP exchange: a status code, or the exception class name when there was no response."""
+        outcome = str(status) if status is not None else (error or "error")
+        with self._lock:
+            entry = self._requests.get(endpoint)
+            if entry is None:
+                entry = self._requests[endpoint] = {"outcomes": {}, "bytes": 0, "latency": Histogram()}
+            entry["outcomes"][outcome] = entry["outcomes"].get(outcome, 0) + 1
+            entry["bytes"] += nbytes
+            entry["latency"].observe(seconds)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        """Records a timing, e.g. observe("ui.refresh_render", 0.012)."""
+        with self._lock:
+            histogram = self._timings.get(name)
+            if histogram is None:
+                histogram = self._timings[name] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "started_at": self._started,
+                "uptime": round(time.time() - self._started, 3),
+                "requests": {
+                    endpoint: {
+                        "count": entry["latency"].count,
+                        "outcomes": dict(entry["outcomes"]),
+                        "errors": sum(n for k, n in entry["outcomes"].items() if not k.isdigit() or int(k) >= 400),
+                        "bytes": entry["bytes"],
+                        "latency": entry["latency"].snapshot(),
+                    }
+                    for endpoint, entry in self._requests.items()
+                },
+                "counters": dict(self._counters),
+                "timings": {name: h.snapshot() for name, h in self._timings.items()},
+            }
+
+    def to_prometheus(self, prefix="tempmail"):
+        """Renders the registry in the Prometheus text exposition format."""
+        snap = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_requests_total HTTP requests to mail.tm by endpoint and outcome.",
+            f"# TYPE {prefix}_requests_total counter",
+        ]
+        for endpoint, entry in sorted(snap["requests"].items()):
+            for outcome, count in sorted(entry["outcomes"].items()):
+                label = "code" if outcome.isdigit() else "error"
+                lines.append(f'{prefix}_requests_total{{endpoint="{endpoint}",{label}="{outcome}"}} {count}')
+        lines += [f"# HELP {prefix}_response_bytes_total Response body bytes received.",
+                  f"# TYPE {prefix}_response_bytes_total counter"]
+        for endpoint, entry in sorted(snap["requests"].items()):
+            lines.append(f'{prefix}_response_bytes_total{{endpoint="{endpoint}"}} {entry["bytes"]}')
+
+        def histogram_lines(metric, labels, hist):
+            cumulative = 0
+            for bound, count in hist["buckets"].items():
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{labels}}} {hist['sum']}")
+            lines.append(f"{metric}_count{{{labels}}} {hist['count']}")
+
+        lines += [f"# HELP {prefix}_request_duration_seconds Request latency by endpoint.",
+                  f"# TYPE {prefix}_request_duration_seconds histogram"]
+        for endpoint, entry in sorted(snap["requests"].items()):
+            histogram_lines(f"{prefix}_request_duration_seconds", f'endpoint="{endpoint}"', entry["latency"])
+        lines += [f"# HELP {prefix}_timing_seconds Application timings (UI refresh, message open, ...).",
+                  f"# TYPE {prefix}_timing_seconds histogram"]
+        for name, hist in sorted(snap["timings"].items()):
+            histogram_lines(f"{prefix}_timing_seconds", f'name="{name}"', hist)
+        lines += [f"# HELP {prefix}_events_total Miscellaneous event counters.",
+                  f"# TYPE {prefix}_events_total counter"]
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f'{prefix}_events_total{{name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def export_json(self, path):
+        import storage
+        storage.atomic_write_json(path, self.snapshot(), indent=2)
+
+    def export_prometheus(self, path):
+        """Writes a textfile atomically, so a collector never reads half a file."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".prom")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def format_text(self):
+        """Human-readable summary for the diagnostics panel."""
+        snap = self.snapshot()
+        lines = [f"Uptime: {snap['uptime']:.0f}s", "", "API requests"]
+        lines.append(f"  {'endpoint':<10}{'count':>7}{'errors':>8}{'p50':>9}{'p95':>9}{'max':>9}{'KiB':>9}")
+
+        def ms(value):
+            return "-" if value is None else f"{value * 1000:.0f}ms"
+
+        for endpoint, entry in sorted(snap["requests"].items()):
+            latency = entry["latency"]
+            lines.append(f"  {endpoint:<10}{entry['count']:>7}{entry['errors']:>8}"
+                         f"{ms(latency['p50']):>9}{ms(latency['p95']):>9}{ms(latency['max']):>9}"
+                         f"{entry['bytes'] / 1024:>9.1f}")
+            failures = {k: v for k, v in entry["outcomes"].items() if not k.startswith("2")}
+            if failures:
+                lines.append("      " + ", ".join(f"{k}: {v}" for k, v in sorted(failures.items())))
+        if snap["timings"]:
+            lines += ["", "Timings"]
+            for name, hist in sorted(snap["timings"].items()):
+                lines.append(f"  {name:<28}{hist['count']:>7}  p50 {ms(hist['p50'])}  p95 {ms(hist['p95'])}  max {ms(hist['max'])}")
+        if snap["counters"]:
+            lines += ["", "Counters"]
+            for name, value in sorted(snap["counters"].items()):
+                lines.append(f"  {name:<28}{value:>7}")
+        return "\n".join(lines)
+
+
+REGISTRY = Metrics()
+
+observe_request = REGISTRY.observe_request
+increment = REGISTRY.increment
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+snapshot = REGISTRY.snapshot
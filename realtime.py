@@ -0,0 +1,202 @@
+"""Push delivery of account events from the Mail.tm Mercure hub.
+
+Mail.tm publishes every change to an account's messages as a server-sent event
+on the topic "/accounts/<account id>". MercureSubscriber keeps one long-lived
+streaming connection per account on a daemon thread, hands each decoded event
+to a callback and reconnects with exponential backoff when the stream drops,
+resuming from the last event id it saw. The hub URL is configurable so it can
+be pointed at a local SSE stand-in (benchmarks.fake_mailtm serves one).
+"""
+import json
+import random
+import threading
+import time
+
+import requests
+
+import api_client
+
+MERCURE_URL = "https://mercure.mail.tm/.well-known/mercure"
+
+
+def parse_sse(lines):
+    """Yields (event, data, id, retry) tuples from an iterable of SSE text lines."""
+    event, data, event_id, retry = None, [], None, None
+    for line in lines:
+        if line is None:
+            continue
+        if line == "":
+            if data:
+                yield event or "message", "\n".join(data), event_id, retry
+            event, data, retry = None, [], None
+            continue
+        if line.startswith(":"):
+            continue  # Comment / keep-alive ping
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            data.append(value)
+        elif field == "event":
+            event = value
+        elif field == "id":
+            event_id = value
+        elif field == "retry" and value.isdigit():
+            retry = int(value)
+
+
+def get_account_id(token, client=None):
+    """Returns the account id for a token, from its JWT claims or the /me endpoint."""
+    claims = api_client.decode_token_claims(token)
+    if claims.get("id"):
+        return claims["id"]
+    try:
+        client = client or api_client.get_client()
+        return client.request("GET", "/me", "me", token=token).json().get("id")
+    except (requests.RequestException, ValueError) as e:
+        print(f"Error getting account id: {e}")
+        return None
+
+
+class MercureSubscriber:
+    """Streams one account's events on a background thread.
+
+    on_event(data) receives each decoded JSON payload (a Message or Account
+    resource). on_state(connected) is called whenever the stream goes up or
+    down, so callers can fall back to polling while it is down. Each reconnect
+    uses the newest token the client's token cache knows for the account, and
+    a 401 from the hub re-authenticates once through it.
+    """
+
+    def __init__(self, token, on_event, on_state=None, hub_url=MERCURE_URL, account_id=None,
+                 min_backoff=1.0, max_backoff=60.0, read_timeout=90, healthy_after=30.0, client=None):
+        self.token = token
+        self.client = client  # MailTmClient whose token cache is used; the shared one by default
+        self.on_event = on_event
+        self.on_state = on_state
+        self.hub_url = hub_url
+        self.account_id = account_id
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        # Mercure sends keep-alive comments; a silent connection this long is considered dead
+        self.read_timeout = read_timeout
+        # A connection that stayed up this long resets the backoff, however it ended
+        self.healthy_after = healthy_after
+
+        self.connected = False
+        self.backoff = min_backoff
+        self.last_event_id = None
+        self._stop = threading.Event()
+        self._response = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the subscriber and closes its connection."""
+        self._stop.set()
+        response = self._response
+        if response is not None:
+            try:
+                response.close()
+            except Exception:
+                pass
+        self._set_connected(False)
+
+    def _set_connected(self, connected):
+        if connected != self.connected:
+            self.connected = connected
+            if self.on_state:
+                try:
+                    self.on_state(connected)
+                except Exception as e:
+                    print(f"Stream state callback error: {e}")
+
+    def _get_client(self):
+        return self.client or api_client.get_client()
+
+    def _reauthenticate(self):
+        """Swaps in a fresh token after the hub rejected ours. Returns True on success."""
+        client = self._get_client()
+        credentials = client.token_cache.credentials_for(self.token)
+        if not credentials:
+            return False
+        try:
+            token = client.get_token(*credentials, force=True)
+        except requests.RequestException as e:
+            print(f"Error refreshing stream token: {e}")
+            return False
+        if token:
+            self.token = token
+        return bool(token)
+
+    def _run(self):
+        self.backoff = self.min_backoff
+        reauthenticated = False
+        while not self._stop.is_set():
+            # Pick up a token renewed elsewhere (a 401 retry, a re-login) since the last connect
+            self.token = self._get_client().token_cache.resolve(self.token)
+            if not self.account_id:
+                self.account_id = get_account_id(self.token, self.client)
+            connected_at = None
+            if self.account_id:
+                try:
+                    connected_at = self._stream()
+                except (requests.RequestException, ValueError, AttributeError) as e:
+                    connected_at = getattr(e, "connected_at", None)
+                    response = getattr(e, "response", None)
+                    if response is not None and response.status_code == 401 and not reauthenticated:
+                        reauthenticated = True
+                        if self._reauthenticate():
+                            continue
+                    if not self._stop.is_set():
+                        print(f"Mercure stream error: {e}")
+            if connected_at is not None:
+                reauthenticated = False
+            self._set_connected(False)
+            if connected_at is not None and time.monotonic() - connected_at >= self.healthy_after:
+                self.backoff = self.min_backoff
+            if self._stop.wait(self.backoff * random.uniform(0.5, 1.0)):
+                break
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+
+    def _stream(self):
+        """Reads the stream until it ends. Returns when it connected (time.monotonic()), or None."""
+        headers = {"Accept": "text/event-stream", "Authorization": f"Bearer {self.token}"}
+        if self.last_event_id:
+            headers["Last-Event-ID"] = self.last_event_id
+        params = {"topic": f"/accounts/{self.account_id}"}
+
+        connected_at = None
+        try:
+            with requests.get(self.hub_url, params=params, headers=headers, stream=True,
+                              timeout=(10, self.read_timeout)) as response:
+                self._response = response
+                response.raise_for_status()
+                connected_at = time.monotonic()
+                self._set_connected(True)
+                for _event, data, event_id, retry in parse_sse(response.iter_lines(decode_unicode=True)):
+                    if self._stop.is_set():
+                        break
+                    if event_id:
+                        self.last_event_id = event_id
+                    if retry:
+                        self.min_backoff = retry / 1000.0
+                    try:
+                        payload = json.loads(data)
+                    except ValueError:
+                        continue
+                    try:
+                        self.on_event(payload)
+                    except Exception as e:
+                        print(f"Stream event callback error: {e}")
+        except (requests.RequestException, ValueError, AttributeError) as e:
+            e.connected_at = connected_at  # Lets _run tell a long healthy stream from a failed connect
+            raise
+        finally:
+            self._response = None
+        return connected_at
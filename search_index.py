@@ -0,0 +1,96 @@
+"""Trigram index for substring search over saved addresses.
+
+Each record's searchable fields (address, stage, prod, name) are lowercased
+and broken into trigrams; the index maps every trigram to the set of record
+keys that contain it. A query intersects the posting sets of its trigrams and
+then verifies the few candidates with a plain substring check, so results
+match the old `filter_text in field` scan exactly. Queries shorter than three
+characters fall back to scanning the cached lowercase texts.
+"""
+
+SEARCH_FIELDS = ('address', 'stage_id', 'prod_id', 'name')
+FIELD_SEPARATOR = "\x00"  # Keeps a match from spanning two fields
+
+
+def record_text(record):
+    return FIELD_SEPARATOR.join(str(record.get(f, '') or '').lower() for f in SEARCH_FIELDS)
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    def __init__(self):
+        self._texts = {}     # key -> searchable text
+        self._postings = {}  # trigram -> set of keys
+
+    def __len__(self):
+        return len(self._texts)
+
+    def clear(self):
+        self._texts = {}
+        self._postings = {}
+
+    def rebuild(self, records, key='address'):
+        self.clear()
+        for record in records:
+            self.add(record.get(key), record)
+
+    def add(self, key, record):
+        """Indexes a record, replacing any previous version under the same key."""
+        text = record_text(record)
+        old = self._texts.get(key)
+        if old == text:
+            return
+        if old is not None:
+            self.remove(key)
+        self._texts[key] = text
+        for gram in trigrams(text):
+            self._postings.setdefault(gram, set()).add(key)
+
+    update = add
+
+    def matches(self, key, query):
+        """Whether one record's fields contain query, without looking at any other record."""
+        query = query.lower()
+        text = self._texts.get(key)
+        return text is not None and FIELD_SEPARATOR not in query and query in text
+
+    def remove(self, key):
+        text = self._texts.pop(key, None)
+        if text is None:
+            return
+        for gram in trigrams(text):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def search(self, query):
+        """Returns the set of keys whose fields contain query (case-insensitive)."""
+        query = query.lower()
+        if not query:
+            return set(self._texts)
+        if FIELD_SEPARATOR in query:
+            return set()
+        if len(query) < 3:
+            return {k for k, text in self._texts.items() if query in text}
+
+        # Intersect smallest posting sets first
+        postings = []
+        for gram in trigrams(query):
+            keys = self._postings.get(gram)
+            if not keys:
+                return set()
+            postings.append(keys)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for keys in postings[1:]:
+            candidates &= keys
+            if not candidates:
+                return candidates
+        if len(query) == 3:
+            return candidates  # A single trigram's postings are already exact
+        return {k for k in candidates if query in self._texts[k]}
@@ -1,8 +1,11 @@
+import bisect
 import json
 import os
 import sys
-import shutil
+import sqlite3
 import platform
+import threading
+import atexit
 
 def get_storage_path():
     """Returns the platform-specific path for storing application data."""
@@ -37,6 +40,7 @@ def get_storage_path():
         if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
             bundled_data = os.path.join(sys._MEIPASS, "saved_emails.json")
             if os.path.exists(bundled_data):
+                import shutil
                 try:
                     shutil.copy2(bundled_data, storage_file)
                 except Exception as e:
@@ -44,12 +48,32 @@ def get_storage_path():
                     
     return storage_file
 
-STORAGE_FILE = get_storage_path()
+_storage_file = None
+
+def get_storage_file():
+    """Returns the saved-emails path, resolving (and creating) the data directory on first use."""
+    global _storage_file
+    if _storage_file is None:
+        _storage_file = get_storage_path()
+    return _storage_file
+
+def __getattr__(name):
+    # STORAGE_FILE used to be computed at import time; keep it readable as a module attribute
+    if name == "STORAGE_FILE":
+        return get_storage_file()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_data_path(filename):
+    """Returns the path of an auxiliary data file stored next to the storage file."""
+    return os.path.join(os.path.dirname(get_storage_file()), filename)
 
 def open_storage_folder():
     """Opens the folder containing the storage file in the OS file explorer."""
+    open_folder(os.path.dirname(get_storage_file()))
+
+def open_folder(path):
+    """Opens a folder in the OS file explorer, creating it if needed."""
     import subprocess
-    path = os.path.dirname(STORAGE_FILE)
     if not os.path.exists(path):
         os.makedirs(path, exist_ok=True)
         
@@ -63,80 +87,865 @@ def open_storage_folder():
         except:
             pass
 
+METADATA_FIELDS = ('stage_id', 'prod_id', 'name')
+SQLITE_FILE_NAME = "saved_emails.db"
+JOURNAL_FILE_NAME = "saved_emails.journal"
+SNAPSHOT_FILE_NAME = "saved_emails.snapshot.json"
+BACKEND_ENV_VAR = "TEMPMAIL_STORAGE"  # "sqlite" (default), "journal" or "json"
+
+def atomic_write_json(path, data, indent=None):
+    """Writes JSON to a temp file, fsyncs it and renames it over path, so a crash never leaves a truncated file."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def file_fingerprint(*paths):
+    """Returns (mtime_ns, size) per path, or None for a missing file. Changes whenever a file is rewritten."""
+    result = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            result.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            result.append(None)
+    return tuple(result)
+
+
+class RecordCache:
+    """Parsed address book held in memory with an address -> record index.
+
+    The cache is tagged with the fingerprint of the backing file(s) and only
+    trusted while that fingerprint is unchanged, so edits made outside this
+    process are still picked up. Records are shared; treat them as read-only.
+    """
+
+    def __init__(self):
+        self.records = None
+        self.index = {}
+        self.fingerprint = None
+
+    def is_valid(self, fingerprint):
+        return self.records is not None and fingerprint == self.fingerprint
+
+    def set(self, records, fingerprint):
+        self.records = records
+        self.index = {r.get('address'): r for r in records}
+        self.fingerprint = fingerprint
+
+    def invalidate(self):
+        self.records = None
+        self.index = {}
+        self.fingerprint = None
+
+
+class PositionedRecordCache(RecordCache):
+    """RecordCache that also knows each row's position, so a one-row edit patches it in place.
+
+    `order` holds (position, address) pairs sorted in step with `records`; an
+    edit finds its row by bisecting it instead of rebuilding the whole list.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.positions = {}
+        self.order = []
+
+    def set_rows(self, rows, fingerprint):
+        """Caches (position, record) pairs, which must be sorted by (position, address)."""
+        self.set([record for _, record in rows], fingerprint)
+        self.positions = {record['address']: position for position, record in rows}
+        self.order = [(position, record['address']) for position, record in rows]
+
+    def invalidate(self):
+        super().invalidate()
+        self.positions = {}
+        self.order = []
+
+    def _find(self, address):
+        return bisect.bisect_left(self.order, (self.positions[address], address))
+
+    def place(self, record, position):
+        address = record['address']
+        index = bisect.bisect_left(self.order, (position, address))
+        self.order.insert(index, (position, address))
+        self.records.insert(index, record)
+        self.positions[address] = position
+        self.index[address] = record
+
+    def unplace(self, address):
+        index = self._find(address)
+        del self.order[index]
+        del self.records[index]
+        del self.positions[address]
+        return self.index.pop(address)
+
+    def replace(self, record):
+        self.records[self._find(record['address'])] = record
+        self.index[record['address']] = record
+
+
+class JsonStorage:
+    """Original storage format: the whole address book in one JSON file.
+
+    Reads are served from a RecordCache that is re-parsed only when the file's
+    mtime or size changes.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._cache = RecordCache()
+        self._lock = threading.RLock()
+
+    @property
+    def path(self):
+        return self._path or get_storage_file()
+
+    def _records(self):
+        fingerprint = file_fingerprint(self.path)
+        if not self._cache.is_valid(fingerprint):
+            emails = []
+            if fingerprint[0] is not None:
+                try:
+                    with open(self.path, 'r') as f:
+                        data = json.load(f)
+                        emails = data.get("emails", [])
+                except (json.JSONDecodeError, IOError):
+                    emails = []
+            self._cache.set(emails, fingerprint)
+        return self._cache.records
+
+    def _write(self, emails):
+        try:
+            atomic_write_json(self.path, {"emails": emails}, indent=4)
+        except IOError:
+            self._cache.invalidate()
+            raise
+        self._cache.set(emails, file_fingerprint(self.path))
+
+    def load(self):
+        """Loads the list of saved email addresses."""
+        with self._lock:
+            return list(self._records())
+
+    def get(self, address):
+        with self._lock:
+            self._records()
+            return self._cache.index.get(address)
+
+    def add(self, address, password):
+        with self._lock:
+            emails = self._records()
+            # Avoid duplicates
+            if address in self._cache.index:
+                return False
+            
+            emails = emails + [{
+                'address': address,
+                'password': password
+            }]
+            
+            try:
+                self._write(emails)
+                return True
+            except IOError as e:
+                print(f"Error saving to file: {e}")
+                return False
+
+    def add_many(self, accounts):
+        with self._lock:
+            emails = list(self._records())
+            known = set(self._cache.index)
+            added = 0
+            for account in accounts:
+                address = account.get('address')
+                if not address or address in known:
+                    continue
+                known.add(address)
+                emails.append({
+                    'address': address,
+                    'password': account.get('password')
+                })
+                added += 1
+
+            if not added:
+                return 0
+
+            try:
+                self._write(emails)
+                return added
+            except IOError as e:
+                print(f"Error saving to file: {e}")
+                return 0
+
+    def update_metadata(self, address, stage_id, prod_id, name):
+        with self._lock:
+            emails = self._records()
+            record = self._cache.index.get(address)
+            if record is None:
+                return False
+
+            updated = dict(record, stage_id=stage_id, prod_id=prod_id, name=name)
+            emails = [updated if e is record else e for e in emails]
+                
+            try:
+                self._write(emails)
+                return True
+            except IOError:
+                return False
+
+    def delete(self, address):
+        with self._lock:
+            emails = self._records()
+            if address not in self._cache.index:
+                return False # No change
+            new_list = [e for e in emails if e.get('address') != address]
+                
+            try:
+                self._write(new_list)
+                return True
+            except IOError:
+                return False
+
+    def move(self, address, index):
+        with self._lock:
+            record = self.get(address)
+            if record is None:
+                return False
+            emails = [e for e in self._records() if e is not record]
+            emails.insert(max(0, min(index, len(emails))), record)
+            try:
+                self._write(emails)
+                return True
+            except IOError:
+                return False
+
+    def replace_all(self, emails_list):
+        with self._lock:
+            try:
+                self._write(list(emails_list))
+                return True
+            except IOError as e:
+                print(f"Error saving all emails: {e}")
+                return False
+
+
+class SqliteStorage:
+    """Address book in SQLite: indexed by address, one transaction per edit.
+
+    Rows carry a REAL `position` so a drag-and-drop move only rewrites the moved
+    row (it takes the midpoint between its new neighbours). On first use the
+    existing JSON file is imported once, in order. Full loads are cached until
+    the database or its WAL file changes on disk; our own edits patch the
+    cached row in place.
+    """
+
+    def __init__(self, path=None, json_path=None):
+        self._path = path
+        self._json_path = json_path
+        self._conn = None
+        self._cache = PositionedRecordCache()
+        self._lock = threading.RLock()
+
+    def _fingerprint(self):
+        return file_fingerprint(self.path, self.path + "-wal")
+
+    def _after_write(self, change=None):
+        """Applies our own write to the cache in place, or drops the cache if it can't be patched."""
+        if change is None or self._cache.records is None:
+            self._cache.invalidate()
+            return
+        try:
+            change(self._cache)
+        except KeyError:
+            self._cache.invalidate()
+            return
+        self._cache.fingerprint = self._fingerprint()
+
+    @property
+    def path(self):
+        return self._path or get_data_path(SQLITE_FILE_NAME)
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.execute("""CREATE TABLE IF NOT EXISTS emails (
+                    address TEXT PRIMARY KEY,
+                    password TEXT,
+                    stage_id TEXT,
+                    prod_id TEXT,
+                    name TEXT,
+                    extra TEXT,
+                    position REAL NOT NULL)""")
+                conn.execute("CREATE INDEX IF NOT EXISTS emails_position ON emails(position)")
+                conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn = conn
+            self._migrate_from_json()
+        return self._conn
+
+    def _migrate_from_json(self):
+        """Imports the JSON address book the first time the database is opened."""
+        conn = self._conn
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_from_json'").fetchone():
+            return
+        emails = JsonStorage(self._json_path).load()
+        with conn:
+            for position, record in enumerate(emails):
+                if record.get('address'):
+                    conn.execute(*self._insert_sql(record, float(position), ignore=True))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+                         (str(len(emails)),))
+
+    def _insert_sql(self, record, position, ignore=False):
+        extra = {k: v for k, v in record.items() if k not in ('address', 'password') + METADATA_FIELDS}
+        verb = "INSERT OR IGNORE" if ignore else "INSERT"
+        return (f"{verb} INTO emails (address, password, stage_id, prod_id, name, extra, position) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (record['address'], record.get('password'),
+                 *(record.get(f) for f in METADATA_FIELDS),
+                 json.dumps(extra) if extra else None, position))
+
+    def _row_to_record(self, row):
+        record = {'address': row['address'], 'password': row['password']}
+        for field in METADATA_FIELDS:
+            if row[field] is not None:
+                record[field] = row[field]
+        if row['extra']:
+            record.update(json.loads(row['extra']))
+        return record
+
+    def _next_position(self, conn):
+        return conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM emails").fetchone()[0]
+
+    def load(self):
+        with self._lock:
+            try:
+                conn = self._connect()
+                fingerprint = self._fingerprint()
+                if not self._cache.is_valid(fingerprint):
+                    rows = conn.execute("SELECT * FROM emails ORDER BY position, address").fetchall()
+                    self._cache.set_rows([(r['position'], self._row_to_record(r)) for r in rows], fingerprint)
+            except sqlite3.Error as e:
+                print(f"Error reading storage: {e}")
+                return []
+            return list(self._cache.records)
+
+    def get(self, address):
+        with self._lock:
+            self._connect()
+            if self._cache.is_valid(self._fingerprint()):
+                return self._cache.index.get(address)
+            row = self._conn.execute("SELECT * FROM emails WHERE address = ?", (address,)).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def add(self, address, password):
+        return self.add_many([{'address': address, 'password': password}]) == 1
+
+    def add_many(self, accounts):
+        with self._lock:
+            try:
+                conn = self._connect()
+                with conn:
+                    position = self._next_position(conn)
+                    added = []
+                    for account in accounts:
+                        if not account.get('address'):
+                            continue
+                        record = {'address': account['address'], 'password': account.get('password')}
+                        cursor = conn.execute(*self._insert_sql(record, position, ignore=True))
+                        if cursor.rowcount:
+                            added.append((record, position))
+                            position += 1
+
+                def append(cache):
+                    for record, position in added:
+                        cache.place(record, position)
+                self._after_write(append)
+                return len(added)
+            except sqlite3.Error as e:
+                print(f"Error saving to database: {e}")
+                return 0
+
+    def update_metadata(self, address, stage_id, prod_id, name):
+        with self._lock:
+            try:
+                conn = self._connect()
+                with conn:
+                    cursor = conn.execute(
+                        "UPDATE emails SET stage_id = ?, prod_id = ?, name = ? WHERE address = ?",
+                        (stage_id, prod_id, name, address))
+                if cursor.rowcount:
+                    fields = {'stage_id': stage_id, 'prod_id': prod_id, 'name': name}
+                    self._after_write(lambda cache: cache.replace(dict(cache.index[address], **fields)))
+                return cursor.rowcount > 0
+            except sqlite3.Error:
+                return False
+
+    def delete(self, address):
+        with self._lock:
+            try:
+                conn = self._connect()
+                with conn:
+                    cursor = conn.execute("DELETE FROM emails WHERE address = ?", (address,))
+                if cursor.rowcount:
+                    self._after_write(lambda cache: cache.unplace(address))
+                return cursor.rowcount > 0
+            except sqlite3.Error:
+                return False
+
+    def move(self, address, index):
+        """Moves an address to the given 0-based index, touching only that row."""
+        with self._lock:
+            try:
+                conn = self._connect()
+                with conn:
+                    current = conn.execute("SELECT position FROM emails WHERE address = ?", (address,)).fetchone()
+                    if current is None:
+                        return False
+                    # Neighbours in the order that excludes the moved row
+                    others = "FROM emails WHERE address != ? ORDER BY position"
+                    count = conn.execute("SELECT COUNT(*) FROM emails").fetchone()[0] - 1
+                    index = max(0, min(index, count))
+                    before = conn.execute(f"SELECT position {others} LIMIT 1 OFFSET ?",
+                                          (address, index - 1)).fetchone() if index > 0 else None
+                    after = conn.execute(f"SELECT position {others} LIMIT 1 OFFSET ?",
+                                         (address, index)).fetchone()
+                    if before is None and after is None:
+                        return True
+                    if before is None:
+                        position = after[0] - 1
+                    elif after is None:
+                        position = before[0] + 1
+                    else:
+                        position = (before[0] + after[0]) / 2
+                        if not before[0] < position < after[0]:
+                            # Ran out of float precision between neighbours: renumber once
+                            self._renumber(conn)
+                            return self.move(address, index)
+                    conn.execute("UPDATE emails SET position = ? WHERE address = ?", (position, address))
+                self._after_write(lambda cache: cache.place(cache.unplace(address), position))
+                return True
+            except sqlite3.Error as e:
+                print(f"Error reordering: {e}")
+                return False
+
+    def _renumber(self, conn):
+        self._cache.invalidate()
+        rows = conn.execute("SELECT address FROM emails ORDER BY position").fetchall()
+        conn.executemany("UPDATE emails SET position = ? WHERE address = ?",
+                         [(float(i), r[0]) for i, r in enumerate(rows)])
+
+    def replace_all(self, emails_list):
+        with self._lock:
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.execute("DELETE FROM emails")
+                    for position, record in enumerate(emails_list):
+                        conn.execute(*self._insert_sql(record, float(position), ignore=True))
+                self._after_write()
+                return True
+            except sqlite3.Error as e:
+                print(f"Error saving all emails: {e}")
+                return False
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class JournalStorage:
+    """Address book as a snapshot plus an append-only journal of edits.
+
+    Every add, metadata edit, delete and move appends one JSON line to the
+    journal, so a write costs O(1) and a crash can at worst lose a torn last
+    line (which replay ignores). fsync is batched: after `sync_every` records
+    or `sync_interval` seconds, whichever comes first. Once the journal holds
+    `compact_every` records it is folded into a new snapshot, written with an
+    atomic rename, and truncated. Order is kept as a float position per
+    address, so a move is one record and replay never shifts lists around.
+    Each compaction bumps a generation stored in the snapshot and stamped on
+    every journal record; replay skips records from older generations, so a
+    crash between writing the snapshot and truncating the journal is harmless.
+    """
+
+    def __init__(self, journal_path=None, snapshot_path=None, json_path=None,
+                 sync_every=32, sync_interval=1.0, compact_every=10000):
+        self._journal_path = journal_path
+        self._snapshot_path = snapshot_path
+        self._json_path = json_path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+
+        self._records = {}     # address -> record
+        self._positions = {}   # address -> float position
+        self._order = []       # (position, address), sorted
+        self._ordered = []     # records, parallel to _order
+        self._generation = 0
+        self._journal = None
+        self._journal_len = 0
+        self._unsynced = 0
+        self._sync_timer = None
+        self._fingerprint = None
+        self._lock = threading.RLock()
+        atexit.register(self.close)
+
+    @property
+    def journal_path(self):
+        return self._journal_path or get_data_path(JOURNAL_FILE_NAME)
+
+    @property
+    def snapshot_path(self):
+        return self._snapshot_path or get_data_path(SNAPSHOT_FILE_NAME)
+
+    def _current_fingerprint(self):
+        return file_fingerprint(self.snapshot_path, self.journal_path)
+
+    def _ensure_loaded(self):
+        fingerprint = self._current_fingerprint()
+        if self._journal is not None and fingerprint == self._fingerprint:
+            return
+        if self._journal is not None:
+            # Changed by someone else: drop our handle and replay from disk
+            self._flush(sync=False)
+            self._journal.close()
+            self._journal = None
+
+        if fingerprint == (None, None):
+            # First run: seed from the plain JSON address book
+            self._reset(JsonStorage(self._json_path).load())
+            self._generation = 0
+            self._write_snapshot()
+        else:
+            try:
+                with open(self.snapshot_path, 'r') as f:
+                    snapshot = json.load(f)
+                self._reset(snapshot.get("emails", []))
+                self._generation = snapshot.get("generation", 0)
+            except (OSError, ValueError, AttributeError):
+                self._reset([])
+                self._generation = 0
+            self._journal_len = self._replay()
+
+        self._journal = open(self.journal_path, 'a')
+        self._fingerprint = self._current_fingerprint()
+
+    def _reset(self, emails):
+        self._records = {}
+        self._positions = {}
+        for position, record in enumerate(emails):
+            if record.get('address'):
+                self._records[record['address']] = record
+                self._positions[record['address']] = float(position)
+        self._order = sorted((p, a) for a, p in self._positions.items())
+        self._ordered = [self._records[a] for _, a in self._order]
+
+    def _index(self, address):
+        return bisect.bisect_left(self._order, (self._positions[address], address))
+
+    def _place(self, address):
+        index = bisect.bisect_left(self._order, (self._positions[address], address))
+        self._order.insert(index, (self._positions[address], address))
+        self._ordered.insert(index, self._records[address])
+
+    def _unplace(self, address):
+        index = self._index(address)
+        del self._order[index]
+        del self._ordered[index]
+
+    def _replay(self):
+        count = 0
+        good_offset = 0
+        try:
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("incomplete record")
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn write at the tail from a crash: cut it off so new records start clean
+                        f.close()
+                        os.truncate(self.journal_path, good_offset)
+                        break
+                    if entry.get("gen", 0) >= self._generation:
+                        self._apply(entry)
+                    good_offset += len(line)
+                    count += 1
+        except OSError:
+            pass
+        return count
+
+    def _apply(self, entry):
+        op = entry.get("op")
+        address = entry.get("address")
+        if op == "add":
+            if address in self._records:
+                self._unplace(address)
+            self._records[address] = {'address': address, 'password': entry.get('password')}
+            self._positions[address] = entry["position"]
+            self._place(address)
+        elif op == "update" and address in self._records:
+            record = dict(self._records[address], **entry["fields"])
+            self._records[address] = record
+            self._ordered[self._index(address)] = record
+        elif op == "delete" and address in self._records:
+            self._unplace(address)
+            del self._records[address]
+            del self._positions[address]
+        elif op == "move" and address in self._records:
+            self._unplace(address)
+            self._positions[address] = entry["position"]
+            self._place(address)
+        elif op == "replace":
+            self._reset(entry["emails"])
+
+    def _append(self, entry):
+        """Applies an edit in memory and appends it to the journal."""
+        entry["gen"] = self._generation
+        self._apply(entry)
+        self._journal.write(json.dumps(entry, separators=(',', ':')) + "\n")
+        self._journal_len += 1
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self._flush()
+        else:
+            self._journal.flush()
+            self._schedule_sync()
+        if self._journal_len >= self.compact_every:
+            self.compact()
+        self._fingerprint = self._current_fingerprint()
+
+    def _flush(self, sync=True):
+        if self._sync_timer:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+        if self._journal is None:
+            return
+        self._journal.flush()
+        if sync and self._unsynced:
+            os.fsync(self._journal.fileno())
+        self._unsynced = 0
+
+    def _schedule_sync(self):
+        if self._sync_timer is None:
+            self._sync_timer = threading.Timer(self.sync_interval, self.sync)
+            self._sync_timer.daemon = True
+            self._sync_timer.start()
+
+    def sync(self):
+        """Forces buffered journal records to disk."""
+        with self._lock:
+            self._sync_timer = None
+            try:
+                self._flush()
+            except (OSError, ValueError) as e:
+                print(f"Error syncing journal: {e}")
+
+    def _write_snapshot(self):
+        atomic_write_json(self.snapshot_path, {"generation": self._generation,
+                                               "emails": self._ordered_records()})
+
+    def compact(self):
+        """Folds the journal into a fresh snapshot and truncates it."""
+        with self._lock:
+            self._ensure_loaded()
+            self._flush()
+            self._reset(self._ordered_records())
+            self._generation += 1
+            self._write_snapshot()
+            # Records left in the journal by a crash before this point are older than the snapshot and skipped
+            self._journal.close()
+            self._journal = open(self.journal_path, 'w')
+            self._journal_len = 0
+            self._fingerprint = self._current_fingerprint()
+
+    def close(self):
+        with self._lock:
+            if self._journal is not None:
+                try:
+                    self._flush()
+                    self._journal.close()
+                except (OSError, ValueError):
+                    pass
+                self._journal = None
+
+    def _ordered_records(self):
+        return self._ordered
+
+    def _end_position(self):
+        return self._order[-1][0] + 1 if self._order else 0.0
+
+    def load(self):
+        with self._lock:
+            try:
+                self._ensure_loaded()
+            except OSError as e:
+                print(f"Error reading storage: {e}")
+                return []
+            return list(self._ordered_records())
+
+    def get(self, address):
+        with self._lock:
+            self._ensure_loaded()
+            return self._records.get(address)
+
+    def add(self, address, password):
+        return self.add_many([{'address': address, 'password': password}]) == 1
+
+    def add_many(self, accounts):
+        with self._lock:
+            try:
+                self._ensure_loaded()
+                added = 0
+                for account in accounts:
+                    address = account.get('address')
+                    if not address or address in self._records:
+                        continue
+                    # Read the end each time: _append may compact, which renumbers every position
+                    self._append({"op": "add", "address": address,
+                                  "password": account.get('password'), "position": self._end_position()})
+                    added += 1
+                if added:
+                    self._flush()
+                return added
+            except OSError as e:
+                print(f"Error saving to journal: {e}")
+                return 0
+
+    def update_metadata(self, address, stage_id, prod_id, name):
+        with self._lock:
+            try:
+                self._ensure_loaded()
+                if address not in self._records:
+                    return False
+                self._append({"op": "update", "address": address,
+                              "fields": {'stage_id': stage_id, 'prod_id': prod_id, 'name': name}})
+                return True
+            except OSError:
+                return False
+
+    def delete(self, address):
+        with self._lock:
+            try:
+                self._ensure_loaded()
+                if address not in self._records:
+                    return False
+                self._append({"op": "delete", "address": address})
+                return True
+            except OSError:
+                return False
+
+    def move(self, address, index):
+        with self._lock:
+            try:
+                self._ensure_loaded()
+                if address not in self._records:
+                    return False
+                # Neighbours at `index` in the order with this address taken out
+                current = self._index(address)
+                index = max(0, min(index, len(self._order) - 1))
+                if index == current:
+                    return True
+                if index < current:
+                    before = self._order[index - 1][0] if index > 0 else None
+                    after = self._order[index][0]
+                else:
+                    before = self._order[index][0]
+                    after = self._order[index + 1][0] if index + 1 < len(self._order) else None
+                if before is None and after is None:
+                    return True
+                if before is None:
+                    position = after - 1
+                elif after is None:
+                    position = before + 1
+                else:
+                    position = (before + after) / 2
+                    if not before < position < after:
+                        # Out of float precision between neighbours: compaction renumbers everything
+                        self.compact()
+                        return self.move(address, index)
+                self._append({"op": "move", "address": address, "position": position})
+                return True
+            except OSError as e:
+                print(f"Error reordering: {e}")
+                return False
+
+    def replace_all(self, emails_list):
+        with self._lock:
+            try:
+                self._ensure_loaded()
+                self._append({"op": "replace", "emails": list(emails_list)})
+                self.compact()
+                return True
+            except OSError as e:
+                print(f"Error saving all emails: {e}")
+                return False
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """Returns the active storage backend, chosen by $TEMPMAIL_STORAGE on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                kind = os.environ.get(BACKEND_ENV_VAR, "sqlite").lower()
+                if kind == "json":
+                    _backend = JsonStorage()
+                elif kind == "journal":
+                    _backend = JournalStorage()
+                else:
+                    _backend = SqliteStorage()
+    return _backend
+
+def set_backend(backend):
+    """Replaces the active storage backend (any object with the JsonStorage methods)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+    return backend
+
 def load_emails():
     """Loads the list of saved email addresses."""
-    if not os.path.exists(STORAGE_FILE):
-        return []
-    try:
-        with open(STORAGE_FILE, 'r') as f:
-            data = json.load(f)
-            return data.get("emails", [])
-    except (json.JSONDecodeError, IOError):
-        return []
+    return get_backend().load()
+
+def get_email(address):
+    """Returns the saved record for an address, or None."""
+    return get_backend().get(address)
 
 def save_email(address, password):
     """Saves a new unique email address and password to storage."""
-    emails = load_emails()
-    # Avoid duplicates
-    if any(e.get('address') == address for e in emails):
-        return False
-    
-    emails.append({
-        'address': address,
-        'password': password
-    })
-    
-    try:
-        with open(STORAGE_FILE, 'w') as f:
-            json.dump({"emails": emails}, f, indent=4)
-        return True
-    except IOError as e:
-        print(f"Error saving to file: {e}")
-        return False
+    return get_backend().add(address, password)
+
+def save_emails(accounts):
+    """Saves several new email addresses in a single write. Returns how many were added."""
+    return get_backend().add_many(accounts)
 
 def update_email_metadata(address, stage_id, prod_id, name):
     """Updates metadata for an existing email."""
-    emails = load_emails()
-    updated = False
-    for e in emails:
-        if e.get('address') == address:
-            e['stage_id'] = stage_id
-            e['prod_id'] = prod_id
-            e['name'] = name
-            updated = True
-            break
-            
-    if not updated:
-        return False
-        
-    try:
-        with open(STORAGE_FILE, 'w') as f:
-            json.dump({"emails": emails}, f, indent=4)
-        return True
-    except IOError:
-        return False
+    return get_backend().update_metadata(address, stage_id, prod_id, name)
 
 def delete_email(address):
     """Removes an email address from storage."""
-    emails = load_emails()
-    new_list = [e for e in emails if e.get('address') != address]
-    
-    if len(new_list) == len(emails):
-        return False # No change
-        
-    try:
-        with open(STORAGE_FILE, 'w') as f:
-            json.dump({"emails": new_list}, f, indent=4)
-        return True
-    except IOError:
-        return False
+    return get_backend().delete(address)
+
+def move_email(address, index):
+    """Moves an email address to a new position in the saved order."""
+    return get_backend().move(address, index)
 
 def save_all_emails(emails_list):
     """Overwrites the storage with the provided list of emails."""
-    try:
-        with open(STORAGE_FILE, 'w') as f:
-            json.dump({"emails": emails_list}, f, indent=4)
-        return True
-    except IOError as e:
-        print(f"Error saving all emails: {e}")
-        return False
+    return get_backend().replace_all(emails_list)
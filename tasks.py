@@ -0,0 +1,113 @@
+"""Shared bounded executor for UI-triggered background work.
+
+A fixed set of worker threads serves two priority lanes: "interactive" work
+(something the user is waiting for) always runs before "background" work
+(polling, mark-as-read). Tasks submitted with a key form a generation chain:
+a newer task for the same key cancels the older one if it hasn't started yet,
+and if it has, its result is dropped instead of being delivered, so a slow
+response can never overwrite a newer one.
+"""
+import itertools
+import queue
+import threading
+from concurrent.futures import CancelledError, Future
+
+INTERACTIVE = 0
+BACKGROUND = 1
+LANES = {"interactive": INTERACTIVE, "background": BACKGROUND}
+
+
+class TaskHandle:
+    """Future-like handle returned by TaskExecutor.submit()."""
+
+    def __init__(self, future, key, generation):
+        self.future = future
+        self.key = key
+        self.generation = generation
+
+    def cancel(self):
+        return self.future.cancel()
+
+    def cancelled(self):
+        return self.future.cancelled()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """Returns fn's result; raises CancelledError if the task was cancelled or superseded before it ran."""
+        return self.future.result(timeout)
+
+
+class TaskExecutor:
+    def __init__(self, workers=4, dispatch=None, name="task"):
+        """dispatch(fn) runs callbacks on the caller's thread, e.g. lambda fn: root.after(0, fn)."""
+        self.workers = workers
+        self.dispatch = dispatch or (lambda fn: fn())
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._generations = {}  # key -> latest generation
+        self._pending = {}      # key -> handle of the latest task
+        self._lock = threading.Lock()
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, args=(), callback=None, lane="interactive", key=None):
+        """Queues fn(*args); callback(result) is dispatched unless the task was superseded."""
+        future = Future()
+        with self._lock:
+            generation = None
+            if key is not None:
+                generation = self._generations.get(key, 0) + 1
+                self._generations[key] = generation
+                previous = self._pending.get(key)
+                if previous is not None:
+                    previous.cancel()
+            handle = TaskHandle(future, key, generation)
+            if key is not None:
+                self._pending[key] = handle
+        self._queue.put((LANES.get(lane, lane), next(self._seq), handle, fn, args, callback))
+        return handle
+
+    def is_current(self, handle):
+        """True if no newer task has been submitted under the handle's key."""
+        if handle.key is None:
+            return True
+        with self._lock:
+            return self._generations.get(handle.key) == handle.generation
+
+    def invalidate(self, key):
+        """Drops the pending result for key, e.g. when the user navigated away."""
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            previous = self._pending.pop(key, None)
+        if previous is not None:
+            previous.cancel()
+
+    def _work(self):
+        while True:
+            _, _, handle, fn, args, callback = self._queue.get()
+            future = handle.future
+            if not future.set_running_or_notify_cancel():
+                continue
+            if not self.is_current(handle):
+                # Superseded too late to be cancelled: resolve it anyway so result() can't hang
+                future.set_exception(CancelledError(f"superseded task for {handle.key!r}"))
+                continue
+            try:
+                result = fn(*args)
+            except Exception as e:
+                print(f"Thread error: {e}")
+                future.set_exception(e)
+                continue
+            future.set_result(result)
+            if callback and self.is_current(handle):
+                self.dispatch(lambda: self._deliver(handle, callback, result))
+
+    def _deliver(self, handle, callback, result):
+        # Re-check on the receiving thread: a newer task may have been submitted meanwhile
+        if self.is_current(handle):
+            callback(result)
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# The app is a set of flat modules at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_client  # noqa: E402
+from benchmarks.fake_mailtm import FakeMailTm  # noqa: E402
+
+
+@pytest.fixture
+def fake_options():
+    """FakeMailTm options; override per module, or parametrize a test on "fake_options"."""
+    return {}
+
+
+@pytest.fixture
+def fake(fake_options):
+    server = FakeMailTm(**fake_options).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def make_client(fake, tmp_path):
+    """Builds unthrottled MailTmClients for the fake server, with their caches under tmp_path."""
+    clients = []
+
+    def make(**kwargs):
+        client = api_client.MailTmClient(base_url=fake.url, qps=0,
+                                         domain_cache_path=str(tmp_path / "domains.json"),
+                                         token_cache_path=str(tmp_path / "tokens.json"), **kwargs)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
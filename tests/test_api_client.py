@@ -0,0 +1,267 @@
+import os
+import threading
+import time
+
+import pytest
+
+import api_client
+import metrics
+import storage
+import usernames
+from benchmarks.fake_mailtm import make_token
+
+
+@pytest.fixture
+def fake_options():
+    return {"attachments_per_message": 2, "attachment_size": 64 * 1024}
+
+
+def new_account(client, fake, address="user@bench.test", password="secret"):
+    client.register(address, password)
+    fake.add_messages(address, 1)
+    return client.get_token(address, password)
+
+
+def run_with_timeout(fn, timeout=10):
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("value", fn()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "call did not finish"
+    return result["value"]
+
+
+def test_download_attachments_reauthenticates_without_deadlock(fake, make_client, tmp_path):
+    client = make_client(pool_size=2)
+    token = new_account(client, fake)
+    message = client.get_message_content(token, client.get_messages(token)[0]['id'])
+    fake.tokens.clear()  # Every download now gets a 401 and must refresh the token
+
+    paths = run_with_timeout(lambda: client.download_attachments(token, message, str(tmp_path / "out"), workers=8))
+    assert len(paths) == 2 and all(paths)
+    assert all(os.path.getsize(p) == 64 * 1024 for p in paths)
+
+
+def test_api_calls_proceed_while_downloads_hold_sessions(fake, make_client, tmp_path):
+    client = make_client(pool_size=1, download_pool_size=1)
+    token = new_account(client, fake)
+    with client.download_session():
+        assert run_with_timeout(lambda: client.get_messages(token))
+
+
+def test_download_resumes_partial_file(fake, make_client, tmp_path):
+    client = make_client()
+    token = new_account(client, fake)
+    message = client.get_message_content(token, client.get_messages(token)[0]['id'])
+    attachment = message['attachments'][0]
+    dest = str(tmp_path / "file.bin")
+    full = client.download(attachment['downloadUrl'], dest, token)
+    data = open(full, "rb").read()
+
+    with open(dest + ".part", "wb") as f:
+        f.write(data[:1000])
+    os.remove(dest)
+    assert client.download(attachment['downloadUrl'], dest, token) == dest
+    assert open(dest, "rb").read() == data
+
+
+
+@pytest.fixture
+def saved(tmp_path):
+    previous = storage._backend
+    backend = storage.set_backend(storage.JsonStorage(str(tmp_path / "saved_emails.json")))
+    yield backend
+    storage.set_backend(previous)
+
+
+@pytest.mark.parametrize("fake_options", [{"latency": 0.05}])
+def test_create_accounts_closed_early_keeps_in_flight_accounts(fake, make_client, saved):
+    client = make_client()
+    stream = client.create_accounts(40, concurrency=4, save=True)
+    first = [next(stream) for _ in range(2)]
+    stream.close()
+
+    registered = set(fake.accounts)
+    returned = {a["address"] for a in first} | {a["address"] for a in client.unclaimed_accounts}
+    # Queued creations were cancelled; everything that did register is accounted for and saved
+    assert len(registered) < 40
+    assert returned == registered
+    assert {r["address"] for r in saved.load()} == registered
+
+
+def test_token_cache_coalesces_writes(tmp_path, monkeypatch):
+    cache = api_client.TokenCache(path=str(tmp_path / "tokens.json"), save_delay=60)
+    writes = []
+    save = cache._save
+    monkeypatch.setattr(cache, "_save", lambda: writes.append(1) or save())
+
+    for i in range(200):
+        cache.put(f"user{i}@bench.test", make_token(f"user{i}@bench.test"))
+    assert writes == []
+    cache.flush()
+    assert len(writes) == 1
+
+    reloaded = api_client.TokenCache(path=str(tmp_path / "tokens.json"))
+    assert reloaded.get("user7@bench.test") == cache.get("user7@bench.test")
+
+
+@pytest.mark.parametrize("fake_options", [{"throttle_rate": 1.0, "retry_after": 30}])
+def test_fetch_domains_surfaces_rate_limit(make_client):
+    client = make_client(max_rate_limit_wait=1)
+    with pytest.raises(api_client.RateLimited):
+        client.fetch_domains()
+    # A throttled background refresh keeps serving the cached list and can run again later
+    client.domain_cache.store(["cached.test"])
+    client.domain_cache.ttl = 0
+    assert client.domain_cache.get() == ["cached.test"]
+    for _ in range(50):
+        if not client.domain_cache._refreshing:
+            break
+        time.sleep(0.05)
+    assert not client.domain_cache._refreshing
+    assert client.domain_cache.get() == ["cached.test"]
+
+
+def test_parse_retry_after():
+    assert api_client.parse_retry_after("7") == 7.0
+    assert api_client.parse_retry_after(" 1.5 ") == 1.5
+    assert api_client.parse_retry_after("-3") == 0.0
+    assert api_client.parse_retry_after("Wed, 21 Oct 2015 07:28:30 GMT", now=1445412500) == 10.0
+    assert api_client.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", now=1445412500) == 0.0
+    assert api_client.parse_retry_after("soon") is None
+    assert api_client.parse_retry_after(None) is None
+
+
+def test_rate_limiter_allows_a_burst_then_paces():
+    limiter = api_client.RateLimiter(qps=20, burst=5)
+    started = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    assert time.monotonic() - started < 0.05
+    for _ in range(5):
+        limiter.acquire()
+    assert 0.2 <= time.monotonic() - started < 0.6
+
+
+def test_rate_limiter_pause_holds_everyone():
+    limiter = api_client.RateLimiter(qps=1000, burst=10)
+    limiter.pause(0.3)
+    assert limiter.paused_for() > 0.2
+    started = time.monotonic()
+    limiter.acquire("a")
+    assert time.monotonic() - started >= 0.25
+    assert limiter.paused_for() == 0.0
+
+
+def test_rate_limiter_serves_accounts_round_robin():
+    limiter = api_client.RateLimiter(qps=50, burst=1)
+    limiter.acquire()  # Empty the bucket so everyone below has to queue
+    served = []
+    lock = threading.Lock()
+
+    def worker(key):
+        limiter.acquire(key)
+        with lock:
+            served.append(key)
+
+    threads = []
+    for key in ["busy"] * 6 + ["quiet"]:
+        threads.append(threading.Thread(target=worker, args=(key,)))
+        threads[-1].start()
+        time.sleep(0.002)  # Queue in this order
+    for thread in threads:
+        thread.join(5)
+    # The quiet account's single request isn't stuck behind all of the busy one's
+    assert served.index("quiet") <= 2
+
+
+class ScriptedGenerator(usernames.UsernameGenerator):
+    """Hands out the given names first, then random ones."""
+
+    def __init__(self, names):
+        super().__init__()
+        self.names = list(names)
+
+    def generate(self):
+        return self.names.pop(0) if self.names else super().generate()
+
+
+def test_taken_username_is_marked_and_counted(make_client, monkeypatch):
+    generator = ScriptedGenerator(["taken", "free"])
+    monkeypatch.setattr(api_client, "get_username_generator", lambda: generator)
+    client = make_client()
+    client.register("taken@bench.test", "secret")
+    before = metrics.snapshot()["counters"].get("accounts.username_conflicts", 0)
+
+    account = client.create_account()
+    assert account["address"] == "free@bench.test"
+    assert generator.is_used("taken")
+    assert metrics.snapshot()["counters"]["accounts.username_conflicts"] == before + 1
+
+
+@pytest.mark.parametrize("fake_options", [{"latency": 0.02}])
+def test_create_accounts_workers_fit_the_session_pool(make_client, monkeypatch):
+    client = make_client(pool_size=2)
+    running, peak = [0], [0]
+    lock = threading.Lock()
+    create = client._create_account_with_retries
+
+    def counting_create(*args):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        try:
+            return create(*args)
+        finally:
+            with lock:
+                running[0] -= 1
+
+    monkeypatch.setattr(client, "_create_account_with_retries", counting_create)
+    assert len(list(client.create_accounts(6, concurrency=8))) == 6
+    assert peak[0] == 2
+
+
+def concurrently(fn, n=8):
+    """Runs fn from n threads released together; returns each call's result or exception."""
+    barrier = threading.Barrier(n)
+    outcomes = [None] * n
+
+    def run(i):
+        barrier.wait()
+        try:
+            outcomes[i] = fn()
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return outcomes
+
+
+@pytest.mark.parametrize("fake_options", [{"latency": 0.2}])
+@pytest.mark.parametrize("coalesce, expected_requests", [(True, 1), (False, 8)])
+def test_identical_gets_share_one_request(fake, make_client, coalesce, expected_requests):
+    client = make_client(pool_size=8, coalesce=coalesce)
+    token = new_account(client, fake)
+    message_id = client.get_messages(token)[0]["id"]
+    before = fake.stats["requests"]
+
+    results = concurrently(lambda: client.get_message_content(token, message_id))
+    assert fake.stats["requests"] - before == expected_requests
+    assert all(r == results[0] and r["id"] == message_id for r in results)
+
+
+@pytest.mark.parametrize("fake_options", [{"latency": 0.2}])
+def test_coalesced_error_reaches_every_waiter(fake, make_client):
+    client = make_client(pool_size=8)
+    token = new_account(client, fake)
+    fake.error_rate = 1.0
+    before = fake.stats["requests"]
+
+    outcomes = concurrently(lambda: client.get_messages_page(token))
+    assert fake.stats["requests"] - before == 1
+    assert all(isinstance(e, api_client.requests.HTTPError) and e.response.status_code == 500
+               for e in outcomes)
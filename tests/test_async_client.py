@@ -0,0 +1,154 @@
+import asyncio
+import time
+
+import pytest
+
+import api_client
+import async_client
+import metrics
+from test_api_client import ScriptedGenerator
+
+
+def make_async_client(base_url, tmp_path, **kwargs):
+    return async_client.AsyncMailTmClient(
+        base_url=base_url,
+        token_cache=api_client.TokenCache(path=str(tmp_path / "tokens.json")),
+        domain_cache=api_client.DomainCache(lambda: [], path=str(tmp_path / "domains.json")),
+        **kwargs)
+
+
+def test_cold_domain_cache_is_fetched_once(fake, tmp_path):
+    client = make_async_client(fake.url, tmp_path)
+    calls = []
+    fetch_domains = client.fetch_domains
+
+    async def counting_fetch():
+        calls.append(1)
+        return await fetch_domains()
+
+    client.fetch_domains = counting_fetch
+
+    async def main():
+        try:
+            return await asyncio.gather(*(client.get_domain() for _ in range(20)))
+        finally:
+            await client.close()
+
+    domains = asyncio.run(main())
+    assert set(domains) == {"bench.test"}
+    assert len(calls) == 1
+
+
+def test_stalled_handshake_times_out(tmp_path):
+    async def main():
+        # Accepts TCP connections but never answers, so a TLS handshake never completes
+        server = await asyncio.start_server(lambda reader, writer: None, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = make_async_client(f"https://127.0.0.1:{port}", tmp_path, timeouts={"domains": 0.5})
+        try:
+            started = time.monotonic()
+            domains = await asyncio.wait_for(client.fetch_domains(), 5)
+            return domains, time.monotonic() - started
+        finally:
+            await client.close()
+            server.close()
+
+    domains, elapsed = asyncio.run(main())
+    assert domains == []
+    assert elapsed < 3
+
+
+@pytest.mark.parametrize("fake_options", [{"messages_per_account": 3}])
+def test_create_account_and_poll(fake, tmp_path):
+    client = make_async_client(fake.url, tmp_path)
+
+    async def main():
+        try:
+            account = await client.create_account()
+            messages = await client.get_messages(account["token"])
+            return account, messages
+        finally:
+            await client.close()
+
+    account, messages = asyncio.run(main())
+    assert account["address"].endswith("@bench.test")
+    assert len(messages) == 3
+
+
+def test_taken_username_is_marked_and_counted(fake, make_client, tmp_path, monkeypatch):
+    generator = ScriptedGenerator(["taken", "free"])
+    monkeypatch.setattr(api_client, "get_username_generator", lambda: generator)
+    make_client().register("taken@bench.test", "secret")
+    client = make_async_client(fake.url, tmp_path)
+    before = metrics.snapshot()["counters"].get("accounts.username_conflicts", 0)
+
+    async def main():
+        try:
+            return await client.create_account()
+        finally:
+            await client.close()
+
+    account = asyncio.run(main())
+    assert account["address"] == "free@bench.test"
+    assert generator.is_used("taken")
+    assert metrics.snapshot()["counters"]["accounts.username_conflicts"] == before + 1
+
+
+@pytest.mark.parametrize("fake_options", [{"retry_after": 30}])
+def test_429_raises_and_pauses_the_shared_limiter(fake, tmp_path):
+    limiter = api_client.RateLimiter(qps=1000, burst=10)
+    client = make_async_client(fake.url, tmp_path, limiter=limiter, max_rate_limit_wait=1)
+
+    async def main():
+        try:
+            account = await client.create_account()
+            fake.throttle_rate = 1.0
+            with pytest.raises(async_client.AsyncRateLimited) as raised:
+                await client.get_messages(account["token"])
+            assert raised.value.retry_after == 30
+            requests_sent = fake.stats["requests"]
+            # Paused for longer than max_rate_limit_wait: fail fast without touching the server
+            polled = await client.poll_inboxes([account["token"]])
+            assert polled == {account["token"]: None}
+            assert fake.stats["requests"] == requests_sent
+        finally:
+            await client.close()
+
+    asyncio.run(main())
+    assert limiter.paused_for() > 20
+
+
+def test_requests_are_paced_by_the_limiter(fake, tmp_path):
+    client = make_async_client(fake.url, tmp_path, limiter=api_client.RateLimiter(qps=20, burst=5))
+
+    async def main():
+        try:
+            account = await client.create_account()  # Spends 3 of the 5 burst tokens
+            started = time.monotonic()
+            await client.poll_inboxes([account["token"]] * 10)
+            return time.monotonic() - started
+        finally:
+            await client.close()
+
+    elapsed = asyncio.run(main())
+    assert 0.3 <= elapsed < 1.5  # About 8 of the 10 wait 50ms each for the bucket to refill
+
+
+@pytest.mark.parametrize("fake_options", [{"messages_per_account": 2}])
+def test_requests_are_recorded_per_endpoint(fake, tmp_path):
+    client = make_async_client(fake.url, tmp_path)
+    metrics.REGISTRY.reset()
+
+    async def main():
+        try:
+            account = await client.create_account()
+            await client.get_messages(account["token"])
+        finally:
+            await client.close()
+
+    asyncio.run(main())
+    requests = metrics.snapshot()["requests"]
+    assert {"domains", "accounts", "token", "messages"} <= set(requests)
+    assert requests["messages"]["outcomes"] == {"200": 1}
+    assert requests["messages"]["bytes"] > 0
+    assert requests["messages"]["latency"]["count"] == 1
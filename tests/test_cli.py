@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+import cli
+import storage
+
+
+@pytest.fixture
+def saved(tmp_path):
+    previous = storage._backend
+    path = tmp_path / "saved_emails.json"
+    backend = storage.set_backend(storage.JsonStorage(str(path)))
+    yield path
+    storage.set_backend(previous)
+
+
+def error_line(capsys):
+    out, err = capsys.readouterr()
+    assert out == ""
+    return json.loads(err)
+
+
+def test_malformed_record_is_reported_as_json(saved, capsys):
+    saved.write_text(json.dumps({"emails": [{"address": "user@bench.test"}]}))
+    assert cli.main(["login", "user@bench.test"]) == cli.EXIT_ERROR
+    assert error_line(capsys)["type"] == "KeyError"
+
+
+def test_unwritable_export_is_reported_as_json(saved, tmp_path, capsys):
+    storage.save_email("user@bench.test", "secret")
+    assert cli.main(["export", "-o", str(tmp_path / "missing" / "out.json")]) == cli.EXIT_ERROR
+    error = error_line(capsys)
+    assert error["type"] == "FileNotFoundError" and "out.json" in error["error"]
+
+
+def test_list_filters_without_passwords(saved, capsys):
+    storage.save_email("alice@bench.test", "secret")
+    storage.save_email("bob@bench.test", "secret")
+    assert cli.main(["list", "--filter", "ALI"]) == 0
+    assert json.loads(capsys.readouterr().out) == [{"address": "alice@bench.test"}]
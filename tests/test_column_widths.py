@@ -0,0 +1,76 @@
+import pytest
+
+from column_widths import ColumnWidthEngine
+
+font = pytest.importorskip("tkinter.font")
+
+
+class FakeFont:
+    """Measures every character as `size` pixels wide and counts the calls."""
+
+    def __init__(self, font):
+        self.size = font[1]
+        self.calls = 0
+
+    def measure(self, text):
+        self.calls += 1
+        return len(text) * self.size
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(font, "Font", FakeFont)
+    engine = ColumnWidthEngine(["Email", "Password"], cell_padding=0, header_padding=0, default_min=0)
+    engine.set_font(("Arial", 10))
+    return engine
+
+
+def test_width_follows_the_widest_row(engine):
+    engine.add("a", ["short", "pw"])
+    engine.add("b", ["a much longer address", "pw"])
+    assert engine.widths() == {"Email": 210, "Password": 80}
+
+
+def test_removing_the_widest_row_falls_back_to_the_next(engine):
+    engine.add("a", ["x" * 10, "pw"])
+    engine.add("b", ["x" * 30, "pw"])
+    engine.add("c", ["x" * 30, "pw"])
+    engine.remove("b")
+    assert engine.widths()["Email"] == 300  # c still needs it
+    engine.remove("c")
+    assert engine.widths()["Email"] == 100
+    engine.remove("missing")
+    assert engine.widths()["Email"] == 100
+
+
+def test_update_replaces_the_row(engine):
+    engine.add("a", ["x" * 30, "pw"])
+    engine.update("a", ["x" * 12, "pw"])
+    assert engine.widths()["Email"] == 120
+
+
+def test_texts_are_measured_once(engine):
+    for i in range(50):
+        engine.add(i, ["same@bench.test", "pw"])
+    engine.widths()
+    engine.widths()
+    assert engine._font.calls == 4  # Two cell texts and two headers
+
+
+def test_new_font_remeasures_existing_rows(engine):
+    engine.add("a", ["x" * 20, "pw"])
+    engine.set_font(("Arial", 20))
+    assert engine.widths()["Email"] == 400
+    engine.remove("a")
+    assert engine.widths()["Email"] == 100  # The header alone
+
+
+def test_minimums_and_cap(monkeypatch):
+    monkeypatch.setattr(font, "Font", FakeFont)
+    engine = ColumnWidthEngine(["Email", "Password"], min_widths={"Password": 150}, cell_padding=25,
+                               header_padding=20, max_width=300)
+    engine.set_font(("Arial", 10))
+    engine.add("a", ["x" * 100, "pw"])
+    assert engine.widths() == {"Email": 300, "Password": 150}
+    engine.clear()
+    assert engine.widths() == {"Email": 70, "Password": 150}
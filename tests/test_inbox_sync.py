@@ -0,0 +1,92 @@
+import pytest
+
+import api_client
+import inbox_sync
+
+
+@pytest.fixture
+def account(fake, make_client):
+    client = make_client()
+    client.register("user@bench.test", "secret")
+    token = client.get_token("user@bench.test", "secret")
+    return fake, client, token
+
+
+class CountingPages:
+    """Wraps a pager and counts how many pages were pulled from it."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.pulled = 0
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        page = next(self.pages)
+        self.pulled += 1
+        return page
+
+    def close(self):
+        self.closed = True
+        self.pages.close()
+
+
+def test_first_sync_reads_one_page_then_only_new_mail(account):
+    fake, client, token = account
+    fake.add_messages("user@bench.test", 75)
+    sync = inbox_sync.InboxSync()
+
+    pages = CountingPages(client.iter_message_pages(token))
+    diff = sync.plan(pages)
+    assert pages.pulled == 1 and pages.closed
+    assert len(diff.inserted) == api_client.MESSAGES_PAGE_SIZE
+    assert diff.more and not diff.removed
+    sync.apply(diff)
+
+    fake.add_messages("user@bench.test", 3)
+    diff = sync.plan(client.iter_message_pages(token))
+    assert len(diff.inserted) == 3 and not diff.removed and not diff.updated
+    sync.apply(diff)
+
+    assert not sync.plan(client.iter_message_pages(token))
+
+
+def test_older_pages_merge_without_duplicates(account):
+    fake, client, token = account
+    fake.add_messages("user@bench.test", 75)
+    sync = inbox_sync.InboxSync()
+    sync.apply(sync.plan(client.iter_message_pages(token)))
+
+    # New mail shifts the pages, so page 2 now repeats the tail of what page 1 held
+    fake.add_messages("user@bench.test", 5)
+    page, seen = 2, []
+    while page:
+        msgs, page = client.fetch_messages_page(token, page)
+        seen.extend(sync.add_older(msgs))
+    assert len(seen) == 45
+    assert len(sync.messages) == 75
+
+
+def test_seen_changes_and_removals(account):
+    fake, client, token = account
+    fake.add_messages("user@bench.test", 5)
+    sync = inbox_sync.InboxSync()
+    sync.apply(sync.plan(client.iter_message_pages(token)))
+
+    box = fake.messages["user@bench.test"]
+    box[0][0]["seen"] = True
+    removed = box.pop(2)[0]["id"]
+    diff = sync.plan(client.iter_message_pages(token))
+    assert [m["id"] for m in diff.updated] == [box[0][0]["id"]]
+    assert diff.removed == [removed]
+
+
+def test_upsert_reports_changes():
+    sync = inbox_sync.InboxSync()
+    msg = {"id": "m1", "seen": False, "createdAt": "2024-01-01T00:00:00+00:00"}
+    assert sync.upsert(msg) == "insert"
+    assert sync.upsert(dict(msg)) is None
+    assert sync.upsert(dict(msg, seen=True)) == "update"
+    assert sync.remove("m1") and not sync.remove("m1")
@@ -0,0 +1,124 @@
+import json
+import shutil
+
+import storage
+
+
+def make_storage(tmp_path, **kwargs):
+    return storage.JournalStorage(journal_path=str(tmp_path / "journal.log"),
+                                  snapshot_path=str(tmp_path / "snapshot.json"),
+                                  json_path=str(tmp_path / "saved_emails.json"), **kwargs)
+
+
+def addresses(store):
+    return [r['address'] for r in store.load()]
+
+
+def test_edits_survive_reopen(tmp_path):
+    store = make_storage(tmp_path)
+    for address in "ABCD":
+        store.add(address, "pw")
+    store.delete("B")
+    store.move("D", 0)
+    store.update_metadata("C", "s1", "p1", "name")
+    store.close()
+
+    reopened = make_storage(tmp_path)
+    assert addresses(reopened) == ["D", "A", "C"]
+    assert reopened.get("C")["name"] == "name"
+    reopened.close()
+
+
+def test_move_to_every_index(tmp_path):
+    store = make_storage(tmp_path)
+    for address in "ABCDE":
+        store.add(address, "pw")
+    expected = list("ABCDE")
+    for address, index in [("A", 4), ("E", 0), ("C", 2), ("B", 1), ("D", 3), ("A", 0), ("C", 10)]:
+        assert store.move(address, index)
+        expected.remove(address)
+        expected.insert(min(index, len(expected)), address)
+        assert addresses(store) == expected
+    store.close()
+    reopened = make_storage(tmp_path)
+    assert addresses(reopened) == expected
+    reopened.close()
+
+
+def test_crash_between_snapshot_and_truncate_keeps_order(tmp_path):
+    store = make_storage(tmp_path)
+    for address in "ABCDEF":
+        store.add(address, "pw")
+    store.compact()
+    for address in "ABC":
+        store.delete(address)
+    store.move("F", 1)
+    assert addresses(store) == ["D", "F", "E"]
+
+    store.sync()
+    journal = tmp_path / "journal.log"
+    shutil.copy(journal, tmp_path / "journal.bak")
+    store.compact()
+    store.close()
+    # Simulate dying after the snapshot rename but before the journal was emptied
+    shutil.copy(tmp_path / "journal.bak", journal)
+
+    reopened = make_storage(tmp_path)
+    assert addresses(reopened) == ["D", "F", "E"]
+    reopened.add("G", "pw")
+    reopened.close()
+    assert addresses(make_storage(tmp_path)) == ["D", "F", "E", "G"]
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    store = make_storage(tmp_path)
+    store.add("A", "pw")
+    store.add("B", "pw")
+    store.close()
+    with open(tmp_path / "journal.log", "a") as f:
+        f.write('{"op":"delete","addr')
+
+    reopened = make_storage(tmp_path)
+    assert addresses(reopened) == ["A", "B"]
+    reopened.add("C", "pw")
+    reopened.close()
+    assert addresses(make_storage(tmp_path)) == ["A", "B", "C"]
+
+
+def test_legacy_snapshot_without_generation(tmp_path):
+    (tmp_path / "snapshot.json").write_text(json.dumps({"emails": [
+        {"address": "A", "password": "pw"}, {"address": "B", "password": "pw"}]}))
+    (tmp_path / "journal.log").write_text(
+        '{"op":"add","address":"C","password":"pw","position":2.0}\n'
+        '{"op":"move","address":"C","position":-1.0}\n')
+    store = make_storage(tmp_path)
+    assert addresses(store) == ["C", "A", "B"]
+    store.close()
+
+
+def test_compaction_threshold_and_replace(tmp_path):
+    store = make_storage(tmp_path, compact_every=3)
+    for address in "ABCDE":
+        store.add(address, "pw")
+    assert store.replace_all([{"address": "E", "password": "x"}, {"address": "A", "password": "y"}])
+    store.close()
+    reopened = make_storage(tmp_path)
+    assert addresses(reopened) == ["E", "A"]
+    assert reopened.get("A")["password"] == "y"
+    reopened.close()
+
+
+def test_add_many_across_a_compaction_keeps_order(tmp_path):
+    store = make_storage(tmp_path, compact_every=6)
+    for address in "abc":
+        store.add(address, "pw")
+    store.move("c", 0)
+    store.move("b", 0)
+    # The journal hits compact_every after d, so e's position must come from the renumbered order
+    assert store.add_many([{"address": "d", "password": "pw"}, {"address": "e", "password": "pw"}]) == 2
+    assert addresses(store) == ["b", "c", "a", "d", "e"]
+    store.close()
+
+    reopened = make_storage(tmp_path)
+    assert addresses(reopened) == ["b", "c", "a", "d", "e"]
+    reopened.close()
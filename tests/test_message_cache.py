@@ -0,0 +1,136 @@
+import json
+import os
+
+from message_cache import MessageCache
+
+
+def msg(msg_id, body="x"):
+    return {"id": msg_id, "text": body}
+
+
+def size(message):
+    return len(json.dumps(message))
+
+
+def test_evicts_least_recently_used_item():
+    cache = MessageCache(max_items=2)
+    cache.put("a", msg("a"))
+    cache.put("b", msg("b"))
+    assert cache.get("a") == msg("a")  # a is now newer than b
+    cache.put("c", msg("c"))
+
+    assert "b" not in cache
+    assert cache.get("b") is None
+    assert cache.get("a") == msg("a") and cache.get("c") == msg("c")
+
+
+def test_put_again_replaces_and_refreshes_entry():
+    cache = MessageCache(max_items=2)
+    cache.put("a", msg("a"))
+    cache.put("b", msg("b"))
+    cache.put("a", msg("a", "edited"))
+    cache.put("c", msg("c"))
+
+    assert cache.get("a") == msg("a", "edited")
+    assert "b" not in cache
+    assert cache._bytes == size(msg("a", "edited")) + size(msg("c"))
+
+
+def test_evicts_by_total_size():
+    small = msg("a", "x" * 100)
+    cache = MessageCache(max_items=100, max_bytes=2 * size(small) + 10)
+    cache.put("a", small)
+    cache.put("b", msg("b", "x" * 100))
+    assert "a" in cache and "b" in cache
+
+    cache.put("c", msg("c", "x" * 100))
+    assert "a" not in cache
+    assert "b" in cache and "c" in cache
+    assert cache._bytes <= cache.max_bytes
+
+
+def test_message_over_the_byte_limit_is_not_kept():
+    cache = MessageCache(max_bytes=50)
+    cache.put("a", msg("a"))
+    cache.put("big", msg("big", "x" * 100))
+
+    assert "big" not in cache
+    assert cache._bytes == 0
+
+
+def test_evicted_messages_spill_to_disk_and_load_back(tmp_path):
+    spill_dir = str(tmp_path / "cache")
+    cache = MessageCache(max_items=1, spill_dir=spill_dir)
+    cache.put("a", msg("a"))
+    cache.put("b", msg("b"))
+
+    assert os.path.exists(os.path.join(spill_dir, "a.json"))
+    assert "a" in cache
+    assert cache.get("a") == msg("a")  # Read back from disk, which spills b in turn
+    assert os.path.exists(os.path.join(spill_dir, "b.json"))
+
+    reopened = MessageCache(max_items=1, spill_dir=spill_dir)
+    assert "a" in reopened and "b" in reopened
+    assert reopened.get("b") == msg("b")
+
+
+def test_spill_directory_is_bounded(tmp_path):
+    spill_dir = str(tmp_path / "cache")
+    cache = MessageCache(max_items=1, spill_dir=spill_dir, max_spill_items=2)
+    for msg_id in "abcd":
+        cache.put(msg_id, msg(msg_id))
+
+    assert sorted(os.listdir(spill_dir)) == ["b.json", "c.json"]
+    assert "a" not in cache
+    assert cache.get("a") is None
+
+
+def test_unreadable_spill_file_is_a_miss(tmp_path):
+    spill_dir = str(tmp_path / "cache")
+    cache = MessageCache(max_items=1, spill_dir=spill_dir)
+    cache.put("a", msg("a"))
+    cache.put("b", msg("b"))
+    with open(os.path.join(spill_dir, "a.json"), "w") as f:
+        f.write("{not json")
+
+    assert cache.get("a") is None
+    assert "a" not in cache
+
+
+def test_discard_removes_memory_and_disk_copies(tmp_path):
+    spill_dir = str(tmp_path / "cache")
+    cache = MessageCache(max_items=1, spill_dir=spill_dir)
+    cache.put("a", msg("a"))
+    cache.put("b", msg("b"))
+    cache.discard("a")
+    cache.discard("b")
+
+    assert "a" not in cache and "b" not in cache
+    assert os.listdir(spill_dir) == []
+    assert cache._bytes == 0
+
+
+def test_spill_ids_cannot_escape_the_directory(tmp_path):
+    spill_dir = str(tmp_path / "cache")
+    cache = MessageCache(max_items=1, spill_dir=spill_dir)
+    cache.put("../../evil", msg("evil"))
+    cache.put("b", msg("b"))
+
+    assert os.listdir(spill_dir) == ["evil.json"]
+    assert not os.path.exists(str(tmp_path / "evil.json"))
+
+
+def test_prefetch_fetches_only_uncached_messages():
+    cache = MessageCache()
+    cache.put("a", msg("a"))
+    fetched = []
+
+    def fetch(msg_id):
+        fetched.append(msg_id)
+        return msg(msg_id)
+
+    cache.prefetch(["a", "b", "c"], fetch)
+    cache._executor.shutdown(wait=True)
+
+    assert sorted(fetched) == ["b", "c"]
+    assert cache.get("b") == msg("b") and cache.get("c") == msg("c")
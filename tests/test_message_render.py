@@ -0,0 +1,24 @@
+import message_render
+
+
+def test_html_to_text():
+    html = ("<html><head><title>Title</title><style>p {}</style></head><body>"
+            "<h1>Hi</h1><p>Hello&nbsp;<b>world</b>   &amp;\n  you</p>"
+            "<ul><li>one</li><li>two</li></ul>"
+            "<a href=\"https://x.test/a\">click</a> <a href=\"https://x.test/b\">https://x.test/b</a><br>"
+            "<img alt=\"logo\"><script>bad()</script><pre>a\n  b</pre></body></html>")
+    assert message_render.html_to_text(html) == (
+        "Hi\n\nHello world & you\n\n• one\n• two\n\n"
+        "click (https://x.test/a) https://x.test/b\n[logo]\n\na\n  b")
+
+
+def test_html_to_text_tolerates_broken_markup():
+    assert message_render.html_to_text("<p>unclosed <b>bold") == "unclosed bold"
+    assert message_render.html_to_text("") == ""
+
+
+def test_message_body_prefers_text_then_html_then_intro():
+    assert message_render.message_body({"text": "plain", "html": ["<p>x</p>"]}) == "plain"
+    assert message_render.message_body({"html": ["<p>a</p>", "<p>b</p>"]}) == "a\n\nb"
+    assert message_render.message_body({"intro": "preview"}) == "preview"
+    assert message_render.message_body({}) == "(This email has no content.)"
@@ -0,0 +1,59 @@
+import json
+
+import metrics
+
+
+def make_registry():
+    registry = metrics.Metrics()
+    registry.observe_request("messages", 0.004, status=200, nbytes=1000)
+    registry.observe_request("messages", 0.3, status=429)
+    registry.observe_request("messages", 2.0, error="ConnectTimeout")
+    registry.increment("accounts.username_conflicts", 2)
+    registry.observe("ui.refresh_render", 0.02)
+    return registry
+
+
+def test_snapshot_counts_outcomes_errors_and_latency():
+    snap = make_registry().snapshot()
+    entry = snap["requests"]["messages"]
+    assert entry["count"] == 3
+    assert entry["outcomes"] == {"200": 1, "429": 1, "ConnectTimeout": 1}
+    assert entry["errors"] == 2
+    assert entry["bytes"] == 1000
+    assert entry["latency"]["max"] == 2.0
+    assert entry["latency"]["buckets"]["0.005"] == 1 and entry["latency"]["buckets"]["2.5"] == 1
+    assert snap["counters"] == {"accounts.username_conflicts": 2}
+    assert snap["timings"]["ui.refresh_render"]["count"] == 1
+
+
+def test_histogram_quantiles():
+    histogram = metrics.Histogram(buckets=(0.1, 1.0))
+    assert histogram.quantile(0.5) is None
+    for value in (0.05, 0.05, 0.5, 3.0):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(0.99) == 3.0
+
+
+def test_prometheus_export(tmp_path):
+    registry = make_registry()
+    text = registry.to_prometheus()
+    assert 'tempmail_requests_total{endpoint="messages",code="429"} 1' in text
+    assert 'tempmail_requests_total{endpoint="messages",error="ConnectTimeout"} 1' in text
+    assert 'tempmail_response_bytes_total{endpoint="messages"} 1000' in text
+    assert 'tempmail_request_duration_seconds_bucket{endpoint="messages",le="+Inf"} 3' in text
+    assert 'tempmail_request_duration_seconds_count{endpoint="messages"} 3' in text
+    assert 'tempmail_events_total{name="accounts.username_conflicts"} 2' in text
+    assert 'tempmail_timing_seconds_count{name="ui.refresh_render"} 1' in text
+
+    path = tmp_path / "tempmail.prom"
+    registry.export_prometheus(str(path))
+    assert path.read_text() == text
+    assert [p.name for p in tmp_path.iterdir()] == ["tempmail.prom"]
+
+
+def test_json_export(tmp_path):
+    path = tmp_path / "metrics.json"
+    make_registry().export_json(str(path))
+    assert json.loads(path.read_text())["requests"]["messages"]["outcomes"]["200"] == 1
@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+import realtime
+from benchmarks.fake_mailtm import MERCURE_PATH
+
+ADDRESS = "user@bench.test"
+
+
+def test_parse_sse():
+    lines = [":ok", "", "id: 1", "event: update", "data: {\"a\":", "data: 1}", "", "retry: 500", "data: x", ""]
+    assert list(realtime.parse_sse(lines)) == [("update", "{\"a\":\n1}", "1", None), ("message", "x", "1", 500)]  # The last event id carries over, as in the SSE spec
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+        self.states = []
+        self.changed = threading.Condition()
+
+    def on_event(self, data):
+        with self.changed:
+            self.events.append(data)
+            self.changed.notify_all()
+
+    def on_state(self, connected):
+        with self.changed:
+            self.states.append(connected)
+            self.changed.notify_all()
+
+    def wait_for(self, predicate, timeout=5):
+        with self.changed:
+            assert self.changed.wait_for(predicate, timeout), "timed out"
+
+
+@pytest.fixture
+def fake_options():
+    return {"sse_keepalive": 0.2}
+
+
+@pytest.fixture
+def hub(fake, make_client):
+    client = make_client()
+    client.register(ADDRESS, "secret")
+    token = client.get_token(ADDRESS, "secret")
+    recorder = Recorder()
+    subscriber = realtime.MercureSubscriber(token, recorder.on_event, recorder.on_state,
+                                            hub_url=fake.url + MERCURE_PATH, client=client,
+                                            min_backoff=0.05, max_backoff=2.0, healthy_after=0.3)
+    yield fake, client, subscriber, recorder
+    subscriber.stop()
+
+
+def test_account_id_from_me(hub):
+    fake, client, subscriber, recorder = hub
+    assert realtime.get_account_id(subscriber.token, client) == ADDRESS
+
+
+def test_events_and_resume_after_drop(hub):
+    fake, client, subscriber, recorder = hub
+    subscriber.start()
+    recorder.wait_for(lambda: recorder.states == [True])
+
+    fake.add_messages(ADDRESS, 2)
+    recorder.wait_for(lambda: len(recorder.events) == 2)
+    last_id = subscriber.last_event_id
+
+    # Mail that arrives while the stream is down is replayed on reconnect, once
+    fake.drop_streams()
+    fake.add_messages(ADDRESS, 3)
+    recorder.wait_for(lambda: len(recorder.events) == 5 and recorder.states[-1])
+    time.sleep(0.3)
+    assert len(recorder.events) == 5
+    assert len({e["id"] for e in recorder.events}) == 5
+    assert fake.stream_connects[-1][1] == last_id
+
+
+def test_reconnect_reauthenticates_after_401(hub):
+    fake, client, subscriber, recorder = hub
+    old_token = subscriber.token
+    subscriber.start()
+    recorder.wait_for(lambda: recorder.states == [True])
+
+    fake.tokens.clear()  # The hub now rejects the token the stream was opened with
+    fake.drop_streams()
+    recorder.wait_for(lambda: recorder.states[-2:] == [False, True])
+    assert subscriber.token != old_token
+    fake.add_messages(ADDRESS, 1)
+    recorder.wait_for(lambda: len(recorder.events) == 1)
+
+
+def test_reconnect_picks_up_renewed_token(hub):
+    fake, client, subscriber, recorder = hub
+    subscriber.start()
+    recorder.wait_for(lambda: recorder.states == [True])
+
+    renewed = client.get_token(ADDRESS, "secret", force=True)
+    fake.drop_streams()
+    recorder.wait_for(lambda: recorder.states[-2:] == [False, True])
+    assert subscriber.token == renewed
+
+
+def test_backoff_resets_after_healthy_connection(hub):
+    fake, client, subscriber, recorder = hub
+    fake.stream_failures = 4  # Back off to about 0.8s before the first connection succeeds
+    subscriber.start()
+    recorder.wait_for(lambda: True in recorder.states)
+
+    time.sleep(0.5)  # Past healthy_after
+    dropped = time.monotonic()
+    fake.drop_streams()
+    recorder.wait_for(lambda: recorder.states[-2:] == [False, True])
+    reconnected = fake.stream_connects[-1][2]
+    assert reconnected - dropped < 0.3
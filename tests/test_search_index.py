@@ -0,0 +1,37 @@
+import search_index
+
+
+def test_edit_changes_whether_a_record_matches():
+    index = search_index.SearchIndex()
+    index.add("a@bench.test", {"address": "a@bench.test", "name": "Alice"})
+    assert index.matches("a@bench.test", "ALI")
+    assert index.search("ali") == {"a@bench.test"}
+
+    index.update("a@bench.test", {"address": "a@bench.test", "name": "Bob"})
+    assert not index.matches("a@bench.test", "ali")
+    assert index.search("ali") == set()
+    assert index.matches("a@bench.test", "")
+    assert not index.matches("missing@bench.test", "")
+
+
+def test_search_matches_a_plain_substring_scan():
+    records = [{"address": f"{adj}-{noun}-{i}@bench.test", "stage_id": f"S{i % 7}", "name": name}
+               for i, (adj, noun, name) in enumerate([("happy", "tiger", "Ann"), ("brave", "otter", ""),
+                                                      ("calm", "tiger", "Tigran"), ("happy", "koala", None)] * 5)]
+    index = search_index.SearchIndex()
+    index.rebuild(records)
+    assert len(index) == len(records)
+    for query in ["", "t", "ti", "tig", "TIGER", "happy-t", "s3", "ann", "@bench.test", "zebra", "er-1"]:
+        expected = {r["address"] for r in records
+                    if any(query.lower() in str(r.get(f) or "").lower() for f in search_index.SEARCH_FIELDS)}
+        assert index.search(query) == expected, query
+
+
+def test_matches_never_span_two_fields():
+    index = search_index.SearchIndex()
+    index.add("a@bench.test", {"address": "a@bench.test", "stage_id": "dev", "prod_id": "ops"})
+    assert index.search("devops") == set()
+    assert index.search("dev\x00ops") == set()
+    index.remove("a@bench.test")
+    index.remove("a@bench.test")
+    assert index.search("dev") == set() and len(index) == 0
@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+import storage
+
+
+def test_sqlite_cache_matches_database_after_edits(tmp_path):
+    path = str(tmp_path / "emails.db")
+    backend = storage.SqliteStorage(path, str(tmp_path / "saved_emails.json"))
+    backend.add_many([{"address": f"user{i}@bench.test", "password": "pw"} for i in range(50)])
+    backend.load()  # Warm the cache so the edits below patch it
+
+    rng = random.Random(1)
+    for step in range(300):
+        addresses = [r["address"] for r in backend.load()]
+        op = rng.choice(["move", "move", "update", "delete", "add"])
+        if op == "move":
+            backend.move(rng.choice(addresses), rng.randrange(len(addresses) + 1))
+        elif op == "update":
+            backend.update_metadata(rng.choice(addresses), f"s{step}", f"p{step}", f"n{step}")
+        elif op == "delete":
+            backend.delete(rng.choice(addresses))
+        else:
+            backend.add(f"new{step}@bench.test", "pw")
+    # Repeated moves into the same gap use up float precision and force a renumber
+    for _ in range(60):
+        backend.move(backend.load()[-1]["address"], 1)
+
+    cached = backend.load()
+    fresh = storage.SqliteStorage(path, str(tmp_path / "saved_emails.json"))
+    assert cached == fresh.load()
+    assert all(backend.get(r["address"]) == r for r in cached)
+    backend.close()
+    fresh.close()
+
+
+@pytest.fixture(params=["json", "sqlite", "journal"])
+def make_backend(request, tmp_path):
+    json_path = str(tmp_path / "saved_emails.json")
+    opened = []
+
+    def make():
+        if request.param == "json":
+            backend = storage.JsonStorage(json_path)
+        elif request.param == "sqlite":
+            backend = storage.SqliteStorage(str(tmp_path / "emails.db"), json_path)
+        else:
+            backend = storage.JournalStorage(str(tmp_path / "emails.journal"), str(tmp_path / "emails.snapshot"),
+                                             json_path)
+        opened.append(backend)
+        return backend
+
+    yield make
+    for backend in opened:
+        if hasattr(backend, "close"):
+            backend.close()
+
+
+def addresses(backend):
+    return [r["address"] for r in backend.load()]
+
+
+def test_edits_survive_reopening(make_backend):
+    backend = make_backend()
+    assert backend.add("a@bench.test", "pw")
+    assert not backend.add("a@bench.test", "other")
+    assert backend.add_many([{"address": "b@bench.test", "password": "pw"},
+                             {"address": "a@bench.test", "password": "pw"},
+                             {"address": "c@bench.test", "password": "pw"}]) == 2
+    assert backend.update_metadata("b@bench.test", "s1", "p1", "Bob")
+    assert backend.move("c@bench.test", 0)
+    assert backend.delete("a@bench.test")
+    assert not backend.delete("a@bench.test")
+    if hasattr(backend, "close"):
+        backend.close()
+
+    reopened = make_backend()
+    assert addresses(reopened) == ["c@bench.test", "b@bench.test"]
+    assert reopened.get("b@bench.test") == {"address": "b@bench.test", "password": "pw",
+                                            "stage_id": "s1", "prod_id": "p1", "name": "Bob"}
+    assert reopened.get("a@bench.test") is None
+
+
+def test_move_clamps_and_replace_all_resets(make_backend):
+    backend = make_backend()
+    backend.add_many([{"address": f"{c}@bench.test", "password": "pw"} for c in "abcd"])
+    backend.move("a@bench.test", 99)
+    backend.move("d@bench.test", -5)
+    backend.move("b@bench.test", 2)
+    assert addresses(backend) == ["d@bench.test", "c@bench.test", "b@bench.test", "a@bench.test"]
+    assert not backend.move("missing@bench.test", 0)
+
+    assert backend.replace_all([{"address": "z@bench.test", "password": "pw"}])
+    assert addresses(backend) == ["z@bench.test"]
+
+
+def test_new_backends_import_the_json_address_book(tmp_path):
+    json_path = str(tmp_path / "saved_emails.json")
+    storage.JsonStorage(json_path).add_many([{"address": f"{c}@bench.test", "password": "pw"} for c in "abc"])
+    backend = storage.SqliteStorage(str(tmp_path / "emails.db"), json_path)
+    assert addresses(backend) == ["a@bench.test", "b@bench.test", "c@bench.test"]
+    backend.close()
@@ -0,0 +1,98 @@
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+
+import tasks
+
+
+class Gate:
+    """A task that blocks its worker until released."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, value=None):
+        self.started.set()
+        assert self.release.wait(5)
+        return value
+
+
+def test_newer_task_cancels_a_queued_one():
+    executor = tasks.TaskExecutor(workers=1)
+    gate = Gate()
+    executor.submit(gate)
+    assert gate.started.wait(5)
+
+    first = executor.submit(lambda: "first", key="message")
+    second = executor.submit(lambda: "second", key="message")
+    assert (first.generation, second.generation) == (1, 2)
+    assert first.cancelled()
+    assert not executor.is_current(first) and executor.is_current(second)
+    gate.release.set()
+    assert second.result(5) == "second"
+
+
+def test_stale_result_is_not_delivered():
+    executor = tasks.TaskExecutor(workers=2)
+    delivered = []
+    slow = Gate()
+    old = executor.submit(slow, ("old",), callback=delivered.append, key="message")
+    assert slow.started.wait(5)
+
+    new = executor.submit(lambda: "new", callback=delivered.append, key="message")
+    assert new.result(5) == "new"
+    slow.release.set()
+    # The slow task still finishes, but its result never reaches the callback
+    assert old.result(5) == "old"
+    assert delivered == ["new"]
+
+
+def test_invalidate_drops_a_running_result():
+    executor = tasks.TaskExecutor(workers=1)
+    delivered = []
+    gate = Gate()
+    handle = executor.submit(gate, ("value",), callback=delivered.append, key="message")
+    assert gate.started.wait(5)
+    executor.invalidate("message")
+    gate.release.set()
+    assert handle.result(5) == "value"
+    assert delivered == []
+
+
+def test_superseded_task_that_could_not_be_cancelled_is_resolved():
+    executor = tasks.TaskExecutor(workers=1)
+    gate = Gate()
+    executor.submit(gate)
+    assert gate.started.wait(5)
+
+    handle = executor.submit(lambda: "stale", key="message")
+    # As if a newer submit raced the worker: the generation moved on but cancel() came too late
+    with executor._lock:
+        executor._generations["message"] += 1
+    gate.release.set()
+    with pytest.raises(CancelledError):
+        handle.result(5)
+
+
+def test_interactive_lane_runs_first():
+    executor = tasks.TaskExecutor(workers=1)
+    gate = Gate()
+    executor.submit(gate)
+    assert gate.started.wait(5)
+
+    order = []
+    handles = [executor.submit(order.append, ("background",), lane="background"),
+               executor.submit(order.append, ("interactive",), lane="interactive")]
+    gate.release.set()
+    for handle in handles:
+        handle.result(5)
+    assert order == ["interactive", "background"]
+
+
+def test_errors_reach_the_handle():
+    executor = tasks.TaskExecutor(workers=1)
+    handle = executor.submit(lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        handle.result(5)
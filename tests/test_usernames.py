@@ -0,0 +1,43 @@
+import usernames
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = usernames.BloomFilter(2000, error_rate=0.01)
+    for i in range(2000):
+        bloom.add(f"name-{i}")
+    assert all(f"name-{i}" in bloom for i in range(2000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300  # 1% target, with plenty of slack
+
+
+def test_scalable_bloom_filter_grows_past_its_capacity():
+    bloom = usernames.ScalableBloomFilter(100, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"name-{i}")
+    assert len(bloom) == 1000
+    assert len(bloom.filters) > 1
+    assert all(f"name-{i}" in bloom for i in range(1000))
+    assert sum(f"other-{i}" in bloom for i in range(5000)) < 150
+
+
+def test_generator_skips_names_it_has_seen():
+    generator = usernames.UsernameGenerator(pattern="{noun}{num}", nouns=["fox"], num_range=(1, 50))
+    assert generator.combinations == 50
+    generator.seed(["fox1@bench.test", "FOX2"])
+    generator.mark_used("fox3@other.test")
+    names = [generator.generate() for _ in range(47)]
+    assert len(set(names)) == 47
+    assert not {"fox1", "fox2", "fox3"} & set(names)
+
+
+def test_generator_widens_the_name_once_the_space_is_exhausted():
+    generator = usernames.UsernameGenerator(pattern="{noun}", nouns=["fox"], max_attempts=4)
+    assert generator.generate() == "fox"
+    widened = generator.generate()
+    assert widened.startswith("fox-") and generator.is_used(widened)
+
+
+def test_generate_password():
+    password = usernames.generate_password(24)
+    assert len(password) == 24
+    assert set(password) <= set(usernames.PASSWORD_ALPHABET)
@@ -0,0 +1,51 @@
+import threading
+import time
+
+import api_client
+import watcher
+
+
+def test_poll_soon_does_not_add_polling_chains(monkeypatch):
+    polls = []
+    lock = threading.Lock()
+
+    def get_messages_page(token, page=1):
+        with lock:
+            polls.append(time.monotonic())
+        return []
+
+    monkeypatch.setattr(api_client, "get_token", lambda address, password: "token")
+    monkeypatch.setattr(api_client, "get_messages_page", get_messages_page)
+
+    w = watcher.InboxWatcher(lambda address, unread: None, min_interval=1.0, max_interval=1.0, max_rate=100)
+    w.set_accounts([{"address": "a@example.com", "password": "pw"}])
+    w.poll_soon("a@example.com")
+    w.start()
+    # Each click lands while the next regular poll is already scheduled a second out
+    for _ in range(5):
+        time.sleep(0.1)
+        w.poll_soon("a@example.com")
+    time.sleep(0.3)
+    with lock:
+        before = len(polls)
+    time.sleep(1.2)
+    w.stop()
+
+    # Only the last poll_soon's chain is left; duplicates would each poll again in this window
+    assert before >= 5
+    assert len(polls) - before <= 2
+
+
+def test_removed_accounts_are_not_polled(monkeypatch):
+    polled = []
+    monkeypatch.setattr(api_client, "get_token", lambda address, password: polled.append(address) or None)
+
+    w = watcher.InboxWatcher(lambda address, unread: None, min_interval=0.2, max_rate=100)
+    w.set_accounts([{"address": "a@example.com", "password": "pw"}, {"address": "b@example.com", "password": "pw"}])
+    w.set_accounts([{"address": "b@example.com", "password": "pw"}])
+    w.start()
+    time.sleep(0.5)
+    w.stop()
+
+    assert "b@example.com" in polled
+    assert "a@example.com" not in polled
@@ -0,0 +1,168 @@
+"""Collision-aware username generation.
+
+UsernameGenerator fills a pattern such as "{adj}-{noun}-{num}" from word
+lists and remembers every name it has handed out, or that is already saved,
+in a scalable Bloom filter: a few bits per name whatever the size of the
+combination space. A name the filter has (probably) seen is skipped, so bulk
+creation rarely sends a registration that comes back as "already used". A
+false positive only skips a free name; it never produces a duplicate.
+"""
+import hashlib
+import math
+import random
+import secrets
+import string
+import threading
+
+ADJECTIVES = [
+    "happy", "clever", "brave", "calm", "eager", "fancy", "gentle", "jolly", "kind", "lively",
+    "nice", "proud", "silly", "witty", "zealous", "swift", "bright", "cool", "fiery", "lucky",
+    "noble", "quiet", "royal", "super", "tiny", "wild", "young", "zesty", "epic", "rapid",
+    "azure", "amber", "crimson", "golden", "indigo", "jade", "lemon", "lime", "navy", "olive",
+    "teal", "violet", "white", "yellow", "rusty", "snowy", "sunny", "windy", "frosty", "misty",
+    "agile", "alert", "ancient", "arctic", "bold", "bouncy", "breezy", "bubbly", "busy", "cheery",
+    "chilly", "cosmic", "cozy", "crisp", "curious", "daring", "dapper", "dazzling", "dreamy", "dusty",
+    "early", "electric", "elegant", "fluffy", "friendly", "funky", "fuzzy", "giant", "glad", "gleaming",
+    "glossy", "graceful", "grand", "hasty", "hidden", "honest", "humble", "icy", "jazzy", "jumpy",
+    "keen", "laughing", "leafy", "little", "loyal", "magic", "mellow", "merry", "mighty", "modern",
+    "neat", "nimble", "odd", "orange", "peppy", "perky", "plucky", "polished", "purple", "quick",
+    "quirky", "radiant", "rainy", "rosy", "rugged", "salty", "scarlet", "shiny", "silent", "silver",
+    "sleepy", "smooth", "snappy", "solar", "sparkly", "speedy", "spicy", "steady", "stormy", "sturdy",
+    "sweet", "tidy", "tranquil", "vivid", "warm", "wavy", "wise", "wobbly", "zany", "zippy",
+]
+
+ANIMALS = [
+    "panda", "tiger", "lion", "eagle", "hawk", "wolf", "bear", "fox", "deer", "koala",
+    "cat", "dog", "owl", "seal", "swan", "duck", "frog", "goat", "crab", "fish",
+    "shark", "whale", "dolphin", "zebra", "camel", "llama", "moose", "mouse", "rat", "rabbit",
+    "horse", "sheep", "cobra", "viper", "gecko", "iguana", "python", "turtle", "beetle", "butterfly",
+    "spider", "falcon", "otter", "badger", "beaver", "bison", "dingo", "hyena", "jaguar", "lemur",
+    "alpaca", "antelope", "armadillo", "baboon", "bat", "bee", "buffalo", "bulldog", "canary", "caribou",
+    "cheetah", "chipmunk", "cougar", "coyote", "crane", "cricket", "crow", "donkey", "dove", "dragonfly",
+    "elk", "emu", "ferret", "finch", "flamingo", "gazelle", "gerbil", "giraffe", "gopher", "gorilla",
+    "hamster", "hedgehog", "heron", "hippo", "ibis", "impala", "jackal", "jellyfish", "kangaroo", "kitten",
+    "kiwi", "ladybug", "lark", "leopard", "lobster", "lynx", "macaw", "magpie", "mallard", "manatee",
+    "marmot", "meerkat", "mink", "mole", "mongoose", "narwhal", "newt", "ocelot", "octopus", "oriole",
+    "ostrich", "panther", "parrot", "pelican", "penguin", "pigeon", "platypus", "pony", "porcupine", "puffin",
+    "puma", "quail", "raccoon", "raven", "robin", "salmon", "sparrow", "squid", "squirrel", "starling",
+    "stingray", "stork", "tapir", "toucan", "trout", "walrus", "weasel", "wombat", "wren", "yak",
+]
+
+DEFAULT_PATTERN = "{adj}-{noun}-{num}"
+PASSWORD_ALPHABET = string.ascii_letters + string.digits
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        bits = math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.num_bits = max(8, bits)
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, item):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def add(self, item):
+        for p in self._positions(item):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+class ScalableBloomFilter:
+    """Chain of Bloom filters that adds a larger one whenever the newest fills up."""
+
+    def __init__(self, initial_capacity=10000, error_rate=0.001, growth=4):
+        self.error_rate = error_rate
+        self.growth = growth
+        # Tighten each new stage so the combined false-positive rate stays bounded
+        self.filters = [BloomFilter(initial_capacity, error_rate / 2)]
+
+    def __contains__(self, item):
+        return any(item in f for f in self.filters)
+
+    def __len__(self):
+        return sum(f.count for f in self.filters)
+
+    def add(self, item):
+        current = self.filters[-1]
+        if current.count >= current.capacity:
+            current = BloomFilter(current.capacity * self.growth,
+                                  self.error_rate / (2 ** (len(self.filters) + 1)))
+            self.filters.append(current)
+        current.add(item)
+
+
+class UsernameGenerator:
+    def __init__(self, pattern=DEFAULT_PATTERN, adjectives=ADJECTIVES, nouns=ANIMALS,
+                 num_range=(100, 9999), max_attempts=64, capacity=10000, error_rate=0.001):
+        """pattern may use {adj}, {noun} and {num}; num is drawn from num_range (inclusive)."""
+        self.pattern = pattern
+        self.adjectives = list(adjectives)
+        self.nouns = list(nouns)
+        self.num_range = num_range
+        self.max_attempts = max_attempts
+        self._used = ScalableBloomFilter(capacity, error_rate)
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    @property
+    def combinations(self):
+        """Size of the name space the pattern can produce."""
+        total = 1
+        if "{adj}" in self.pattern:
+            total *= len(self.adjectives)
+        if "{noun}" in self.pattern:
+            total *= len(self.nouns)
+        if "{num}" in self.pattern:
+            total *= self.num_range[1] - self.num_range[0] + 1
+        return total
+
+    def _candidate(self):
+        return self.pattern.format(
+            adj=self._random.choice(self.adjectives),
+            noun=self._random.choice(self.nouns),
+            num=self._random.randint(*self.num_range))
+
+    def mark_used(self, name):
+        """Records a name (or a full address) as taken, e.g. after a 422 from /accounts."""
+        with self._lock:
+            self._used.add(name.split("@")[0].lower())
+
+    def seed(self, names):
+        with self._lock:
+            for name in names:
+                if name:
+                    self._used.add(name.split("@")[0].lower())
+
+    def is_used(self, name):
+        with self._lock:
+            return name.split("@")[0].lower() in self._used
+
+    def generate(self):
+        """Returns a name not handed out or seen before (best effort once the space is nearly exhausted)."""
+        with self._lock:
+            for _ in range(self.max_attempts):
+                name = self._candidate()
+                if name not in self._used:
+                    self._used.add(name)
+                    return name
+            # Pattern space is (nearly) exhausted; widen it with a random suffix rather than fail
+            name = f"{self._candidate()}-{secrets.token_hex(3)}"
+            self._used.add(name)
+            return name
+
+
+def generate_password(length=16, alphabet=PASSWORD_ALPHABET):
+    """Random password from a cryptographically secure source."""
+    return "".join(secrets.choice(alphabet) for _ in range(length))
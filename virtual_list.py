@@ -0,0 +1,341 @@
+"""Windowed rendering on top of a ttk.Treeview.
+
+VirtualTreeview keeps the full row list (key -> values, tags) in Python and
+only materializes a fixed pool of Treeview items: the rows that fit in the
+widget plus a small overscan. Scrolling moves an offset into the backing list
+and re-fills the pool, so memory and insert time no longer grow with the
+number of rows. Callers work with row keys (addresses, message ids) instead of
+Treeview item ids; identify_row(), bbox() and the selection are translated
+between the two.
+"""
+
+class VirtualTreeview:
+    def __init__(self, tree, scrollbar=None, overscan=5, on_select=None, row_height=None, on_scroll=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.overscan = overscan
+        self.on_select = on_select  # Called with no arguments when the user selects a different row
+        self.row_height = row_height
+        self.on_scroll = on_scroll  # Called with no arguments after the window moves to a new offset
+
+        self._order = []      # all keys in display order
+        self._rows = {}       # key -> (values, tags)
+        self._hidden = set()  # keys filtered out of view
+        self._visible = None  # cached list of shown keys
+        self._positions = None  # cached key -> index in the visible list
+
+        self._pool = []       # Treeview item ids, top to bottom
+        self._rendered = {}   # item id -> (key, values, tags) last pushed to Tk
+        self._item_keys = {}  # item id -> key currently shown
+        self._offset = 0
+        self._rendered_offset = 0
+        self._selected = None
+        self._render_pending = False
+
+        if scrollbar is not None:
+            scrollbar.config(command=self.yview)
+        tree.config(yscrollcommand="")
+        tree.bind("<<TreeviewSelect>>", self._on_tree_select, add="+")
+        tree.bind("<Configure>", lambda e: self._resize(), add="+")
+        tree.bind("<MouseWheel>", self._on_wheel)
+        tree.bind("<Button-4>", lambda e: self.scroll(-3) or "break")
+        tree.bind("<Button-5>", lambda e: self.scroll(3) or "break")
+        tree.bind("<Up>", lambda e: self._step_selection(-1) or "break")
+        tree.bind("<Down>", lambda e: self._step_selection(1) or "break")
+        tree.bind("<Prior>", lambda e: self.scroll(-self._page_size()) or "break")
+        tree.bind("<Next>", lambda e: self.scroll(self._page_size()) or "break")
+
+    # --- Backing data ---
+
+    def _invalidate(self):
+        self._visible = None
+        self._positions = None
+        self._schedule_render()
+
+    def keys(self):
+        """Returns the keys currently shown (not filtered out), in order."""
+        if self._visible is None:
+            if self._hidden:
+                self._visible = [k for k in self._order if k not in self._hidden]
+            else:
+                self._visible = list(self._order)
+        return self._visible
+
+    def all_keys(self):
+        return list(self._order)
+
+    def __len__(self):
+        return len(self.keys())
+
+    def exists(self, key):
+        return key in self._rows
+
+    def is_visible(self, key):
+        return key in self._rows and key not in self._hidden
+
+    def index(self, key):
+        """Position of a key among the shown rows."""
+        if self._positions is None:
+            self._positions = {k: i for i, k in enumerate(self.keys())}
+        return self._positions[key]
+
+    def values(self, key):
+        return self._rows[key][0]
+
+    def tags(self, key):
+        return self._rows[key][1]
+
+    def set_rows(self, rows):
+        """Replaces all rows with an iterable of (key, values, tags)."""
+        self._order = []
+        self._rows = {}
+        self._hidden = set()
+        for key, values, tags in rows:
+            self._order.append(key)
+            self._rows[key] = (tuple(values), tuple(tags))
+        if self._selected not in self._rows:
+            self._selected = None
+        self._offset = 0
+        self._invalidate()
+
+    def insert(self, key, values, tags=(), index="end"):
+        if key in self._rows:
+            self._order.remove(key)
+        self._rows[key] = (tuple(values), tuple(tags))
+        if index == "end":
+            self._order.append(key)
+        else:
+            self._order.insert(index, key)
+            # Keep the rows in view steady when something is added above them
+            if self._offset > 0 and index <= self._offset:
+                self._offset += 1
+        self._invalidate()
+
+    def update(self, key, values=None, tags=None):
+        old_values, old_tags = self._rows[key]
+        self._rows[key] = (old_values if values is None else tuple(values),
+                           old_tags if tags is None else tuple(tags))
+        if key not in self._hidden:
+            self._schedule_render()
+
+    def set(self, key, column, value):
+        """Updates a single cell, like Treeview.set()."""
+        columns = list(self.tree["columns"])
+        values = list(self._rows[key][0])
+        values[columns.index(column)] = value
+        self.update(key, values=values)
+
+    def delete(self, *keys):
+        for key in keys:
+            if self._rows.pop(key, None) is not None:
+                self._order.remove(key)
+                self._hidden.discard(key)
+                if key == self._selected:
+                    self._selected = None
+        self._invalidate()
+
+    def clear(self):
+        self.set_rows([])
+
+    def move(self, key, index):
+        """Moves a row so it ends up at index among the other shown rows, like Treeview.move."""
+        others = [k for k in self.keys() if k != key]
+        self._order.remove(key)
+        if index < len(others):
+            pos = self._order.index(others[max(0, index)])
+        else:
+            pos = self._order.index(others[-1]) + 1 if others else len(self._order)
+        self._order.insert(pos, key)
+        self._invalidate()
+
+    def set_hidden(self, hidden):
+        """Filters rows out of view; only the shown window is re-rendered."""
+        self._hidden = set(hidden)
+        self._offset = 0
+        self._invalidate()
+
+    def set_row_hidden(self, key, hidden):
+        """Hides or shows a single row, keeping the scroll position."""
+        if hidden == (key in self._hidden):
+            return
+        if hidden:
+            self._hidden.add(key)
+        else:
+            self._hidden.discard(key)
+        self._invalidate()
+
+    # --- Selection ---
+
+    def selection(self):
+        return self._selected
+
+    def select(self, key):
+        self._selected = key
+        if key is not None and self.is_visible(key):
+            self.see(key)
+        self._render()
+
+    def _on_tree_select(self, event=None):
+        items = self.tree.selection()
+        if not items:
+            return
+        key = self._item_keys.get(items[0])
+        if key is None or key == self._selected:
+            return  # Re-selection while re-rendering the window
+        self._selected = key
+        self.see(key)  # Pull a partly visible row fully into the window
+        if self.on_select:
+            self.on_select()
+
+    def _step_selection(self, delta):
+        keys = self.keys()
+        if not keys:
+            return
+        index = self.index(self._selected) + delta if self._selected in self._rows and self.is_visible(self._selected) else 0
+        index = max(0, min(index, len(keys) - 1))
+        key = keys[index]
+        if key != self._selected:
+            self._selected = key
+            self.see(key)
+            self._render()
+            if self.on_select:
+                self.on_select()
+
+    # --- Scrolling and rendering ---
+
+    def _visible_rows(self):
+        height = self.tree.winfo_height()
+        row_height = self.row_height or 20
+        # One row's worth of height goes to the column headings
+        return max(1, height // row_height - 1)
+
+    def _page_size(self):
+        return max(1, self._visible_rows() - 1)
+
+    def _max_offset(self):
+        return max(0, len(self.keys()) - self._visible_rows())
+
+    def see(self, key):
+        index = self.index(key)
+        rows = self._visible_rows()
+        if index < self._offset:
+            self._offset = index
+        elif index >= self._offset + rows:
+            self._offset = index - rows + 1
+        self._schedule_render()
+
+    def scroll(self, rows):
+        offset = max(0, min(self._offset + rows, self._max_offset()))
+        if offset != self._offset:
+            self._offset = offset
+            self._render()
+
+    def yview(self, *args):
+        """Scrollbar command: handles 'moveto' and 'scroll' like Treeview.yview."""
+        if not args:
+            return
+        if args[0] == "moveto":
+            total = len(self.keys())
+            self._offset = max(0, min(int(float(args[1]) * total), self._max_offset()))
+            self._render()
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            self.scroll(amount * self._page_size() if args[2] == "pages" else amount)
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        delta = event.delta if abs(event.delta) < 120 else event.delta // 120
+        self.scroll(-delta * 3)
+        return "break"
+
+    def at_end(self, margin=0):
+        """True when the window shows the last rows (within margin rows)."""
+        return self._offset + self._visible_rows() + margin >= len(self.keys())
+
+    def _resize(self):
+        wanted = self._visible_rows() + self.overscan
+        while len(self._pool) < wanted:
+            item_id = self.tree.insert("", "end")
+            self.tree.detach(item_id)  # Attached on first render
+            self._pool.append(item_id)
+        while len(self._pool) > wanted:
+            item_id = self._pool.pop()
+            self.tree.delete(item_id)
+            self._rendered.pop(item_id, None)
+            self._item_keys.pop(item_id, None)
+        self._offset = min(self._offset, self._max_offset())
+        self._render()
+
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.tree.after_idle(self._render)
+
+    def render_now(self):
+        self._render()
+
+    def _render(self):
+        self._render_pending = False
+        if not self._pool:
+            self._resize()
+            return
+        keys = self.keys()
+        self._offset = max(0, min(self._offset, self._max_offset()))
+        selected_item = None
+        for i, item_id in enumerate(self._pool):
+            index = self._offset + i
+            if index < len(keys):
+                key = keys[index]
+                values, tags = self._rows[key]
+                state = (key, values, tags)
+                if self._rendered.get(item_id) != state:
+                    if item_id not in self._rendered:
+                        self.tree.reattach(item_id, "", i)
+                    self.tree.item(item_id, values=values, tags=tags)
+                    self._rendered[item_id] = state
+                self._item_keys[item_id] = key
+                if key == self._selected:
+                    selected_item = item_id
+            elif item_id in self._rendered:
+                self.tree.detach(item_id)
+                del self._rendered[item_id]
+                self._item_keys.pop(item_id, None)
+
+        current = self.tree.selection()
+        if selected_item and current != (selected_item,):
+            self.tree.selection_set(selected_item)
+        elif not selected_item and current:
+            self.tree.selection_remove(*current)
+        # The pool itself never scrolls; the offset does
+        self.tree.yview_moveto(0)
+        if self._offset != self._rendered_offset:
+            self._rendered_offset = self._offset
+            if self.on_scroll:
+                self.on_scroll()
+        if self.scrollbar is not None:
+            total = len(keys)
+            if total:
+                first = self._offset / total
+                last = min(1.0, (self._offset + self._visible_rows()) / total)
+                self.scrollbar.set(first, last)
+            else:
+                self.scrollbar.set(0.0, 1.0)
+
+    # --- Translation from Treeview coordinates ---
+
+    def identify_row(self, y):
+        """Returns the key of the row at y, or None."""
+        return self._item_keys.get(self.tree.identify_row(y))
+
+    def item_for(self, key):
+        """Returns the pooled Treeview item currently showing key, or None."""
+        for item_id, shown in self._item_keys.items():
+            if shown == key and item_id in self._rendered:
+                return item_id
+        return None
+
+    def bbox(self, key, column=None):
+        item_id = self.item_for(key)
+        if not item_id:
+            return ""
+        return self.tree.bbox(item_id, column)
@@ -0,0 +1,182 @@
+"""Background unread-count watcher for all saved accounts.
+
+InboxWatcher polls each saved account's first message page on a bounded
+worker pool. Accounts are scheduled individually with a random initial offset
+so polls never fire in bursts. An account that just received mail is polled
+again soon; a quiet one backs off towards max_interval. When the per-account
+intervals add up to more than max_rate polls per second, all of them are
+stretched by the same factor, so the total request rate stays flat no matter
+how many addresses are saved while hot accounts keep their relative priority.
+"""
+import heapq
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import api_client
+
+
+class _AccountState:
+    def __init__(self, address, password, interval):
+        self.address = address
+        self.password = password
+        self.interval = interval
+        self.unread = None
+        self.newest = None  # createdAt of the newest message seen so far
+
+
+class InboxWatcher:
+    def __init__(self, on_update, workers=4, min_interval=15.0, max_interval=300.0,
+                 max_rate=1.0, backoff=1.5):
+        self.on_update = on_update  # Called as on_update(address, unread_count) from a worker thread
+        self.workers = workers
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_rate = max_rate  # Upper bound on polls per second across all accounts
+        self.backoff = backoff
+
+        self._accounts = {}  # address -> _AccountState
+        self._schedule = []  # heap of (due time, address); entries not matching _due are stale
+        self._due = {}       # address -> due time of its one live heap entry
+        self._in_flight = set()
+        self._pending = set()  # Submitted poll futures, cancelled on stop()
+        self._rate_sum = 0.0  # Sum of 1 / interval over all accounts
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._executor = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._executor:
+            # shutdown(cancel_futures=True) needs Python 3.9; queued polls are cancelled below instead
+            self._executor.shutdown(wait=False)
+            with self._lock:
+                pending, self._pending = self._pending, set()
+            for future in pending:
+                future.cancel()
+
+    def _stretch(self):
+        # Factor that brings the desired total poll rate down to max_rate
+        return max(1.0, self._rate_sum / self.max_rate)
+
+    def _set_interval(self, state, interval):
+        self._rate_sum += 1.0 / interval - 1.0 / state.interval
+        state.interval = interval
+
+    def set_accounts(self, accounts):
+        """Replaces the watched accounts with the given saved email records."""
+        with self._lock:
+            wanted = {a['address']: a.get('password') for a in accounts if a.get('address')}
+            for address in list(self._accounts):
+                if address not in wanted:
+                    self._rate_sum -= 1.0 / self._accounts.pop(address).interval
+                    self._due.pop(address, None)
+            now = time.time()
+            for address, password in wanted.items():
+                state = self._accounts.get(address)
+                if state:
+                    state.password = password
+                    continue
+                self._accounts[address] = _AccountState(address, password, self.min_interval)
+                self._rate_sum += 1.0 / self.min_interval
+            spread = self.min_interval * self._stretch()
+            for address in wanted:
+                if address not in self._due and address not in self._in_flight:
+                    # Stagger first polls across one full cycle
+                    self._push(now + random.uniform(0, spread), address)
+        self._wakeup.set()
+
+    def poll_soon(self, address):
+        """Moves an account to the front of the schedule, e.g. after the user acted on it."""
+        with self._lock:
+            if address in self._accounts:
+                self._set_interval(self._accounts[address], self.min_interval)
+                # An account being polled right now reschedules itself when done
+                if address not in self._in_flight:
+                    self._push(time.time(), address)
+        self._wakeup.set()
+
+    def _push(self, due, address):
+        """Schedules an account, replacing any earlier entry (left in the heap, skipped when popped)."""
+        self._due[address] = due
+        heapq.heappush(self._schedule, (due, address))
+
+    def unread_counts(self):
+        with self._lock:
+            return {a: s.unread for a, s in self._accounts.items() if s.unread is not None}
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                now = time.time()
+                due = []
+                while self._schedule and self._schedule[0][0] <= now and len(self._in_flight) < self.workers:
+                    due_at, address = heapq.heappop(self._schedule)
+                    if self._due.get(address) != due_at:
+                        continue  # Superseded by a later _push
+                    del self._due[address]
+                    if address in self._accounts and address not in self._in_flight:
+                        self._in_flight.add(address)
+                        due.append(self._accounts[address])
+                wait = self._schedule[0][0] - now if self._schedule else None
+            for state in due:
+                try:
+                    future = self._executor.submit(self._poll, state)
+                except RuntimeError:
+                    return  # Executor shut down
+                with self._lock:
+                    self._pending.add(future)
+                future.add_done_callback(self._discard_pending)
+            self._wakeup.wait(timeout=None if wait is None else max(0.05, wait))
+            self._wakeup.clear()
+
+    def _discard_pending(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def _poll(self, state):
+        changed = False
+        retry_after = 0
+        try:
+            token = api_client.get_token(state.address, state.password)
+            if token:
+                msgs = api_client.get_messages_page(token)
+                unread = sum(1 for m in msgs if not m.get('seen', False))
+                newest = msgs[0].get('createdAt') if msgs else None
+                changed = unread != state.unread or newest != state.newest
+                state.unread, state.newest = unread, newest
+                if changed:
+                    self.on_update(state.address, unread)
+        except api_client.RateLimited as e:
+            # Not "no new mail": keep the last count and come back once the server allows it
+            retry_after = e.retry_after or self.min_interval
+        except requests.RequestException as e:
+            print(f"Watcher error for {state.address}: {e}")
+        except Exception as e:
+            print(f"Watcher callback error: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(state.address)
+                if state.address in self._accounts and not self._stop.is_set():
+                    # Hot accounts come back quickly, idle ones drift towards max_interval
+                    if changed:
+                        self._set_interval(state, self.min_interval)
+                    else:
+                        self._set_interval(state, min(state.interval * self.backoff, self.max_interval))
+                    interval = max(state.interval * self._stretch(), retry_after)
+                    jitter = random.uniform(-0.1, 0.1) * interval
+                    self._push(time.time() + interval + jitter, state.address)
+            self._wakeup.set()